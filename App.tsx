@@ -1,5 +1,5 @@
 
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import Sidebar from './components/Sidebar';
 import Dashboard from './pages/Dashboard';
 import Library from './pages/Library';
@@ -17,15 +17,22 @@ import { dbService } from './services/dbService';
 import { authService } from './services/authService';
 import { Crown, Settings as SettingsIcon, LogOut, Moon, Sun, Zap } from 'lucide-react';
 
+// Pages that work on the whole library (filters, favorites, admin tools)
+const LIBRARY_PAGES = ['library', 'trending', 'saved', 'admin'];
+
 const App: React.FC = () => {
   const [currentPage, setCurrentPage] = useState('dashboard');
   const [user, setUser] = useState<User | null>(null);
   const [ads, setAds] = useState<Ad[]>([]);
+  const [dashboardAds, setDashboardAds] = useState<Ad[]>([]);
+  // The full library is only downloaded by the pages that list it
+  const libraryLoaded = useRef(false);
   const [selectedAd, setSelectedAd] = useState<Ad | null>(null);
   const [theme] = useState<'light'>('light');
 
   const loadAds = async () => {
     try {
+      libraryLoaded.current = true;
       const data = await dbService.getAds();
       setAds(data);
     } catch (e) {
@@ -33,6 +40,10 @@ const App: React.FC = () => {
     }
   };
 
+  const loadDashboard = async () => {
+    setDashboardAds(await dbService.getDashboardAds());
+  };
+
   const checkAuth = async () => {
     const currentUser = await authService.getCurrentUser();
     setUser(currentUser);
@@ -40,10 +51,11 @@ const App: React.FC = () => {
 
   useEffect(() => {
     checkAuth();
-    loadAds();
+    loadDashboard();
 
     const handleDbUpdate = () => {
-      loadAds();
+      loadDashboard();
+      if (libraryLoaded.current) loadAds();
     };
 
     window.addEventListener('databaseUpdated', handleDbUpdate);
@@ -51,6 +63,10 @@ const App: React.FC = () => {
     return () => window.removeEventListener('databaseUpdated', handleDbUpdate);
   }, []);
 
+  useEffect(() => {
+    if (LIBRARY_PAGES.includes(currentPage) && !libraryLoaded.current) loadAds();
+  }, [currentPage]);
+
   useEffect(() => {
     const root = window.document.documentElement;
     const body = window.document.body;
@@ -112,7 +128,7 @@ const App: React.FC = () => {
       case 'dashboard':
         return (
           <Dashboard
-            ads={ads}
+            ads={dashboardAds}
             onAdClick={setSelectedAd}
             onNavigate={setCurrentPage}
             isSubscribed={hasAccess}
@@ -158,7 +174,7 @@ const App: React.FC = () => {
             onAddAd={(ad) => dbService.addAd(ad)}
             onDeleteAd={(id) => dbService.deleteAd(id)}
           />
-        ) : (user ? <Dashboard ads={ads} onAdClick={setSelectedAd} onNavigate={setCurrentPage} /> : <AuthPage onLogin={handleLogin} />);
+        ) : (user ? <Dashboard ads={dashboardAds} onAdClick={setSelectedAd} onNavigate={setCurrentPage} /> : <AuthPage onLogin={handleLogin} />);
       case 'admin-checkout':
         return user?.role === 'admin' ? <AdminCheckoutHub /> : null;
       case 'users':
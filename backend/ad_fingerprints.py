@@ -0,0 +1,548 @@
+"""
+Near-duplicate detection: content fingerprints, a similarity index and
+duplicate clusters (GET /ads/{ad_id}/similar, GET /ads/clusters, /ads?collapse=true).
+
+Fingerprints, one `ad_fingerprints` row per ad:
+- media_sha256: SHA-256 of the creative bytes (media vault), exact duplicates.
+- image_hash: 64-bit difference hash (dHash) of image creatives stored in the
+  vault. It survives re-encoding, resizing and small edits. Needs Pillow and
+  is skipped without it.
+- copy_minhash: MinHash signature (MINHASH_PERMUTATIONS x 32 bits) of the
+  copy's word shingles; equal positions estimate the Jaccard similarity.
+
+`ad_fingerprint_bands` is the LSH index, one hashed band_key per band. Copy
+signatures are split into MINHASH_BANDS bands, so ads whose copy is similar
+share a band with high probability. dHashes are split into IMAGE_DISTANCE + 1
+bit ranges, so any hash within IMAGE_DISTANCE bits shares at least one range
+exactly. Finding similar ads is a handful of index seeks plus an exact check
+on the few candidates instead of a comparison against every ad.
+
+Ads are linked (duplicates) when they share the creative (same sha256, or
+dHashes within IMAGE_DISTANCE), or when their copy is at least COPY_SIMILARITY
+alike and their creatives do not contradict it: the same copy over different
+creatives is a variation test, not a duplicate. Linked ads share a cluster_id,
+and the earliest ad of a cluster is its canonical one (the others get
+duplicate_of). Ingest only merges clusters; the daily rebuild recomputes
+them from scratch, which also splits clusters whose ads changed or were deleted.
+"""
+import hashlib
+import operator
+import os
+import random
+import re
+import unicodedata
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import select, func, bindparam
+
+from .models import AdModel, AdFingerprintModel, AdFingerprintBandModel, MediaAssetModel
+from .ads_query import CARD_COLUMNS, row_to_dict
+from .media_vault import sha_from_path, default_vault
+
+try:
+    import numpy
+except ImportError: # optional: pure-Python MinHash (same signatures, ~8x slower)
+    numpy = None
+
+try:
+    from PIL import Image
+except ImportError: # optional: no perceptual hashes, exact media matches only
+    Image = None
+
+COPY_SIMILARITY = float(os.getenv("DEDUP_COPY_SIMILARITY", "0.6"))
+IMAGE_DISTANCE = int(os.getenv("DEDUP_IMAGE_DISTANCE", "6"))
+# Candidates read per index key: boilerplate copy shared by thousands of ads would
+# otherwise make every lookup read all of them (the daily rebuild sees every pair)
+BUCKET_CAP = int(os.getenv("DEDUP_BUCKET_CAP", "200"))
+
+# Changing any of these changes the signatures: rerun the backfill (migration 0009)
+MINHASH_PERMUTATIONS = 64
+MINHASH_BANDS = 16 # 4 rows per band: ~90% recall at Jaccard 0.6, ~12% candidates at 0.3
+COPY_SHINGLE = 2
+MIN_COPY_WORDS = 6
+
+IMAGE_EXTENSIONS = {"jpg", "jpeg", "png", "webp", "gif", "bmp"}
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_MASK64 = (1 << 64) - 1
+_rnd = random.Random(0x5EED)
+# Multiply-shift hashing: ((a * h + b) mod 2^64) >> 32, one (a, b) pair per permutation
+_PERMUTATIONS = [(_rnd.getrandbits(64) | 1, _rnd.getrandbits(64)) for _ in range(MINHASH_PERMUTATIONS)]
+if numpy is not None:
+    _A = numpy.array([a for a, _ in _PERMUTATIONS], dtype=numpy.uint64)[:, None]
+    _B = numpy.array([b for _, b in _PERMUTATIONS], dtype=numpy.uint64)[:, None]
+
+FINGERPRINT_COLUMNS = ("media_sha256", "image_hash", "copy_minhash")
+
+
+# --- Fingerprints ---
+
+def copy_shingles(copy: Optional[str]) -> List[bytes]:
+    """Word COPY_SHINGLE-grams of the lowercased, diacritic-free copy; [] for short copy."""
+    plain = unicodedata.normalize("NFKD", (copy or "").lower()).encode("ascii", "ignore").decode()
+    words = _WORD.findall(plain)
+    if len(words) < MIN_COPY_WORDS:
+        return []
+    return list({" ".join(words[i:i + COPY_SHINGLE]).encode() for i in range(len(words) - COPY_SHINGLE + 1)})
+
+
+def minhash(copy: Optional[str]) -> Optional[bytes]:
+    shingles = copy_shingles(copy)
+    if not shingles:
+        return None
+    digests = b"".join(hashlib.blake2b(s, digest_size=8).digest() for s in shingles)
+    if numpy is not None:
+        hashes = numpy.frombuffer(digests, dtype=">u8").astype(numpy.uint64)[None, :]
+        return ((_A * hashes + _B) >> numpy.uint64(32)).min(axis=1).astype(">u4").tobytes()
+    hashes = [int.from_bytes(digests[i:i + 8], "big") for i in range(0, len(digests), 8)]
+    return b"".join(min(((a * h + b) & _MASK64) >> 32 for h in hashes).to_bytes(4, "big")
+                    for a, b in _PERMUTATIONS)
+
+
+def copy_similarity(a: Optional[bytes], b: Optional[bytes]) -> float:
+    """Estimated Jaccard similarity of two copies: share of equal MinHash positions."""
+    if not a or not b:
+        return 0.0
+    return sum(map(operator.eq, memoryview(a).cast("I"), memoryview(b).cast("I"))) / MINHASH_PERMUTATIONS
+
+
+def image_hash(path: str) -> Optional[str]:
+    """64-bit dHash of an image file as 16 hex chars; None without Pillow or for flat/unreadable images."""
+    if Image is None or path.rsplit(".", 1)[-1].lower() not in IMAGE_EXTENSIONS:
+        return None
+    try:
+        with Image.open(path) as img:
+            img.draft("L", (64, 64)) # JPEG: decode at reduced size
+            pixels = list(img.convert("L").resize((9, 8), Image.LANCZOS).getdata())
+    except Exception:
+        return None
+    if max(pixels) - min(pixels) < 8:
+        # Blank or flat frames would all hash alike
+        return None
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            bits = (bits << 1) | (left > pixels[row * 9 + col + 1])
+    return f"{bits:016x}"
+
+
+def hamming(a: str, b: str) -> int:
+    return (int(a, 16) ^ int(b, 16)).bit_count()
+
+
+def _band_key(kind: str, band: int, value: bytes) -> int:
+    digest = hashlib.blake2b(value, digest_size=8, person=f"{kind}{band}".encode()).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def index_keys(fp) -> List[int]:
+    """LSH band keys of a fingerprint row."""
+    keys = []
+    signature = _get(fp, "copy_minhash")
+    if signature:
+        width = len(signature) // MINHASH_BANDS
+        for band in range(MINHASH_BANDS):
+            keys.append(_band_key("copy", band, signature[band * width:(band + 1) * width]))
+    image = _get(fp, "image_hash")
+    if image:
+        bits, count = int(image, 16), IMAGE_DISTANCE + 1
+        start = 0
+        for band in range(count):
+            width = 64 // count + (band < 64 % count)
+            # 2 bytes at the default distance; up to 8 for DEDUP_IMAGE_DISTANCE=0
+            value = (bits >> start) & ((1 << width) - 1)
+            keys.append(_band_key("image", band, value.to_bytes((width + 7) // 8, "big")))
+            start += width
+    return keys
+
+
+def _lookup_keys(fp) -> List[Any]:
+    # Band keys plus the exact creative hash (matched on ad_fingerprints.media_sha256)
+    sha = _get(fp, "media_sha256")
+    return index_keys(fp) + ([sha] if sha else [])
+
+
+def _get(fp, key: str):
+    return fp.get(key) if isinstance(fp, dict) else getattr(fp, key)
+
+
+def same_creative(a, b) -> bool:
+    sha = _get(a, "media_sha256")
+    if sha and sha == _get(b, "media_sha256"):
+        return True
+    ia, ib = _get(a, "image_hash"), _get(b, "image_hash")
+    return bool(ia and ib) and hamming(ia, ib) <= IMAGE_DISTANCE
+
+
+def linked(a, b) -> bool:
+    """Whether two fingerprints belong to the same duplicate cluster."""
+    if same_creative(a, b):
+        return True
+    if copy_similarity(_get(a, "copy_minhash"), _get(b, "copy_minhash")) < COPY_SIMILARITY:
+        return False
+    # Same copy over two known, different creatives: a variation, not a duplicate
+    return not (_get(a, "media_sha256") and _get(b, "media_sha256"))
+
+
+# --- Index maintenance ---
+
+def _load(conn, ad_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    fp = AdFingerprintModel.__table__
+    ad_ids, rows = list(ad_ids), {}
+    for start in range(0, len(ad_ids), 500):
+        for row in conn.execute(select(fp).where(fp.c.ad_id.in_(ad_ids[start:start + 500]))).mappings():
+            rows[row["ad_id"]] = dict(row)
+    return rows
+
+
+def update_fingerprints(conn, updates: Dict[str, Dict[str, Any]]) -> List[str]:
+    """
+    Applies {ad_id: {fingerprint column: value}}, re-indexes the ads whose
+    fingerprints changed and merges their clusters. Returns the changed ids.
+    """
+    if not updates:
+        return []
+    fp, bands = AdFingerprintModel.__table__, AdFingerprintBandModel.__table__
+    existing = _load(conn, updates)
+    inserts, changes = [], []
+    for ad_id, values in updates.items():
+        old = existing.get(ad_id)
+        row = dict(old) if old else {"ad_id": ad_id, "media_sha256": None, "image_hash": None,
+                                     "copy_minhash": None, "cluster_id": ad_id, "duplicate_of": None}
+        if old and values.get("media_sha256", old["media_sha256"]) != old["media_sha256"] \
+                and "image_hash" not in values:
+            # The perceptual hash belongs to the previous creative
+            row["image_hash"] = None
+        row.update({k: v for k, v in values.items() if k in FINGERPRINT_COLUMNS})
+        if old and all(row[c] == old[c] for c in FINGERPRINT_COLUMNS):
+            continue
+        row["updated_at"] = datetime.utcnow()
+        (changes if old else inserts).append(row)
+
+    changed = inserts + changes
+    if not changed:
+        return []
+    if inserts:
+        conn.execute(fp.insert(), inserts)
+    if changes:
+        conn.execute(fp.update().where(fp.c.ad_id == bindparam("_id")).values(
+            **{c: bindparam(c) for c in FINGERPRINT_COLUMNS + ("updated_at",)}),
+            [dict(r, _id=r["ad_id"]) for r in changes])
+        ids = [r["ad_id"] for r in changes]
+        for start in range(0, len(ids), 500):
+            conn.execute(bands.delete().where(bands.c.ad_id.in_(ids[start:start + 500])))
+    band_rows = [{"band_key": k, "ad_id": r["ad_id"]} for r in changed for k in index_keys(r)]
+    if band_rows:
+        conn.execute(bands.insert(), band_rows)
+    _merge_clusters(conn, changed)
+    return [r["ad_id"] for r in changed]
+
+
+def candidates(conn, fps: List[Dict[str, Any]]) -> Dict[str, Set[str]]:
+    """ad_id -> ids sharing its creative hash or one of its band keys (at most BUCKET_CAP per key)."""
+    fp, bands = AdFingerprintModel.__table__, AdFingerprintBandModel.__table__
+    by_key: Dict[Any, List[str]] = {}
+    for row in fps:
+        for key in _lookup_keys(row):
+            by_key.setdefault(key, []).append(row["ad_id"])
+    found: Dict[str, Set[str]] = {row["ad_id"]: set() for row in fps}
+
+    lookups = ((bands.c.band_key, bands.c.ad_id, [k for k in by_key if isinstance(k, int)]),
+               (fp.c.media_sha256, fp.c.ad_id, [k for k in by_key if isinstance(k, str)]))
+    for column, ad_id, keys in lookups:
+        for start in range(0, len(keys), 500):
+            ranked = select(column.label("k"), ad_id.label("ad_id"), func.row_number().over(
+                partition_by=column, order_by=ad_id).label("n")).where(column.in_(keys[start:start + 500])).subquery()
+            for key, other in conn.execute(select(ranked.c.k, ranked.c.ad_id).where(ranked.c.n <= BUCKET_CAP)):
+                for owner in by_key[key]:
+                    found[owner].add(other)
+
+    for ad_id, ids in found.items():
+        ids.discard(ad_id)
+    return found
+
+
+class _UnionFind:
+    def __init__(self):
+        self.parent: Dict[str, str] = {}
+
+    def find(self, x: str) -> str:
+        root = self.parent.setdefault(x, x)
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[x] != root: # path compression
+            self.parent[x], x = root, self.parent[x]
+        return root
+
+    def union(self, a: str, b: str):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+    def groups(self) -> Dict[str, List[str]]:
+        out: Dict[str, List[str]] = {}
+        for x in self.parent:
+            out.setdefault(self.find(x), []).append(x)
+        return out
+
+
+def _merge_clusters(conn, fps: List[Dict[str, Any]]):
+    fp = AdFingerprintModel.__table__
+    found = candidates(conn, fps)
+    rows = _load(conn, {i for ids in found.values() for i in ids})
+    rows.update({r["ad_id"]: r for r in fps})
+    # Union-find over cluster ids: existing clusters are only ever merged here
+    uf = _UnionFind()
+    for row in fps:
+        cluster = uf.find(row["cluster_id"])
+        for other in found[row["ad_id"]]:
+            if other in rows and uf.find(rows[other]["cluster_id"]) != cluster and linked(row, rows[other]):
+                uf.union(cluster, rows[other]["cluster_id"])
+                cluster = uf.find(cluster)
+
+    moves, touched = [], set()
+    for target, clusters in uf.groups().items():
+        if len(clusters) < 2:
+            continue
+        moves.extend({"_from": c, "_to": target} for c in clusters if c != target)
+        touched.add(target)
+    if moves:
+        # Whole clusters move, including members that were not part of this batch
+        conn.execute(fp.update().where(fp.c.cluster_id == bindparam("_from")).values(cluster_id=bindparam("_to")), moves)
+    _refresh_canonical(conn, touched)
+
+
+def _refresh_canonical(conn, cluster_ids: Iterable[str]):
+    """Marks the earliest ad of each cluster canonical and points the others at it."""
+    fp, ads = AdFingerprintModel.__table__, AdModel.__table__
+    cluster_ids = list(cluster_ids)
+    changes = []
+    for start in range(0, len(cluster_ids), 500):
+        members: Dict[str, list] = {}
+        for row in conn.execute(select(fp.c.ad_id, fp.c.cluster_id, fp.c.duplicate_of, ads.c.addedAt)
+                                .join(ads, ads.c.id == fp.c.ad_id)
+                                .where(fp.c.cluster_id.in_(cluster_ids[start:start + 500]))):
+            members.setdefault(row.cluster_id, []).append(row)
+        for rows in members.values():
+            changes.extend(_canonical_changes(rows))
+    if changes:
+        conn.execute(fp.update().where(fp.c.ad_id == bindparam("_id")).values(duplicate_of=bindparam("_dup")), changes)
+
+
+def _canonical_changes(rows) -> List[Dict[str, Any]]:
+    canonical = min(rows, key=lambda r: (r.addedAt or datetime.max, r.ad_id)).ad_id
+    changes = []
+    for row in rows:
+        duplicate_of = None if row.ad_id == canonical else canonical
+        if row.duplicate_of != duplicate_of:
+            changes.append({"_id": row.ad_id, "_dup": duplicate_of})
+    return changes
+
+
+def forget_ads(conn, ad_ids: List[str]):
+    """Drops the fingerprints of deleted ads (their clusters are re-split by the next rebuild)."""
+    fp, bands = AdFingerprintModel.__table__, AdFingerprintBandModel.__table__
+    clusters = set()
+    for start in range(0, len(ad_ids), 500):
+        chunk = ad_ids[start:start + 500]
+        clusters.update(conn.execute(select(fp.c.cluster_id).where(fp.c.ad_id.in_(chunk))).scalars())
+        conn.execute(bands.delete().where(bands.c.ad_id.in_(chunk)))
+        conn.execute(fp.delete().where(fp.c.ad_id.in_(chunk)))
+    # A deleted canonical ad hands over to the next earliest one
+    _refresh_canonical(conn, clusters)
+
+
+# --- Ingest hooks ---
+
+def fingerprint_ads(conn, rows: Iterable[Dict[str, Any]]) -> List[str]:
+    """Copy and vault-media fingerprints for ads being written (ingest, API create/update)."""
+    updates = {}
+    for row in rows:
+        values = {}
+        if "copy" in row:
+            values["copy_minhash"] = minhash(row["copy"])
+        if "mediaHash" in row:
+            values["media_sha256"] = row["mediaHash"]
+        elif "mediaUrl" in row:
+            values["media_sha256"] = sha_from_path(row["mediaUrl"])
+        if values:
+            updates[str(row["id"])] = values
+    return update_fingerprints(conn, updates)
+
+
+def fingerprint_media(conn, ad_id: str, sha: str, image: Optional[str] = None) -> List[str]:
+    """The ad's creative is now in the vault: exact hash, plus the dHash for images."""
+    return update_fingerprints(conn, {ad_id: {"media_sha256": sha, "image_hash": image}})
+
+
+def forget_media(conn, ad_ids: Iterable[str]) -> List[str]:
+    """The ads' creative left the vault (quota eviction): drops the exact hash, keeps the dHash."""
+    fp = AdFingerprintModel.__table__
+    ad_ids = list(ad_ids)
+    updates = {}
+    for start in range(0, len(ad_ids), 500):
+        for ad_id, image in conn.execute(select(fp.c.ad_id, fp.c.image_hash)
+                                         .where(fp.c.ad_id.in_(ad_ids[start:start + 500]), fp.c.media_sha256.is_not(None))):
+            updates[ad_id] = {"media_sha256": None, "image_hash": image}
+    return update_fingerprints(conn, updates)
+
+
+# --- Backfill and rebuild ---
+
+def backfill_fingerprints(conn, batch_size: int = 2000) -> int:
+    """Copy and media fingerprints for every ad without one (migration 0009); clusters are rebuilt after."""
+    fp, bands, ads = AdFingerprintModel.__table__, AdFingerprintBandModel.__table__, AdModel.__table__
+    missing = (select(ads.c.id, ads.c.copy, ads.c.mediaUrl)
+               .outerjoin(fp, fp.c.ad_id == ads.c.id).where(fp.c.ad_id.is_(None)))
+    rows = conn.execute(missing).fetchall()
+    for start in range(0, len(rows), batch_size):
+        batch = [{"ad_id": r.id, "media_sha256": sha_from_path(r.mediaUrl), "image_hash": None,
+                  "copy_minhash": minhash(r.copy), "cluster_id": r.id, "duplicate_of": None,
+                  "updated_at": datetime.utcnow()} for r in rows[start:start + batch_size]]
+        conn.execute(fp.insert(), batch)
+        band_rows = [{"band_key": k, "ad_id": r["ad_id"]} for r in batch for k in index_keys(r)]
+        if band_rows:
+            conn.execute(bands.insert(), band_rows)
+    return len(rows)
+
+
+def fill_image_hashes(conn, vault=None) -> int:
+    """dHashes for image creatives already in the vault but not hashed yet (e.g. stored before Pillow was installed)."""
+    if Image is None:
+        return 0
+    vault = vault or default_vault()
+    fp, assets = AdFingerprintModel.__table__, MediaAssetModel.__table__
+    rows = conn.execute(select(fp.c.ad_id, assets.c.path)
+                        .join(assets, assets.c.sha256 == fp.c.media_sha256)
+                        .where(fp.c.image_hash.is_(None), assets.c.content_type.like("image/%"))).fetchall()
+    hashes, updates = {}, {}
+    for ad_id, path in rows:
+        if path not in hashes:
+            hashes[path] = image_hash(vault.disk_path(path))
+        if hashes[path]:
+            updates[ad_id] = {"image_hash": hashes[path]}
+    update_fingerprints(conn, updates)
+    return len(updates)
+
+
+def rebuild_clusters(conn) -> Dict[str, int]:
+    """Recomputes every cluster in memory (connected components over the LSH buckets)."""
+    fp, bands, ads = AdFingerprintModel.__table__, AdFingerprintBandModel.__table__, AdModel.__table__
+    orphans = [r[0] for r in conn.execute(select(fp.c.ad_id).outerjoin(ads, ads.c.id == fp.c.ad_id)
+                                          .where(ads.c.id.is_(None)))]
+    forget_ads(conn, orphans)
+
+    rows = {r.ad_id: r for r in conn.execute(
+        select(fp.c.ad_id, fp.c.media_sha256, fp.c.image_hash, fp.c.copy_minhash,
+               fp.c.cluster_id, fp.c.duplicate_of, ads.c.addedAt).join(ads, ads.c.id == fp.c.ad_id))}
+    buckets: Dict[Any, List[str]] = {}
+    for ad_id in sorted(rows):
+        row = rows[ad_id]
+        for key in _lookup_keys(row):
+            bucket = buckets.setdefault(key, [])
+            if len(bucket) < BUCKET_CAP:
+                bucket.append(ad_id)
+
+    uf = _UnionFind()
+    for ad_id, row in rows.items():
+        uf.find(ad_id)
+        for key in _lookup_keys(row):
+            for other in buckets[key]:
+                if other != ad_id and uf.find(other) != uf.find(ad_id) and linked(row, rows[other]):
+                    uf.union(ad_id, other)
+
+    groups = uf.groups()
+    cluster_changes, canonical_changes, duplicates = [], [], 0
+    for cluster_id, members in groups.items():
+        for ad_id in members:
+            if rows[ad_id].cluster_id != cluster_id:
+                cluster_changes.append({"_id": ad_id, "_cluster": cluster_id})
+        canonical_changes.extend(_canonical_changes([rows[m] for m in members]))
+        duplicates += len(members) - 1
+    if cluster_changes:
+        conn.execute(fp.update().where(fp.c.ad_id == bindparam("_id")).values(cluster_id=bindparam("_cluster")),
+                     cluster_changes)
+    if canonical_changes:
+        conn.execute(fp.update().where(fp.c.ad_id == bindparam("_id")).values(duplicate_of=bindparam("_dup")),
+                     canonical_changes)
+    return {"ads": len(rows), "clusters": sum(1 for m in groups.values() if len(m) > 1),
+            "duplicates": duplicates, "moved": len(cluster_changes), "orphans": len(orphans)}
+
+
+def rebuild_fingerprints(engine=None) -> Dict[str, int]:
+    """Daily job (see worker.py): pending image hashes, then a full cluster rebuild."""
+    from .database import sync_engine
+
+    with (engine or sync_engine).begin() as conn:
+        hashed = fill_image_hashes(conn)
+        summary = rebuild_clusters(conn)
+    summary["imagesHashed"] = hashed
+    return summary
+
+
+# --- Queries ---
+
+def similar_ads(conn, ad_id: str, limit: int = 20) -> Optional[Dict[str, Any]]:
+    """Ads similar to ad_id, best first, with how they match; None if the ad has no fingerprint."""
+    fp = AdFingerprintModel.__table__
+    own = _load(conn, [ad_id]).get(ad_id)
+    if own is None:
+        return None
+    found = candidates(conn, [own])[ad_id]
+    scored = []
+    for other in _load(conn, found).values():
+        similarity = copy_similarity(own["copy_minhash"], other["copy_minhash"])
+        image = hamming(own["image_hash"], other["image_hash"]) \
+            if own["image_hash"] and other["image_hash"] else None
+        if own["media_sha256"] and own["media_sha256"] == other["media_sha256"]:
+            match = "media"
+        elif image is not None and image <= IMAGE_DISTANCE:
+            match = "image"
+        elif similarity >= COPY_SIMILARITY:
+            match = "copy"
+        else:
+            continue
+        rank = (match != "media", image if image is not None else 65, -similarity)
+        scored.append((rank, other["ad_id"], {
+            "match": match, "duplicate": other["cluster_id"] == own["cluster_id"],
+            "copySimilarity": round(similarity, 3), "imageDistance": image,
+        }))
+    scored.sort()
+    scored = scored[:max(1, min(limit, 100))]
+
+    ads = {}
+    ids = [ad for _, ad, _ in scored]
+    if ids:
+        ads = {r.id: r for r in conn.execute(select(*CARD_COLUMNS).where(AdModel.id.in_(ids)))}
+    items = [dict(row_to_dict(ads[ad]), **info) for _, ad, info in scored if ad in ads]
+    return {"adId": ad_id, "clusterId": own["cluster_id"], "duplicateOf": own["duplicate_of"],
+            "items": items, "count": len(items)}
+
+
+def list_clusters(conn, min_size: int = 2, limit: int = 50, offset: int = 0,
+                  members: int = 20) -> Dict[str, Any]:
+    """Largest duplicate clusters first: canonical ad, size and (up to `members`) member ids."""
+    fp, ads = AdFingerprintModel.__table__, AdModel.__table__
+    size = func.count().label("size")
+    top = conn.execute(select(fp.c.cluster_id, size).join(ads, ads.c.id == fp.c.ad_id)
+                       .group_by(fp.c.cluster_id).having(func.count() >= max(2, min_size))
+                       .order_by(size.desc(), fp.c.cluster_id).offset(offset).limit(limit + 1)).fetchall()
+    has_more = len(top) > limit
+    top = top[:limit]
+    by_cluster: Dict[str, list] = {}
+    if top:
+        for row in conn.execute(select(fp.c.cluster_id, fp.c.ad_id, fp.c.duplicate_of)
+                                .join(ads, ads.c.id == fp.c.ad_id)
+                                .where(fp.c.cluster_id.in_([c for c, _ in top]))
+                                .order_by(fp.c.cluster_id, ads.c.addedAt, fp.c.ad_id)):
+            by_cluster.setdefault(row.cluster_id, []).append(row)
+    items = []
+    for cluster_id, count in top:
+        rows = by_cluster.get(cluster_id, [])
+        canonical = next((r.ad_id for r in rows if r.duplicate_of is None), rows[0].ad_id if rows else None)
+        items.append({"clusterId": cluster_id, "canonicalId": canonical, "size": count,
+                      "adIds": [r.ad_id for r in rows[:members]]})
+    return {"items": items, "count": len(items), "nextOffset": offset + limit if has_more else None}
+
@@ -0,0 +1,170 @@
+"""
+adCount time series for ads.
+
+- `ad_history` is run-length encoded: a row is written only when an ad's adCount
+  differs from its previous value (the current value lives on `ads.adCount`, so
+  no history lookup is needed to decide). Re-importing an unchanged library
+  writes nothing.
+- `ad_history_rollups` keeps one row per ad per day and per week (min, max and
+  last adCount, number of changes), upserted in the same transaction as the
+  change points.
+- `apply_history_retention` drops raw change points and daily rollups past their
+  retention windows; weekly rollups are kept while the ad exists. Each ad keeps
+  its latest raw point.
+
+    python -m backend.ad_history --retention     # apply the retention policy
+"""
+import datetime
+import os
+import sys
+import uuid
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import select, case, func, and_
+
+from .database import sync_engine
+from .models import AdModel, AdHistoryModel, AdHistoryRollupModel
+
+HISTORY_RAW_RETENTION_DAYS = int(os.getenv("HISTORY_RAW_RETENTION_DAYS", "90"))
+HISTORY_DAILY_RETENTION_DAYS = int(os.getenv("HISTORY_DAILY_RETENTION_DAYS", "400"))
+PERIODS = ("day", "week")
+RESOLUTIONS = ("raw",) + PERIODS
+MAX_BATCH_IDS = 200
+
+
+def bucket_start(ts: datetime.datetime, period: str) -> datetime.datetime:
+    day = datetime.datetime(ts.year, ts.month, ts.day)
+    if period == "week":
+        return day - datetime.timedelta(days=day.weekday())
+    return day
+
+
+def changed_points(rows: Iterable[Dict[str, Any]], previous: Dict[str, Optional[int]],
+                   now: Optional[datetime.datetime] = None) -> List[Dict[str, Any]]:
+    """
+    Change points for an ingest batch. `previous` maps ad id -> adCount before the
+    write (absent for new ads); rows without an adCount keep their previous value.
+    """
+    now = now or datetime.datetime.utcnow()
+    points = []
+    for r in rows:
+        ad_id = r["id"]
+        existed = ad_id in previous
+        count = r.get("adCount") if "adCount" in r else previous.get(ad_id)
+        count = count or 1
+        if existed and previous[ad_id] == count:
+            continue
+        points.append({"id": str(uuid.uuid4()), "ad_id": ad_id, "adCount": count, "timestamp": now})
+    return points
+
+
+def _rollup_upsert(insert):
+    table = AdHistoryRollupModel.__table__
+    stmt = insert(table)
+    ex = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.ad_id, table.c.period, table.c.bucket_start],
+        set_={
+            "min_count": case((ex.min_count < table.c.min_count, ex.min_count), else_=table.c.min_count),
+            "max_count": case((ex.max_count > table.c.max_count, ex.max_count), else_=table.c.max_count),
+            "last_count": ex.last_count,
+            "changes": table.c.changes + ex.changes,
+        },
+    )
+
+
+def rollup_rows(points: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Folds change points (in time order) into day/week rollup rows."""
+    rollups = {}
+    for p in points:
+        for period in PERIODS:
+            key = (p["ad_id"], period, bucket_start(p["timestamp"], period))
+            r = rollups.get(key)
+            if r is None:
+                rollups[key] = {"ad_id": key[0], "period": period, "bucket_start": key[2],
+                                "min_count": p["adCount"], "max_count": p["adCount"],
+                                "last_count": p["adCount"], "changes": 1}
+            else:
+                r["min_count"] = min(r["min_count"], p["adCount"])
+                r["max_count"] = max(r["max_count"], p["adCount"])
+                r["last_count"] = p["adCount"]
+                r["changes"] += 1
+    return list(rollups.values())
+
+
+def upsert_rollups(conn, rows: List[Dict[str, Any]]):
+    if rows:
+        from .ingest import dialect_insert
+        conn.execute(_rollup_upsert(dialect_insert(conn.dialect.name)), rows)
+
+
+def record_points(conn, points: List[Dict[str, Any]]):
+    """Writes change points and folds them into the day/week rollups."""
+    if not points:
+        return
+    conn.execute(AdHistoryModel.__table__.insert(), points)
+    upsert_rollups(conn, rollup_rows(points))
+
+
+# --- Reads ---
+
+def history_series(conn, ad_ids: List[str], resolution: str = "raw",
+                   since: Optional[datetime.datetime] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """{ad_id: [points in time order]} for many ads in one query."""
+    series: Dict[str, List[Dict[str, Any]]] = {ad_id: [] for ad_id in ad_ids}
+    if not ad_ids:
+        return series
+    if resolution == "raw":
+        h = AdHistoryModel.__table__.c
+        stmt = select(h.ad_id, h.adCount, h.timestamp).where(h.ad_id.in_(ad_ids))
+        if since:
+            stmt = stmt.where(h.timestamp >= since)
+        for row in conn.execute(stmt.order_by(h.ad_id, h.timestamp)):
+            series[row.ad_id].append({"adCount": row.adCount,
+                                      "timestamp": row.timestamp.isoformat() if row.timestamp else None})
+        return series
+
+    r = AdHistoryRollupModel.__table__.c
+    stmt = select(r.ad_id, r.bucket_start, r.min_count, r.max_count, r.last_count).where(
+        r.ad_id.in_(ad_ids), r.period == resolution)
+    if since:
+        stmt = stmt.where(r.bucket_start >= bucket_start(since, resolution))
+    for row in conn.execute(stmt.order_by(r.ad_id, r.bucket_start)):
+        series[row.ad_id].append({"adCount": row.last_count, "min": row.min_count, "max": row.max_count,
+                                  "timestamp": row.bucket_start.isoformat()})
+    return series
+
+
+# --- Retention ---
+
+def apply_history_retention(engine=None, raw_days: int = HISTORY_RAW_RETENTION_DAYS,
+                            daily_days: int = HISTORY_DAILY_RETENTION_DAYS,
+                            now: Optional[datetime.datetime] = None) -> Dict[str, int]:
+    engine = engine or sync_engine
+    now = now or datetime.datetime.utcnow()
+    h = AdHistoryModel.__table__
+    r = AdHistoryRollupModel.__table__
+    with engine.begin() as conn:
+        # Keep each ad's latest raw point so the series always has a baseline
+        latest_per_ad = (select(h.c.ad_id, func.max(h.c.timestamp).label("ts"))
+                         .group_by(h.c.ad_id).subquery())
+        keep = select(h.c.id).join(latest_per_ad, and_(h.c.ad_id == latest_per_ad.c.ad_id,
+                                                       h.c.timestamp == latest_per_ad.c.ts))
+        raw = conn.execute(h.delete().where(
+            h.c.timestamp < now - datetime.timedelta(days=raw_days), h.c.id.notin_(keep))).rowcount
+        daily = conn.execute(r.delete().where(
+            r.c.period == "day", r.c.bucket_start < now - datetime.timedelta(days=daily_days))).rowcount
+        orphaned = conn.execute(r.delete().where(r.c.ad_id.notin_(select(AdModel.id)))).rowcount
+    return {"rawDeleted": raw, "dailyRollupsDeleted": daily, "orphanRollupsDeleted": orphaned}
+
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    if "--retention" in argv:
+        print(f"[History] Retention applied: {apply_history_retention()}")
+    else:
+        print(__doc__)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Full-text search over ad titles, copy, insights and tags (GET /ads/search).
+
+- Postgres: `ads.search_vector`, a stored generated tsvector with Portuguese
+  stemming, plus a GIN index. The title weighs more than tags and copy, which
+  weigh more than insights. Queries go through websearch_to_tsquery (quotes,
+  `or`, `-term`) and are ranked by ts_rank_cd.
+- SQLite (local dev): `ads_fts`, an external-content FTS5 table kept in sync
+  by triggers. It folds diacritics and matches every term as a prefix in place
+  of stemming, and ranks with weighted bm25.
+
+The database maintains both indexes itself, so every writer keeps them
+current: API create and update, the set-based import, bulk_importer and
+deletes. Relevance is scored over the SEARCH_RANK_WINDOW most recent matches;
+results are paginated with an opaque offset cursor.
+"""
+import base64
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import select, text, literal_column, func, table, column
+
+from .models import AdModel
+from .ads_query import CARD_COLUMNS, MAX_PAGE_SIZE, DEFAULT_PAGE_SIZE, apply_filters, row_to_dict
+
+TS_CONFIG = "portuguese"
+MAX_QUERY_TERMS = 12
+SEARCH_RANK_WINDOW = int(os.getenv("SEARCH_RANK_WINDOW", "5000"))
+# Deep pages of a ranked search are not useful and cost a full re-rank each
+MAX_OFFSET = 2000
+# bm25 column weights, in ads_fts column order
+FTS_COLUMNS = ("title", "copy", "insights", "tags")
+FTS_WEIGHTS = (10.0, 4.0, 1.0, 6.0)
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def search_terms(q: str) -> List[str]:
+    return _WORD.findall((q or "").lower())[:MAX_QUERY_TERMS]
+
+
+def fts5_query(q: str) -> str:
+    # Every term must match, as a prefix ("emagrec" finds "emagrecer", "emagrecimento")
+    return " ".join(f'"{term}"*' for term in search_terms(q))
+
+
+def encode_offset(offset: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"o": offset}).encode()).decode().rstrip("=")
+
+
+def decode_offset(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        offset = int(json.loads(base64.urlsafe_b64decode(padded.encode()))["o"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if offset < 0 or offset > MAX_OFFSET:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return offset
+
+
+# --- Index DDL (migration 0008) ---
+
+def _pg_vector_sql() -> str:
+    cfg = f"'{TS_CONFIG}'::regconfig"
+    return (f"setweight(to_tsvector({cfg}, coalesce(title, '')), 'A') || "
+            f"setweight(to_tsvector({cfg}, coalesce(tags::text, '')), 'B') || "
+            f"setweight(to_tsvector({cfg}, coalesce(\"copy\", '')), 'B') || "
+            f"setweight(to_tsvector({cfg}, coalesce(insights, '')), 'C')")
+
+
+def create_search_index(conn):
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(f"ALTER TABLE ads ADD COLUMN IF NOT EXISTS search_vector tsvector "
+                          f"GENERATED ALWAYS AS ({_pg_vector_sql()}) STORED"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_ads_search_vector ON ads USING GIN (search_vector)"))
+        return
+
+    cols = ", ".join(FTS_COLUMNS)
+    new = ", ".join(f"new.{c}" for c in FTS_COLUMNS)
+    old = ", ".join(f"old.{c}" for c in FTS_COLUMNS)
+    changed = " OR ".join(f"old.{c} IS NOT new.{c}" for c in FTS_COLUMNS)
+    conn.execute(text(f"CREATE VIRTUAL TABLE IF NOT EXISTS ads_fts USING fts5({cols}, content='ads', "
+                      f"content_rowid='rowid', tokenize='unicode61 remove_diacritics 2', prefix='2 3')"))
+    conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS ads_fts_insert AFTER INSERT ON ads BEGIN "
+                      f"INSERT INTO ads_fts(rowid, {cols}) VALUES (new.rowid, {new}); END"))
+    conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS ads_fts_delete AFTER DELETE ON ads BEGIN "
+                      f"INSERT INTO ads_fts(ads_fts, rowid, {cols}) VALUES ('delete', old.rowid, {old}); END"))
+    # Re-imports rewrite every column: only re-index when the searchable text changed
+    conn.execute(text(f"CREATE TRIGGER IF NOT EXISTS ads_fts_update AFTER UPDATE OF {cols} ON ads "
+                      f"WHEN {changed} BEGIN "
+                      f"INSERT INTO ads_fts(ads_fts, rowid, {cols}) VALUES ('delete', old.rowid, {old}); "
+                      f"INSERT INTO ads_fts(rowid, {cols}) VALUES (new.rowid, {new}); END"))
+    weights = ", ".join(str(w) for w in FTS_WEIGHTS)
+    conn.execute(text(f"INSERT INTO ads_fts(ads_fts, rank) VALUES ('rank', 'bm25({weights})')"))
+    rebuild_search_index(conn)
+
+
+def rebuild_search_index(conn):
+    """SQLite: re-reads every ad into ads_fts (after a VACUUM, which may renumber the ads rowids)."""
+    if conn.dialect.name == "sqlite":
+        conn.execute(text("INSERT INTO ads_fts(ads_fts) VALUES ('rebuild')"))
+
+
+# --- Queries ---
+
+def build_search_query(dialect: str, q: str, cursor: Optional[str] = None,
+                       limit: int = DEFAULT_PAGE_SIZE, **filters):
+    """
+    Ranks the SEARCH_RANK_WINDOW most recent matches (after filters): finding
+    the matches is cheap, scoring tens of thousands of them for a common word
+    is not.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    offset = decode_offset(cursor)
+    if dialect == "postgresql":
+        tsquery = func.websearch_to_tsquery(literal_column(f"'{TS_CONFIG}'::regconfig"), q)
+        vector = literal_column("ads.search_vector")
+        candidates = apply_filters(select(AdModel.id).where(vector.op("@@")(tsquery)), **filters)
+        candidates = (candidates.order_by(AdModel.addedAt.desc(), AdModel.id.desc())
+                      .limit(SEARCH_RANK_WINDOW).subquery())
+        score = func.ts_rank_cd(vector, tsquery).label("score")
+        stmt = (select(*CARD_COLUMNS, score)
+                .join(candidates, candidates.c.id == AdModel.id)
+                .order_by(score.desc(), AdModel.id.desc()))
+    else:
+        fts = table("ads_fts", column("rowid"), column("rank"))
+        match = literal_column("ads_fts").op("MATCH")(fts5_query(q))
+        joined = fts.join(AdModel.__table__, literal_column("ads.rowid") == fts.c.rowid)
+        # Lowest rowid (insertion order) still inside the window; ads_fts seeks rowid ranges in its doclists
+        oldest = (apply_filters(select(fts.c.rowid).select_from(joined).where(match), **filters)
+                  .order_by(fts.c.rowid.desc()).limit(1).offset(SEARCH_RANK_WINDOW - 1).scalar_subquery())
+        # FTS5's rank column (weighted bm25, lower is better) is scored inside the index
+        stmt = (apply_filters(select(*CARD_COLUMNS, (-fts.c.rank).label("score")).select_from(joined), **filters)
+                .where(match, fts.c.rowid >= func.coalesce(oldest, 0))
+                .order_by(fts.c.rank, fts.c.rowid.desc()))
+    # Fetch one extra row to know whether another page exists
+    return stmt.offset(offset).limit(limit + 1), limit, offset
+
+
+def build_search_page(rows: List[Any], limit: int, offset: int) -> Dict[str, Any]:
+    has_more = len(rows) > limit and offset + limit < MAX_OFFSET
+    items = []
+    for row in rows[:limit]:
+        item = row_to_dict(row)
+        item["score"] = round(float(item["score"] or 0.0), 4)
+        items.append(item)
+    return {"items": items, "nextCursor": encode_offset(offset + limit) if has_more else None, "count": len(items)}
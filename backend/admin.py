@@ -0,0 +1,211 @@
+"""
+adscale-admin: one-off operational jobs that used to run inside the API startup hooks.
+
+    python -m backend.admin migrate                  # apply pending schema migrations
+    python -m backend.admin bootstrap [--csv FILE]   # wipe + import the bootstrap CSV, if present
+    python -m backend.admin bootstrap --enqueue      # same, as a Celery job (bootstrap_import_task)
+    python -m backend.admin posters [--limit N]      # render pending card posters (media_posters.py)
+    python -m backend.admin gc [--dry-run] [--quota BYTES]  # media vault GC and quota (media_gc.py)
+    python -m backend.admin refresh [--limit N]      # download queued external media (media_refresh.py)
+    python -m backend.admin status                   # applied / pending migrations, bootstrap CSV
+
+Every job runs under a leader lock, so when several containers or uvicorn workers
+start together exactly one of them does the work and the others skip it
+(migrate waits for the running one instead, so nothing starts on a half-migrated
+schema): a Postgres advisory lock (session-scoped, released if the holder dies) or, on
+SQLite, an exclusive file lock next to the database.
+"""
+import contextlib
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, Optional
+
+from sqlalchemy import text
+
+from .database import sync_engine
+from .app_logging import get_logger
+
+BOOTSTRAP_CSV = os.getenv("BOOTSTRAP_CSV", "scalatracker_final.csv")
+
+log = get_logger("admin")
+
+
+class LockHeld(Exception):
+    """Another process holds the leader lock for this job."""
+
+
+def _lock_key(name: str) -> int:
+    # Stable signed 64-bit key for pg_try_advisory_lock
+    return int.from_bytes(hashlib.sha1(f"adscale:{name}".encode()).digest()[:8], "big", signed=True)
+
+
+@contextlib.contextmanager
+def leader_lock(name: str, engine=None, wait: bool = False):
+    """
+    Non-blocking by default: raises LockHeld when another process already runs
+    `name`. With wait=True it blocks until that process releases the lock.
+    """
+    engine = engine or sync_engine
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            key = _lock_key(name)
+            if wait:
+                conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": key})
+            elif not conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": key}).scalar():
+                raise LockHeld(name)
+            conn.commit()
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": key})
+                conn.commit()
+        return
+
+    import fcntl
+    database = engine.url.database
+    directory = os.path.dirname(os.path.abspath(database)) if database and database != ":memory:" else tempfile.gettempdir()
+    path = os.path.join(directory, f".adscale-{name}.lock")
+    with open(path, "w") as handle:
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise LockHeld(name)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def migrate(engine=None) -> Dict[str, object]:
+    """
+    Waits for a migration running in another process instead of skipping it, so
+    the caller never starts serving against a half-migrated schema.
+    """
+    from .migrations import run_migrations, pending_migrations
+    engine = engine or sync_engine
+    with leader_lock("migrate", engine, wait=True):
+        applied = run_migrations(engine)
+        pending = [version for version, _, _ in pending_migrations(engine)]
+    if pending:
+        raise RuntimeError(f"Migrations still pending after migrate: {pending}")
+    return {"status": "done", "applied": applied}
+
+
+def bootstrap(csv_path: str = BOOTSTRAP_CSV, engine=None) -> Dict[str, object]:
+    """
+    Former auto-init: full wipe, streaming import of `csv_path`, removal of ads
+    whose media could not be persisted, then the CSV is renamed to *.done so the
+    job never runs twice for the same file.
+    """
+    engine = engine or sync_engine
+    try:
+        with leader_lock("bootstrap", engine):
+            if not os.path.exists(csv_path):
+                return {"status": "nothing-to-do", "csv": csv_path}
+            from clean_ads import clean_ads
+            from bulk_importer import run_bulk_import
+            start = time.time()
+            log.info(f"[Bootstrap] Starting full wipe before importing {csv_path}...")
+            clean_ads(full_wipe=True)
+            log.info("[Bootstrap] Starting turbo import...")
+            run_bulk_import(csv_path)
+            log.info("[Bootstrap] Queueing failed downloads for refresh...")
+            clean_ads(full_wipe=False) # Queue ads with external (expiring) links
+            os.rename(csv_path, f"{csv_path}.done")
+            log.info(f"[Bootstrap] Done in {time.time() - start:.1f}s.")
+            return {"status": "done", "csv": csv_path, "seconds": round(time.time() - start, 1)}
+    except LockHeld:
+        log.info("[Bootstrap] Already running in another process, skipping")
+        return {"status": "skipped", "csv": csv_path}
+
+
+def enqueue_bootstrap(csv_path: str = BOOTSTRAP_CSV) -> Optional[str]:
+    """Queues bootstrap_import_task when there is something to import; returns the task id."""
+    if not os.path.exists(csv_path):
+        return None
+    from .tasks import bootstrap_import_task
+    return bootstrap_import_task.delay(csv_path).id
+
+
+def posters(limit: Optional[int] = None, engine=None) -> Dict[str, object]:
+    from .media_posters import generate_posters, POSTER_BATCH
+    engine = engine or sync_engine
+    try:
+        with leader_lock("posters", engine):
+            return {"status": "done", **generate_posters(limit or POSTER_BATCH, engine=engine)}
+    except LockHeld:
+        log.info("[Admin] Posters already rendering in another process, skipping")
+        return {"status": "skipped"}
+
+
+def media_gc(quota: Optional[int] = None, grace: Optional[int] = None, dry_run: bool = False,
+             engine=None) -> Dict[str, object]:
+    from .media_gc import collect_garbage, GC_GRACE_SECONDS
+    engine = engine or sync_engine
+    try:
+        with leader_lock("media-gc", engine):
+            summary = collect_garbage(engine, quota=quota, dry_run=dry_run,
+                                      grace=GC_GRACE_SECONDS if grace is None else grace)
+            log.info(f"[MediaGC] Reclaimed {summary['reclaimedBytes'] + summary['evictedBytes']} bytes: {summary}")
+            return {"status": "done", **summary}
+    except LockHeld:
+        log.info("[Admin] Media GC already running in another process, skipping")
+        return {"status": "skipped"}
+
+
+def media_refresh(limit: Optional[int] = None, engine=None) -> Dict[str, object]:
+    from .media_refresh import run_refresh_cycle, REFRESH_BATCH
+    engine = engine or sync_engine
+    try:
+        with leader_lock("media-refresh", engine):
+            report = run_refresh_cycle(engine, limit=limit or REFRESH_BATCH)
+            log.info(f"[MediaRefresh] {report['downloaded']}/{report['due']} downloaded "
+                     f"({report['perMinute']}/min), {report['expiryMisses']} expiry misses: {report}")
+            return {"status": "done", **report}
+    except LockHeld:
+        log.info("[Admin] Media refresh already running in another process, skipping")
+        return {"status": "skipped"}
+
+
+def status(engine=None) -> Dict[str, object]:
+    from .migrations import applied_versions, pending_migrations
+    engine = engine or sync_engine
+    return {
+        "applied": applied_versions(engine),
+        "pending": [f"{v}_{n}" for v, n, _ in pending_migrations(engine)],
+        "bootstrapCsv": BOOTSTRAP_CSV if os.path.exists(BOOTSTRAP_CSV) else None,
+    }
+
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    command = argv[0] if argv else "help"
+    csv_path = argv[argv.index("--csv") + 1] if "--csv" in argv else BOOTSTRAP_CSV
+    if command == "migrate":
+        result = migrate()
+    elif command == "bootstrap" and "--enqueue" in argv:
+        task_id = enqueue_bootstrap(csv_path)
+        result = {"status": "queued", "task_id": task_id} if task_id else {"status": "nothing-to-do", "csv": csv_path}
+    elif command == "bootstrap":
+        result = bootstrap(csv_path)
+    elif command == "posters":
+        result = posters(int(argv[argv.index("--limit") + 1]) if "--limit" in argv else None)
+    elif command == "gc":
+        result = media_gc(int(argv[argv.index("--quota") + 1]) if "--quota" in argv else None,
+                          dry_run="--dry-run" in argv)
+    elif command == "refresh":
+        result = media_refresh(int(argv[argv.index("--limit") + 1]) if "--limit" in argv else None)
+    elif command == "status":
+        result = status()
+    else:
+        print(__doc__)
+        return 0 if command in ("help", "-h", "--help") else 2
+    print(f"[Admin] {command}: {result}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
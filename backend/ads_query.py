@@ -0,0 +1,163 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+
+from fastapi import HTTPException
+from sqlalchemy import select, tuple_, func
+
+from .models import AdModel, AdFingerprintModel
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# recent: (addedAt, id) desc; velocity: (velocity, id) desc, scaling-velocity top-K
+SORTS = ("recent", "velocity")
+
+# Columns rendered by components/AdCard.tsx. Heavy fields (insights, forensicData,
+# siteTraffic, techStack...) are only served by the full projection.
+CARD_COLUMNS = [
+    AdModel.id,
+    AdModel.title,
+    AdModel.brandLogo,
+    AdModel.platform,
+    AdModel.niche,
+    AdModel.type,
+    AdModel.status,
+    AdModel.thumbnail,
+    AdModel.mediaUrl,
+    AdModel.copy,
+    AdModel.rating,
+    AdModel.addedAt,
+    AdModel.adCount,
+    AdModel.ticketPrice,
+    AdModel.performance,
+    AdModel.targeting,
+    AdModel.tld,
+    AdModel.velocity,
+    AdModel.acceleration,
+    AdModel.mediaEvictedAt,
+]
+
+# Every field of AdModel.to_dict(), read as plain rows: no ORM identity map or
+# object hydration, the dicts go straight to the orjson encoder.
+FULL_COLUMNS = [
+    AdModel.id, AdModel.title, AdModel.brandId, AdModel.brandLogo, AdModel.platform, AdModel.niche,
+    AdModel.type, AdModel.status, AdModel.tags, AdModel.thumbnail, AdModel.mediaUrl, AdModel.mediaHash,
+    AdModel.copy, AdModel.cta, AdModel.insights, AdModel.rating, AdModel.addedAt, AdModel.adCount,
+    AdModel.ticketPrice, AdModel.funnelType, AdModel.salesPageUrl, AdModel.checkoutUrl, AdModel.libraryUrl,
+    AdModel.performance, AdModel.siteTraffic, AdModel.techStack, AdModel.targeting, AdModel.forensicData,
+    AdModel.pixels, AdModel.tld, AdModel.velocity, AdModel.acceleration, AdModel.mediaEvictedAt,
+]
+# Legacy ?full=true dump: the fields of the Ad schema
+DUMP_COLUMNS = [c for c in FULL_COLUMNS if c.key not in ("pixels", "tld")]
+
+
+def encode_cursor(added_at: Optional[datetime], ad_id: str) -> str:
+    raw = json.dumps({"a": added_at.isoformat() if added_at else None, "i": ad_id})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def encode_velocity_cursor(velocity: Optional[float], ad_id: str) -> str:
+    raw = json.dumps({"v": velocity or 0.0, "i": ad_id})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str = "recent"):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if sort == "velocity":
+            return float(data["v"]), str(data["i"])
+        # "a" is null in cursors issued before addedAt was backfilled (migration 0013)
+        return (datetime.fromisoformat(data["a"]) if data["a"] is not None else None), str(data["i"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def apply_filters(stmt, ids: Optional[List[str]] = None, niche: Optional[str] = None, platform: Optional[str] = None,
+                  status: Optional[str] = None, tld: Optional[str] = None,
+                  min_ad_count: Optional[int] = None, max_ad_count: Optional[int] = None,
+                  collapse: bool = False):
+    """Adds the library filters as plain column predicates so they can hit the ads indexes."""
+    if ids:
+        # Favorites and other explicit selections resolve through the primary key
+        stmt = stmt.where(AdModel.id.in_(ids))
+    if niche:
+        stmt = stmt.where(AdModel.niche == niche)
+    if platform:
+        stmt = stmt.where(AdModel.platform == platform)
+    if status:
+        stmt = stmt.where(AdModel.status == status)
+    if tld:
+        stmt = stmt.where(AdModel.tld == tld)
+    if min_ad_count is not None:
+        stmt = stmt.where(AdModel.adCount >= min_ad_count)
+    if max_ad_count is not None:
+        stmt = stmt.where(AdModel.adCount <= max_ad_count)
+    if collapse:
+        # Near-duplicates (see ad_fingerprints.py): only the canonical ad of each cluster
+        fp = AdFingerprintModel.__table__
+        stmt = stmt.where(~select(fp.c.ad_id).where(fp.c.ad_id == AdModel.id, fp.c.duplicate_of.isnot(None)).exists())
+    return stmt
+
+
+def apply_keyset(stmt, cursor: Optional[str], sort: str = "recent"):
+    """Orders by (addedAt, id) descending and resumes strictly after the cursor row."""
+    if sort == "velocity":
+        if cursor:
+            velocity, ad_id = decode_cursor(cursor, sort)
+            stmt = stmt.where(tuple_(AdModel.velocity, AdModel.id) < tuple_(velocity, ad_id))
+        # Matches ix_ads_velocity_id scanned backwards: top-K without sorting the library
+        return stmt.order_by(AdModel.velocity.desc(), AdModel.id.desc())
+    if cursor:
+        added_at, ad_id = decode_cursor(cursor)
+        if added_at is None:
+            # Stale cursor from the null tail, which sorted last: those rows now carry the oldest date
+            oldest = select(func.min(AdModel.addedAt)).scalar_subquery()
+            stmt = stmt.where(AdModel.addedAt == oldest, AdModel.id < ad_id)
+        else:
+            # Row-value comparison lets both SQLite and Postgres seek the composite index
+            stmt = stmt.where(tuple_(AdModel.addedAt, AdModel.id) < tuple_(added_at, ad_id))
+    # Matches ix_ads_added_at_id (and the per-filter composites) scanned backwards
+    return stmt.order_by(AdModel.addedAt.desc(), AdModel.id.desc())
+
+
+def row_to_dict(row) -> Dict[str, Any]:
+    data = dict(row._mapping)
+    added_at = data.get("addedAt")
+    data["addedAt"] = added_at.isoformat() if added_at else None
+    if data.get("mediaEvictedAt"):
+        data["mediaEvictedAt"] = data["mediaEvictedAt"].isoformat()
+    if "tags" in data and data["tags"] is None:
+        data["tags"] = []
+    return data
+
+
+def build_page_query(view: str = "card", cursor: Optional[str] = None,
+                     limit: int = DEFAULT_PAGE_SIZE, sort: str = "recent", **filters):
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    stmt = select(*CARD_COLUMNS) if view == "card" else select(*FULL_COLUMNS)
+    stmt = apply_filters(stmt, **filters)
+    stmt = apply_keyset(stmt, cursor, sort)
+    # Fetch one extra row to know whether another page exists
+    return stmt.limit(limit + 1), limit
+
+
+def build_page(rows: List[Any], limit: int, sort: str = "recent") -> Dict[str, Any]:
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    items = [row_to_dict(r) for r in rows]
+
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        if sort == "velocity":
+            next_cursor = encode_velocity_cursor(last.velocity, last.id)
+        else:
+            next_cursor = encode_cursor(last.addedAt, last.id)
+
+    return {"items": items, "nextCursor": next_cursor, "count": len(items)}
+
+
+def build_dump_query():
+    return select(*DUMP_COLUMNS).order_by(AdModel.addedAt.desc())
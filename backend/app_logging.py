@@ -0,0 +1,230 @@
+"""
+Application logging for the API and the Celery workers.
+
+Log calls only merge the message arguments and put the record on an in-memory
+queue; a background listener thread formats it and does the I/O, so the event
+loop never blocks on disk. If the queue is full the record is dropped and
+counted instead of blocking the caller.
+
+The Docker image sets LOG_FILE=- so every process logs to stderr (`docker logs`).
+When logging to a file, several processes (uvicorn workers, Celery prefork
+children) append to it, so by default nobody rotates it in-process: the file is
+reopened when an external logrotate moves it (WatchedFileHandler). Size-based
+rotation (LOG_MAX_BYTES > 0) is only safe with a single writer; forked
+children never rotate.
+
+Configuration (env):
+    LOG_FILE               backend_debug.log   ("-" = stderr only)
+    LOG_LEVEL              INFO
+    LOG_FORMAT             text | json
+    LOG_REQUEST_SAMPLE     1.0   fraction of per-request lines kept (errors and slow requests are always kept)
+    LOG_SLOW_REQUEST_MS    1000
+    LOG_MAX_BYTES          0 (external rotation), LOG_BACKUP_COUNT 5   in-process rotation, single writer only
+    LOG_QUEUE_SIZE         10000
+
+    log = get_logger("api")
+    log.info("Import request received", extra={"fields": {"ads": 120}})
+"""
+import atexit
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from typing import Any, Dict, Optional
+
+LOG_FILE = os.getenv("LOG_FILE", "backend_debug.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_REQUEST_SAMPLE = float(os.getenv("LOG_REQUEST_SAMPLE", "1.0"))
+LOG_SLOW_REQUEST_MS = float(os.getenv("LOG_SLOW_REQUEST_MS", "1000"))
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", "0"))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+ROOT_LOGGER = "adscale"
+REQUEST_LOGGER = ROOT_LOGGER + ".request"
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra={"fields": {...}}` is merged in."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.datetime.utcfromtimestamp(record.created).isoformat() + "Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s [%(name)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return line
+
+
+class RequestSampler(logging.Filter):
+    """Keeps a fraction of per-request lines; warnings and above always pass."""
+
+    def __init__(self, rate: float = LOG_REQUEST_SAMPLE):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Never blocks the caller: a full queue drops the record."""
+
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        if _state["pid"] != os.getpid():
+            # Forked child (Celery prefork, uvicorn workers): the writer thread did not survive fork()
+            _restart_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DroppingQueueHandler.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only merge the args here; formatting and I/O happen in the writer thread
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_lock = threading.Lock()
+_state: Dict[str, Any] = {"pid": None, "listener": None, "handler": None, "targets": None}
+
+
+def _formatter(fmt: str) -> logging.Formatter:
+    return JsonFormatter() if fmt == "json" else TextFormatter()
+
+
+def _target_handlers(log_file: str, fmt: str):
+    handlers = []
+    if log_file and log_file != "-" and LOG_MAX_BYTES > 0:
+        handlers.append(logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8", delay=True))
+    elif log_file and log_file != "-":
+        handlers.append(logging.handlers.WatchedFileHandler(log_file, encoding="utf-8", delay=True))
+    if not handlers or os.getenv("LOG_STDERR", "0") in ("1", "true", "True"):
+        handlers.append(logging.StreamHandler(sys.stderr))
+    for handler in handlers:
+        handler.setFormatter(_formatter(fmt))
+    return handlers
+
+
+def _stop_listener():
+    listener = _state["listener"]
+    if listener is not None and _state["pid"] == os.getpid():
+        try:
+            listener.stop() # drains the queue
+        except Exception:
+            pass
+    _state["listener"] = None
+
+
+def _child_target(target: logging.Handler) -> logging.Handler:
+    # Only the process that configured logging rotates; a forked child that rotated
+    # too would race it and write into already renamed files
+    if not isinstance(target, logging.handlers.RotatingFileHandler):
+        return target
+    child = logging.handlers.WatchedFileHandler(target.baseFilename, encoding="utf-8", delay=True)
+    child.setFormatter(target.formatter)
+    return child
+
+
+def _restart_listener():
+    with _lock:
+        if _state["pid"] == os.getpid():
+            return
+        handler = _state["handler"]
+        handler.queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        _state["targets"] = [_child_target(target) for target in _state["targets"]]
+        listener = logging.handlers.QueueListener(handler.queue, *_state["targets"], respect_handler_level=True)
+        listener.start()
+        _state.update(pid=os.getpid(), listener=listener)
+
+
+def setup_logging(log_file: Optional[str] = None, level: Optional[str] = None, fmt: Optional[str] = None,
+                  request_sample: Optional[float] = None, force: bool = False) -> logging.Logger:
+    """
+    Installs the queue handler on the `adscale` logger and starts the writer thread.
+    Idempotent unless `force` (used to reconfigure, e.g. by benchmarks).
+    """
+    with _lock:
+        root = logging.getLogger(ROOT_LOGGER)
+        if _state["handler"] is not None:
+            if not force:
+                return root
+            _stop_listener()
+            root.removeHandler(_state["handler"])
+
+        targets = _target_handlers(log_file or LOG_FILE, fmt or LOG_FORMAT)
+        handler = _DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+        listener = logging.handlers.QueueListener(handler.queue, *targets, respect_handler_level=True)
+        listener.start()
+
+        root.addHandler(handler)
+        root.setLevel(level or LOG_LEVEL)
+        root.propagate = False
+        request_logger = logging.getLogger(REQUEST_LOGGER)
+        for existing in [f for f in request_logger.filters if isinstance(f, RequestSampler)]:
+            request_logger.removeFilter(existing)
+        request_logger.addFilter(RequestSampler(LOG_REQUEST_SAMPLE if request_sample is None else request_sample))
+
+        _state.update(pid=os.getpid(), listener=listener, handler=handler, targets=targets)
+        return root
+
+
+def get_logger(name: str) -> logging.Logger:
+    """`adscale.<name>` logger; sets up the queue handler on first use."""
+    if _state["handler"] is None:
+        setup_logging()
+    return logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+
+def dropped_records() -> int:
+    return _DroppingQueueHandler.dropped
+
+
+def flush_logs():
+    """Blocks until queued records are written (shutdown, scripts, benchmarks)."""
+    _stop_listener()
+    if _state["handler"] is not None:
+        _state["pid"] = None # next record restarts the writer thread
+
+
+def _after_fork_in_child():
+    global _lock
+    _lock = threading.Lock() # may have been held by another thread at fork time
+
+
+atexit.register(_stop_listener)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
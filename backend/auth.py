@@ -1,5 +1,5 @@
 
-from passlib.context import CryptContext
+import functools
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
@@ -20,15 +20,19 @@ ALGORITHM = "HS256"
 # Default to 60 minutes if not set
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
 
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+@functools.lru_cache(maxsize=1)
+def pwd_context():
+    # passlib is only needed on login / register, not to serve authenticated requests
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
 
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return pwd_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return pwd_context().hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
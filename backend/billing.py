@@ -1,6 +1,6 @@
 
 
-import stripe
+import functools
 import os
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -11,6 +11,7 @@ from .models import UserModel, TransactionModel, SubscriptionEventModel, Checkou
 
 
 from .database import SessionLocal
+from .principals import invalidate_principal, access_until_from_subscriptions
 import datetime
 import json
 
@@ -18,7 +19,13 @@ import json
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY", "sk_test_PLACEHOLDER")
 STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET", "whsec_PLACEHOLDER")
 
-stripe.api_key = STRIPE_SECRET_KEY
+
+@functools.lru_cache(maxsize=1)
+def _stripe():
+    # The SDK is only needed by checkout / webhook requests; keep it out of worker spawn
+    import stripe
+    stripe.api_key = STRIPE_SECRET_KEY
+    return stripe
 
 class BillingService:
 
@@ -90,6 +97,7 @@ class BillingService:
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
 
+        stripe = _stripe()
         # Criar Customer se precisar
         if not user.stripe_customer_id:
             try:
@@ -162,7 +170,7 @@ class BillingService:
         if not tx:
              # Fallback Read-only
              try:
-                intent = stripe.PaymentIntent.retrieve(transaction_id)
+                intent = _stripe().PaymentIntent.retrieve(transaction_id)
                 if intent.status == 'succeeded':
                      return {"status": "succeeded", "amount": intent.amount}
                 return {"status": "pending", "amount": intent.amount}
@@ -181,6 +189,7 @@ class BillingService:
     @staticmethod
     async def process_webhook(payload: bytes, sig_header: str):
         event = None
+        stripe = _stripe()
 
         try:
             event = stripe.Webhook.construct_event(
@@ -203,19 +212,32 @@ class BillingService:
             )
             db.add(audit)
             
+            # Handlers return the email of the user whose access changed (if any)
+            affected = None
             if event_type == 'payment_intent.succeeded':
-                await BillingService._handle_payment_success(db, data)
+                affected = await BillingService._handle_payment_success(db, data)
             elif event_type == 'payment_intent.payment_failed':
                 await BillingService._handle_payment_failure(db, data)
             elif event_type == 'invoice.paid':
-                await BillingService._handle_invoice_paid(db, data)
+                affected = await BillingService._handle_invoice_paid(db, data)
             elif event_type == 'customer.subscription.deleted':
-                await BillingService._handle_subscription_deleted(db, data)
+                affected = await BillingService._handle_subscription_deleted(db, data)
             
             await db.commit()
 
+        # Entitlement is cached with the principal; drop it so the change applies now
+        if affected:
+            await invalidate_principal(affected)
+
         return {"status": "success"}
 
+    @staticmethod
+    async def _refresh_entitlement(db: AsyncSession, user: UserModel):
+        """Recomputes the user's access snapshot (users.access_until) from their subscriptions."""
+        await db.flush()
+        subs = await db.execute(select(SubscriptionModel).where(SubscriptionModel.user_id == user.id))
+        user.access_until = access_until_from_subscriptions(subs.scalars().all())
+
     @staticmethod
     async def _handle_payment_success(db: AsyncSession, payment_intent):
         intent_id = payment_intent['id']
@@ -292,7 +314,9 @@ class BillingService:
             )
             db.add(sub)
             
+        await BillingService._refresh_entitlement(db, user)
         print(f"ACCESS GRANTED: User {user.email} is now PRO (Subscription Updated).")
+        return user.email
 
     @staticmethod
     async def _handle_payment_failure(db: AsyncSession, payment_intent):
@@ -345,7 +369,9 @@ class BillingService:
             )
             db.add(sub)
         
+        await BillingService._refresh_entitlement(db, user)
         print(f"AUDIT: Invoice paid for User {user.email}. Access extended.")
+        return user.email
 
     @staticmethod
     async def _handle_subscription_deleted(db: AsyncSession, subscription):
@@ -365,6 +391,8 @@ class BillingService:
             if user:
                 user.subscriptionActive = False
                 user.subscriptionPlan = None
+                await BillingService._refresh_entitlement(db, user)
                 print(f"AUDIT: Subscription deleted for User {user.email}. Access revoked.")
+                return user.email
         else:
              print(f"AUDIT WARN: Deleted unknown subscription {subscription_id}")
@@ -0,0 +1,93 @@
+"""
+Keyword classifiers shared by the CSV importer, the landing-page scanner and the
+/ads create path.
+
+Each taxonomy is compiled once into a flat, priority-ordered keyword table.
+`classify` returns the label of the first rule with any keyword in the text
+(same semantics as the old chained `any(x in desc ...)` checks), and
+`classify_many` classifies a batch, scanning each distinct text only once.
+
+Plain `in` checks against the compiled table beat a combined regex and a
+pure-Python Aho-Corasick automaton on CPython for these short keyword lists;
+see benchmarks/bench_classifier.py.
+"""
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+NICHE_RULES = [
+    ("Saúde & Bem-estar", ['saúde', 'dieta', 'emagrecer', 'fit', 'corpo', 'workout', 'gym']),
+    ("Finanças & Investimentos", ['dinheiro', 'lucro', 'investimento', 'milhas', 'finanças', 'crypto']),
+    ("iGaming & Apostas", ['aposta', 'bet', 'tiger', 'cassino', 'jogo', 'slot']),
+    ("E-commerce & Dropshipping", ['loja', 'frete', 'comprar', 'entrega', 'oferta', 'desconto']),
+    ("Infoprodutos & Educação", ['curso', 'mentor', 'aula', 'vender', 'marketing']),
+]
+DEFAULT_NICHE = "Negócios"
+
+REGION_RULES = [
+    ("Brasil", ['brazil', 'brasil', ' br']),
+    ("Estados Unidos", ['usa', 'united states', ' us']),
+    ("Colômbia", ['colombia']),
+    ("Paraguai", ['paraguay', 'py']),
+]
+DEFAULT_REGION = "Brasil"
+REGION_CODES = {"Brasil": "BR", "Estados Unidos": "US"}
+
+# Landing-page taxonomy used by AdScanner (labels are shown as-is in the scanner modal)
+PAGE_NICHE_RULES = [
+    ("BLACK", ['suplemento', 'libido', 'renda extra', 'investimento', 'apostas', 'cassino']),
+    ("SAÚDE", ['emagrecer', 'dieta', 'pele', 'cabelo', 'dor', 'natural']),
+    ("TECH", ['software', 'app', 'ai', 'curso', 'digital', 'ebook']),
+    ("E-COM", ['frete grátis', 'oferta', 'desconto', 'loja', 'comprar']),
+]
+DEFAULT_PAGE_NICHE = "Outros"
+
+TECH_STACK_RULES = [
+    ("shopify", ['shopify']),
+    ("wordpress", ['wp-content']),
+    ("vtex", ['vtex']),
+    ("ticto", ['ticto']),
+    ("kiwify", ['kiwify']),
+]
+
+
+class KeywordTaxonomy:
+    def __init__(self, rules: Sequence[Tuple[str, Sequence[str]]], default: Optional[str] = None):
+        self.labels = [label for label, _ in rules]
+        self.default = default
+        # Flat (keyword, label) table in rule priority order; first hit wins
+        self._table = tuple((kw.lower(), label) for label, keywords in rules for kw in keywords)
+
+    def classify(self, text: Optional[str], lowered: bool = False) -> Optional[str]:
+        if not text:
+            return self.default
+        if not lowered:
+            text = text.lower()
+        for keyword, label in self._table:
+            if keyword in text:
+                return label
+        return self.default
+
+    def classify_many(self, texts: Iterable[Optional[str]]) -> List[Optional[str]]:
+        """Classifies a batch; repeated texts (common in scalatracker exports) are scanned once."""
+        seen = {}
+        out = []
+        for text in texts:
+            label = seen.get(text)
+            if label is None and text not in seen:
+                label = seen[text] = self.classify(text)
+            out.append(label)
+        return out
+
+    def matches(self, text: Optional[str], lowered: bool = False) -> List[str]:
+        """Every label with a keyword in the text, in rule order (multi-label taxonomies)."""
+        if not text:
+            return []
+        if not lowered:
+            text = text.lower()
+        found = {label for keyword, label in self._table if keyword in text}
+        return [label for label in self.labels if label in found]
+
+
+NICHE = KeywordTaxonomy(NICHE_RULES, DEFAULT_NICHE)
+REGION = KeywordTaxonomy(REGION_RULES, DEFAULT_REGION)
+PAGE_NICHE = KeywordTaxonomy(PAGE_NICHE_RULES, DEFAULT_PAGE_NICHE)
+TECH_STACK = KeywordTaxonomy(TECH_STACK_RULES)
@@ -1,5 +1,6 @@
 
 import os
+import orjson
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 
@@ -15,6 +16,8 @@ if "sqlite" in DATABASE_URL:
 engine_kwargs = {
     "echo": False, # Set to False in production
     "connect_args": connect_args,
+    # JSON columns (tags, performance, targeting...) are decoded on every listing row
+    "json_deserializer": orjson.loads,
 }
 
 if "postgresql" in DATABASE_URL:
@@ -48,7 +51,7 @@ if "postgresql" in SYNC_DATABASE_URL and "psycopg2" not in SYNC_DATABASE_URL:
      # If it was just postgresql:// it defaults to psycopg2 usually, but let's be safe if we stripped asyncpg
      pass
 
-sync_engine = create_engine(SYNC_DATABASE_URL, echo=False)
+sync_engine = create_engine(SYNC_DATABASE_URL, echo=False, json_deserializer=orjson.loads)
 SyncSessionLocal = sync_sessionmaker(autocommit=False, autoflush=False, bind=sync_engine)
 
 def get_sync_db():
@@ -5,6 +5,7 @@ from sqlalchemy.future import select
 from .database import get_db
 from .models import UserModel
 from .auth import decode_access_token
+from .principals import resolve_principal
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
@@ -20,7 +21,15 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
     if email is None:
         raise HTTPException(status_code=401, detail="Invalid token")
         
-    result = await db.execute(select(UserModel).where(UserModel.email == email))
+    # Cached principal (id, email, role, entitlement); no DB round trip when warm
+    principal = await resolve_principal(db, email)
+    if principal is None:
+        raise HTTPException(status_code=401, detail="User not found")
+    return principal
+
+async def get_current_user_record(current_user = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    """The full UserModel row, for endpoints that read profile fields or modify the user."""
+    result = await db.execute(select(UserModel).where(UserModel.id == current_user.id))
     user = result.scalars().first()
     if user is None:
         raise HTTPException(status_code=401, detail="User not found")
@@ -0,0 +1,136 @@
+"""
+Set-based ad ingestion shared by the Celery import task and bulk_importer.py.
+
+Rows are staged in batches and written with one `INSERT ... ON CONFLICT DO UPDATE`
+plus one multi-row `ad_history` insert (ads whose adCount changed) per batch,
+committed once per batch.
+If a batch fails, it is replayed row by row so errors are still reported per ad.
+Each batch also moves the /analytics/library snapshot by the delta of the rows it touched,
+and advances every ad's scaling velocity from its previous values (velocity.py).
+Copy and vault-media fingerprints are refreshed in the same transaction, which
+merges new near-duplicates into their clusters (ad_fingerprints.py).
+"""
+from typing import List, Dict, Any, Iterable
+
+from sqlalchemy.dialects import postgresql, sqlite
+
+from .database import sync_engine
+from .models import AdModel
+from .library_analytics import library_rows, apply_library_delta
+from .ad_history import changed_points, record_points
+from .velocity import VELOCITY_COLUMNS, score_rows
+from .ad_fingerprints import fingerprint_ads
+from .media_vault import sha_from_path
+
+DEFAULT_BATCH_SIZE = 500
+
+AD_COLUMNS = {c.name for c in AdModel.__table__.columns}
+
+
+def dialect_insert(dialect_name: str):
+    if dialect_name == "postgresql":
+        return postgresql.insert
+    if dialect_name == "sqlite":
+        return sqlite.insert
+    raise RuntimeError(f"Bulk upsert not supported on dialect '{dialect_name}'")
+
+
+def _clean_row(ad: Dict[str, Any]) -> Dict[str, Any]:
+    row = {k: v for k, v in ad.items() if k in AD_COLUMNS}
+    if not row.get("id"):
+        raise ValueError("missing ad id")
+    row["id"] = str(row["id"])
+    if row.get("addedAt", 0) is None:
+        # NOT NULL (keyset pagination): new ads get the insert default, existing ones keep theirs
+        del row["addedAt"]
+    # mediaHash is owned by the server: the SHA-256 of the creative once it is in the vault
+    row.pop("mediaHash", None)
+    row.pop("mediaEvictedAt", None)
+    if "mediaUrl" in row:
+        row["mediaHash"] = sha_from_path(row["mediaUrl"])
+        # A re-imported creative replaces the poster an eviction left
+        row["mediaEvictedAt"] = None
+    return row
+
+
+def _upsert_statement(insert, columns: Iterable[str]):
+    stmt = insert(AdModel.__table__)
+    updates = {c: stmt.excluded[c] for c in columns if c != "id"}
+    if not updates:
+        return stmt.on_conflict_do_nothing(index_elements=[AdModel.__table__.c.id])
+    return stmt.on_conflict_do_update(index_elements=[AdModel.__table__.c.id], set_=updates)
+
+
+def _write_batch(conn, insert, rows: List[Dict[str, Any]], before):
+    # Scoring stage: O(1) per ad from the pre-write values, no history scan
+    rows = score_rows(rows, {r.id: r for r in before})
+    # Rows with different key sets cannot share one multi-row statement
+    groups: Dict[frozenset, List[Dict[str, Any]]] = {}
+    for r in rows:
+        groups.setdefault(frozenset(r), []).append(r)
+    for columns, group in groups.items():
+        conn.execute(_upsert_statement(insert, columns), group)
+    # History is run-length encoded: only ads whose adCount changed get a point
+    record_points(conn, changed_points(rows, {r.id: r.adCount for r in before}))
+    fingerprint_ads(conn, rows)
+
+
+def upsert_ads(ads: Iterable[Dict[str, Any]], batch_size: int = DEFAULT_BATCH_SIZE,
+               engine=None, log=print) -> Dict[str, Any]:
+    """
+    Upserts ads (dicts keyed by AdModel column names) and appends a history point
+    for each new ad and each ad whose adCount changed.
+    Returns {"created", "updated", "errors", "failed": [{"id", "error"}]}.
+    """
+    engine = engine or sync_engine
+    insert = dialect_insert(engine.dialect.name)
+    report = {"created": 0, "updated": 0, "errors": 0, "failed": []}
+
+    def fail(ad_id, error):
+        report["errors"] += 1
+        report["failed"].append({"id": ad_id, "error": str(error)})
+        log(f"Row Error for {ad_id}: {error}")
+
+    batch: Dict[str, Dict[str, Any]] = {}
+
+    def flush():
+        if not batch:
+            return
+        rows = list(batch.values())
+        ids = list(batch.keys())
+        try:
+            with engine.begin() as conn:
+                before = library_rows(conn, ids, VELOCITY_COLUMNS)
+                existing = {r.id for r in before}
+                _write_batch(conn, insert, rows, before)
+                apply_library_delta(conn, before, library_rows(conn, ids))
+            report["updated"] += len(existing)
+            report["created"] += len(rows) - len(existing)
+        except Exception as e:
+            log(f"Batch of {len(rows)} failed ({e}), replaying row by row")
+            for row in rows:
+                try:
+                    with engine.begin() as conn:
+                        existed = library_rows(conn, [row["id"]], VELOCITY_COLUMNS)
+                        _write_batch(conn, insert, [row], existed)
+                        apply_library_delta(conn, existed, library_rows(conn, [row["id"]]))
+                    report["updated" if existed else "created"] += 1
+                except Exception as row_e:
+                    fail(row["id"], row_e)
+        batch.clear()
+
+    for ad in ads:
+        try:
+            row = _clean_row(ad)
+        except Exception as e:
+            fail(ad.get("id") if isinstance(ad, dict) else None, e)
+            continue
+        if row["id"] in batch:
+            # Same ad twice in one batch: ON CONFLICT cannot touch a row twice per statement
+            flush()
+        batch[row["id"]] = row
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    return report
@@ -0,0 +1,243 @@
+"""
+Library-wide intelligence (the `LibraryIntelligence` structure of
+services/intelligenceEngine.ts), computed on the server.
+
+The library is reduced to a small set of additive accumulators (counts and
+sums per platform, survival buckets, ticket value counts) stored as one row of
+`analytics_snapshots`. A full rebuild streams only the columns involved; after
+that, ingestion applies deltas (subtract the old projection of the touched ads,
+add the new one) in the same transaction as the write, so the snapshot stays
+current without rescanning the library. The endpoint turns the accumulators
+into the final structure in O(platforms).
+
+A rebuild scans and saves while holding the snapshot row's FOR UPDATE lock,
+the one every delta takes: writes committing meanwhile wait for it and are
+applied on top. The row is created first (unbuilt, updated_at NULL) so there
+is always a lock to take, and written with an upsert, so concurrent first
+reads cannot collide on the primary key.
+"""
+import datetime
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import select
+
+from .database import sync_engine
+from .models import AdModel, AnalyticsSnapshotModel
+
+SNAPSHOT_KEY = "library"
+# Values of types.ts Platform; always reported, even with no ads
+PLATFORMS = ["Meta Ads", "TikTok Ads", "Google Ads"]
+# AdStatus.SCALING in the frontend, 'Escala' as written by the CSV importer
+SCALING_STATUSES = {"Escalando", "Escala"}
+
+PROJECTION = (AdModel.id, AdModel.platform, AdModel.status, AdModel.adCount,
+              AdModel.ticketPrice, AdModel.performance)
+
+_TICKET_CHARS = re.compile(r"[^\d.,]")
+_LEADING_FLOAT = re.compile(r"\d+(?:\.\d*)?|\.\d+")
+
+
+def parse_ticket(value: Optional[str]) -> Optional[float]:
+    """Same as the frontend's parseFloat(ticket.replace(/[^\\d.,]/g, '').replace(',', '.'))."""
+    cleaned = _TICKET_CHARS.sub("", value or "").replace(",", ".", 1)
+    match = _LEADING_FLOAT.match(cleaned)
+    return float(match.group()) if match else None
+
+
+def empty_state() -> Dict[str, Any]:
+    return {
+        "totalAds": 0, "scalingCount": 0, "daysToScaleSum": 0.0, "hype": 0,
+        "survival": {"infant": 0, "validated": 0, "legacy": 0},
+        "platforms": {},
+        "tickets": {},
+    }
+
+
+def _platform_state(state, platform):
+    return state["platforms"].setdefault(platform, {
+        "count": 0, "sumCtr": 0.0, "scalingCount": 0,
+        "scalingSumCtr": 0.0, "scalingSumDays": 0.0, "scalingSumAdCount": 0.0,
+    })
+
+
+def accumulate(state: Dict[str, Any], rows: Iterable, sign: int = 1):
+    """Adds (sign=1) or removes (sign=-1) the contribution of ad rows (PROJECTION columns)."""
+    survival, tickets = state["survival"], state["tickets"]
+    for row in rows:
+        perf = row.performance or {}
+        ctr = float(perf.get("estimatedCtr") or 0)
+        days = float(perf.get("daysActive") or 0)
+        count = row.adCount or 0
+        p = _platform_state(state, row.platform or "")
+
+        state["totalAds"] += sign
+        p["count"] += sign
+        p["sumCtr"] += sign * ctr
+
+        if row.status in SCALING_STATUSES:
+            p["scalingCount"] += sign
+            p["scalingSumCtr"] += sign * ctr
+            p["scalingSumDays"] += sign * days
+            p["scalingSumAdCount"] += sign * count
+            state["scalingCount"] += sign
+            state["daysToScaleSum"] += sign * days
+            ticket = parse_ticket(row.ticketPrice)
+            if ticket is not None:
+                key = repr(ticket)
+                tickets[key] = tickets.get(key, 0) + sign
+                if not tickets[key]:
+                    del tickets[key]
+
+        bucket = "infant" if days < 5 else "validated" if days <= 15 else "legacy"
+        survival[bucket] += sign
+
+        hype_limit = 7 if row.platform == "TikTok Ads" else 5
+        if ctr > hype_limit and days < 4 and count < 3:
+            state["hype"] += sign
+    return state
+
+
+def intelligence_from_state(state: Dict[str, Any], updated_at: Optional[datetime.datetime] = None) -> Optional[Dict[str, Any]]:
+    """Final LibraryIntelligence payload; None for an empty library (like analyzeLibrary)."""
+    total = state["totalAds"]
+    if total <= 0:
+        return None
+
+    platform_insights, baselines = {}, {}
+    names = PLATFORMS + sorted(p for p in state["platforms"] if p not in PLATFORMS)
+    for name in names:
+        s = state["platforms"].get(name) or _platform_state(empty_state(), name)
+        scaling_count = s["scalingCount"] or 1
+        total_count = s["count"] or 1
+        avg_ctr = s["scalingSumCtr"] / scaling_count
+        avg_days = s["scalingSumDays"] / scaling_count
+        avg_ad_count = s["scalingSumAdCount"] / scaling_count
+        platform_insights[name] = {
+            "platform": name,
+            "avgCtrAll": s["sumCtr"] / total_count,
+            "avgCtrScaling": avg_ctr,
+            "avgDaysActiveScaling": avg_days,
+            "avgAdCountScaling": avg_ad_count,
+            "scalingRate": s["scalingCount"] / total_count * 100,
+            "totalAds": s["count"],
+            "efficiencyIndex": avg_ad_count * avg_days / 100,
+        }
+        baselines[name] = {
+            "minCtrForScale": avg_ctr * 0.85,
+            "minDaysForScale": max(3, int(avg_days * 0.6)),
+            "minAdCountForScale": max(5, int(avg_ad_count * 0.4)),
+            "suspiciousCtrLimit": avg_ctr * 2.2,
+        }
+
+    tickets = {float(k): n for k, n in state["tickets"].items() if n > 0}
+    ticket_count = sum(tickets.values())
+    survival = state["survival"]
+    return {
+        "globalStats": {
+            "totalAds": total,
+            "scalingPercentage": state["scalingCount"] / total * 100,
+            "survivalDistribution": {
+                "infantMortality": survival["infant"] / total * 100,
+                "validated": survival["validated"] / total * 100,
+                "legacy": survival["legacy"] / total * 100,
+            },
+        },
+        "platformInsights": platform_insights,
+        "ticketInsights": {
+            "avgTicketScaling": sum(v * n for v, n in tickets.items()) / ticket_count if ticket_count else 0,
+            "mostSuccessfulRange": {
+                "min": min(tickets) if tickets else 0,
+                "max": max(tickets) if tickets else 0,
+            },
+        },
+        "timeInsights": {
+            "avgTimeToScale": state["daysToScaleSum"] / state["scalingCount"] if state["scalingCount"] else 7,
+            "survivalThreshold": 5,
+        },
+        "falsePositivePatterns": {
+            "clickbaitThresholds": {name: b["suspiciousCtrLimit"] for name, b in baselines.items()},
+            "hypeAdsDetected": state["hype"],
+        },
+        "baselines": baselines,
+        "lastAnalysis": (updated_at or datetime.datetime.utcnow()).isoformat(),
+    }
+
+
+# --- Snapshot storage ---
+
+def library_rows(conn, ids: List[str], extra: Iterable = ()) -> List[Any]:
+    """PROJECTION rows of the given ads (one IN query); `extra` columns ride along for other ingest stages."""
+    if not ids:
+        return []
+    return conn.execute(select(*PROJECTION, *extra).where(AdModel.id.in_(ids))).fetchall()
+
+
+def _load(conn, for_update: bool = False):
+    stmt = select(AnalyticsSnapshotModel).where(AnalyticsSnapshotModel.key == SNAPSHOT_KEY)
+    if for_update:
+        stmt = stmt.with_for_update()
+    return conn.execute(stmt).first()
+
+
+def _upsert(conn, values: Dict[str, Any], update: bool = True):
+    from .ingest import dialect_insert
+    table = AnalyticsSnapshotModel.__table__
+    stmt = dialect_insert(conn.dialect.name)(table).values(key=SNAPSHOT_KEY, **values)
+    if update:
+        conn.execute(stmt.on_conflict_do_update(index_elements=[table.c.key], set_=values))
+    else:
+        conn.execute(stmt.on_conflict_do_nothing(index_elements=[table.c.key]))
+
+
+def _save(conn, state: Dict[str, Any]):
+    _upsert(conn, {"state": state, "updated_at": datetime.datetime.utcnow()})
+
+
+def _built(row) -> bool:
+    return row is not None and row.updated_at is not None
+
+
+def apply_library_delta(conn, before: Iterable, after: Iterable):
+    """Moves the snapshot from the old projection of some ads to their new one (same transaction as the write)."""
+    row = _load(conn, for_update=True)
+    if not _built(row):
+        return # Never built: the next read does a full rebuild
+    state = accumulate(accumulate(row.state, before, -1), after, 1)
+    _save(conn, state)
+
+
+def invalidate_library_snapshot(conn):
+    """For bulk deletes: drop the snapshot, the next read rebuilds it."""
+    table = AnalyticsSnapshotModel.__table__
+    conn.execute(table.delete().where(table.c.key == SNAPSHOT_KEY))
+
+
+def rebuild_library_snapshot(engine=None) -> Dict[str, Any]:
+    engine = engine or sync_engine
+    with engine.begin() as conn:
+        # Deltas skip a missing row without locking anything: make sure there is one to lock
+        _upsert(conn, {"state": empty_state(), "updated_at": None}, update=False)
+    state = empty_state()
+    with engine.begin() as conn:
+        _load(conn, for_update=True)
+        if conn.dialect.name == "sqlite":
+            # No FOR UPDATE on SQLite: a (no-op) write takes the database write lock instead
+            table = AnalyticsSnapshotModel.__table__
+            conn.execute(table.update().where(table.c.key == SNAPSHOT_KEY).values(updated_at=table.c.updated_at))
+        result = conn.execute(select(*PROJECTION).execution_options(yield_per=5000))
+        for rows in result.partitions():
+            accumulate(state, rows)
+        _save(conn, state)
+    return state
+
+
+def get_library_intelligence(engine=None, refresh: bool = False) -> Optional[Dict[str, Any]]:
+    engine = engine or sync_engine
+    row = None
+    if not refresh:
+        with engine.connect() as conn:
+            row = _load(conn)
+    if not _built(row):
+        return intelligence_from_state(rebuild_library_snapshot(engine))
+    return intelligence_from_state(row.state, row.updated_at)
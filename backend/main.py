@@ -9,56 +9,39 @@ from sqlalchemy.future import select
 from sqlalchemy import text
 from typing import List, Optional
 import uuid
-from fastapi.staticfiles import StaticFiles
 
 import time
+import datetime
+import logging
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
-from .database import engine, Base, get_db
-from .models import AdModel, UserModel, AdHistoryModel
-from .tasks import import_ads_task, download_file
+from .database import engine, sync_engine, get_db
+from .models import AdModel, UserModel, AdHistoryModel, AdHistoryRollupModel, AdFingerprintModel, AdFingerprintBandModel
+from .classifier import NICHE
+from .library_analytics import library_rows, apply_library_delta, invalidate_library_snapshot, get_library_intelligence
+from .velocity import VELOCITY_COLUMNS, score_rows
+from .ad_history import changed_points, record_points, history_series, RESOLUTIONS, MAX_BATCH_IDS
+from .ad_fingerprints import fingerprint_ads, forget_ads, similar_ads, list_clusters
+from .media_refresh import queue_stats
+from .media_vault import sha_from_path
+from .media_serving import MediaFiles
 from .schemas import Ad, AdCreate, User, UserCreate, UserLogin, Token
 from .auth import verify_password, get_password_hash, create_access_token, create_refresh_token, decode_access_token
-from .dependencies import get_current_user, get_current_admin
+from .dependencies import get_current_user, get_current_admin, get_current_user_record
+from .principals import invalidate_principal
+from .app_logging import get_logger, LOG_SLOW_REQUEST_MS
+from .metrics import instrument_app, metrics_response, slow_samples, METRICS_TOKEN, MULTIPROC
+from .responses import FastJSONResponse, CompressionMiddleware
 
 
-def log_to_file(msg):
-    with open("backend_debug.log", "a") as f:
-        f.write(f"{time.ctime()}: {msg}\n")
+log = get_logger("api")
+request_log = get_logger("request")
 
 app = FastAPI()
 
-@app.on_event("startup")
-async def startup_event():
-    csv_file = "scalatracker_final.csv"
-    if os.path.exists(csv_file):
-        print(f"[Auto-Init] Found {csv_file}, triggering cleanup and turbo import...")
-        try:
-            # We run this in a thread to not block the main loop if its very slow
-            import threading
-            from clean_ads import clean_ads
-            from bulk_importer import run_bulk_import
-            
-            def run_init():
-                log_to_file("[Auto-Init] Starting full wipe...")
-                clean_ads(full_wipe=True)
-                log_to_file("[Auto-Init] Starting turbo import...")
-                run_bulk_import(csv_file)
-                log_to_file("[Auto-Init] Cleaning up failed downloads...")
-                clean_ads(full_wipe=False) # Remove ads with external (broken) links
-                log_to_file("[Auto-Init] Done.")
-                if os.path.exists(csv_file):
-                    os.rename(csv_file, f"{csv_file}.done")
-            
-            thread = threading.Thread(target=run_init)
-            thread.start()
-        except Exception as e:
-            print(f"[Auto-Init] Critical error: {e}")
-
-
 # Allow CORS for local development
 
 # Strict CORS for production
@@ -91,15 +74,41 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
+# gzip / brotli for large JSON bodies (ad listings); media is never recompressed
+app.add_middleware(CompressionMiddleware)
+
+# --- METRICS ---
+instrument_app(app, {"api": engine.sync_engine, "sync": sync_engine}, log=request_log)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """
+    Prometheus scrape endpoint; set METRICS_TOKEN to require `Authorization: Bearer <token>`.
+    Deployed (PROMETHEUS_MULTIPROC_DIR set) it is closed until a token is configured.
+    """
+    if not METRICS_TOKEN and MULTIPROC:
+        raise HTTPException(status_code=403, detail="METRICS_TOKEN is not configured")
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return metrics_response()
+
+@app.get("/metrics/slow")
+async def slow_requests(current_user = Depends(get_current_admin)):
+    """Latest slow-request samples with their SQL statements grouped (N+1 patterns show as high counts)."""
+    return list(reversed(slow_samples))
+
 # --- MEDIA VAULT (Permanent Storage) ---
 MEDIA_PATH = os.path.join(os.path.dirname(__file__), "media")
 if not os.path.exists(MEDIA_PATH):
     os.makedirs(MEDIA_PATH, exist_ok=True)
 
-app.mount("/media", StaticFiles(directory=MEDIA_PATH), name="media")
+# Immutable caching, 304s and Range for the vault; X-Accel-Redirect behind nginx (media_serving.py)
+app.mount("/media", MediaFiles(directory=MEDIA_PATH), name="media")
 
 # --- SCANNER ---
-from .tasks import scan_ad_task, import_ads_task
+# Celery (backend.tasks), the media pipeline, the scanner, the billing SDK and the AI
+# engine are imported on first use so API worker spawn stays cheap
+# (python benchmarks/bench_import_time.py).
 
 class ScanRequest(BaseModel):
     url: str
@@ -108,6 +117,7 @@ class ScanRequest(BaseModel):
 async def scan_ad(request: ScanRequest, current_user = Depends(get_current_user)):
     try:
         # Try to use Celery
+        from .tasks import scan_ad_task
         task = scan_ad_task.delay(request.url)
         return {
             "task_id": task.id,
@@ -116,10 +126,9 @@ async def scan_ad(request: ScanRequest, current_user = Depends(get_current_user)
         }
     except Exception as e:
         # FALLBACK: If Redis/Celery fails, run synchronously for LOCAL DEV
-        log_to_file(f"Celery failed ({e}), falling back to sync scan")
-        from .scanner import AdScanner
-        scanner = AdScanner()
-        result = scanner.scan_page(request.url)
+        log.warning(f"Celery failed ({e}), falling back to sync scan")
+        from .scan_cache import cached_scan
+        result = await run_in_threadpool(cached_scan, request.url)
         
         # We simulate a "mock" task_id for the frontend
         return {
@@ -128,19 +137,57 @@ async def scan_ad(request: ScanRequest, current_user = Depends(get_current_user)
             "result": result
         }
 
+@app.get("/scan-ad/cache-stats")
+async def scan_cache_stats(current_user = Depends(get_current_admin)):
+    # Hit/miss counters (this process + shared across workers) for sizing SCAN_CACHE_TTL
+    from .scan_cache import default_scan_cache
+    return await run_in_threadpool(default_scan_cache().stats)
+
+class BatchScanRequest(BaseModel):
+    urls: List[str] = []
+    ad_ids: Optional[List[str]] = None
+    all_ads: bool = False # every ad with a salesPageUrl
+
+@app.post("/scan-ad/batch")
+async def scan_ad_batch(request: BatchScanRequest, current_user = Depends(get_current_admin)):
+    if not request.urls and not request.ad_ids and not request.all_ads:
+        raise HTTPException(status_code=400, detail="Provide urls, ad_ids or all_ads")
+    try:
+        from .tasks import scan_ads_batch_task
+        task = scan_ads_batch_task.delay(request.urls, request.ad_ids, request.all_ads)
+        return {
+            "task_id": task.id,
+            "status": "processing",
+            "message": "Batch scan started in background"
+        }
+    except Exception as e:
+        # FALLBACK: same as /scan-ad, run in-process for LOCAL DEV
+        log.warning(f"Celery failed ({e}), falling back to sync batch scan")
+        from .scan_batch import run_scan_batch
+        result = await run_in_threadpool(run_scan_batch, request.urls, request.ad_ids, request.all_ads)
+        return {
+            "task_id": "sync_mode",
+            "status": "SUCCESS",
+            "result": result
+        }
+
 @app.get("/tasks/{task_id}")
 async def get_task_status(task_id: str):
     if task_id == "sync_mode":
         return {"task_id": "sync_mode", "status": "SUCCESS"}
 
-    from celery.result import AsyncResult
-    task_result = AsyncResult(task_id)
+    from .worker import celery_app
+    task_result = celery_app.AsyncResult(task_id)
     
     result = {
         "task_id": task_id,
         "status": task_result.status,
     }
     
+    if task_result.status == "PROGRESS":
+        # Batch tasks publish {"total", "done", "failed", "adsUpdated"} while running
+        result["progress"] = task_result.info
+    
     if task_result.ready():
         result["result"] = task_result.result
         if task_result.status == "SUCCESS":
@@ -152,37 +199,30 @@ async def get_task_status(task_id: str):
 # --- LIFECYCLE ---
 @app.on_event("startup")
 async def startup():
-    log_to_file("Backend starting up...")
+    # Boot only opens the pool: migrations and the bootstrap import run once, under a
+    # leader lock, via `adscale-admin migrate|bootstrap` (or their Celery tasks)
+    log.info("Backend starting up...")
     try:
-        async with engine.begin() as conn:
-            # Manual Migration for existing tables
-            try:
-                await conn.execute(text("ALTER TABLE ads ADD COLUMN IF NOT EXISTS pixels JSON DEFAULT '[]'"))
-                await conn.execute(text("ALTER TABLE ads ADD COLUMN IF NOT EXISTS tld VARCHAR"))
-                await conn.execute(text("CREATE INDEX IF NOT EXISTS ix_ads_tld ON ads (tld)"))
-                log_to_file("Migration: pixels and tld columns verified/added.")
-            except Exception as migrate_e:
-                log_to_file(f"Migration notice (normal if already exists): {str(migrate_e)}")
-                
-            await conn.run_sync(Base.metadata.create_all)
-        log_to_file("Database initialized.")
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        log.info("Database pool ready.")
     except Exception as e:
-        log_to_file(f"STARTUP ERROR: {str(e)}")
+        log.error(f"STARTUP ERROR: {str(e)}")
 
 # --- AUTH ROUTES ---
 
 @app.post("/register", response_model=Token)
 async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
-    log_to_file(f"Registering user: {user_data.email}")
+    log.info(f"Registering user: {user_data.email}")
     try:
         result = await db.execute(select(UserModel).where(UserModel.email == user_data.email))
         existing = result.scalars().first()
         if existing:
-            log_to_file(f"Registration failed: User {user_data.email} already exists")
+            log.info(f"Registration failed: User {user_data.email} already exists")
             raise HTTPException(status_code=400, detail="Este e-mail já está cadastrado.")
-        log_to_file("User does not exist, proceeding with creation...")
+        log.debug("User does not exist, proceeding with creation...")
     except Exception as e:
-        log_to_file(f"Error checking existing user: {str(e)}")
+        log.error(f"Error checking existing user: {str(e)}")
         raise e
     
     # Create user
@@ -203,15 +243,15 @@ async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     try:
         await db.commit()
         await db.refresh(db_user)
-        log_to_file(f"User {db_user.email} created successfully.")
+        log.info(f"User {db_user.email} created successfully.")
     except Exception as e:
         await db.rollback()
-        log_to_file(f"DATABASE COMMIT ERROR for {user_data.email}: {str(e)}")
+        log.error(f"DATABASE COMMIT ERROR for {user_data.email}: {str(e)}")
         # Check if it was a race condition
         result = await db.execute(select(UserModel).where(UserModel.email == user_data.email))
         existing = result.scalars().first()
         if existing:
-             log_to_file(f"Race condition: User {user_data.email} exists now.")
+             log.warning(f"Race condition: User {user_data.email} exists now.")
              raise HTTPException(status_code=400, detail="Este e-mail já está cadastrado.")
         raise HTTPException(status_code=500, detail="Erro interno ao criar conta.")
     
@@ -273,15 +313,18 @@ async def refresh_token(req: RefreshRequest, db: AsyncSession = Depends(get_db))
     }
 
 @app.get("/me", response_model=User)
-async def read_users_me(current_user = Depends(get_current_user)):
+async def read_users_me(current_user = Depends(get_current_user_record)):
     return current_user.to_dict()
 
 @app.post("/emergency-promote")
-async def emergency_promote(current_user = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+async def emergency_promote(current_user = Depends(get_current_user_record), db: AsyncSession = Depends(get_db)):
+    email = current_user.email
     current_user.role = "admin"
     db.add(current_user)
     await db.commit()
-    return {"status": "promoted", "role": current_user.role}
+    # Role is part of the cached principal
+    await invalidate_principal(email)
+    return {"status": "promoted", "role": "admin"}
 
 @app.get("/users", response_model=List[User])
 async def get_users(db: AsyncSession = Depends(get_db), current_user = Depends(get_current_admin)):
@@ -358,62 +401,168 @@ async def get_public_checkout_config_compliant(db: AsyncSession = Depends(get_db
 from .permissions import verify_subscription_access
 
 
-@app.get("/ads", response_model=List[Ad])
-async def get_ads(db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(AdModel).order_by(AdModel.addedAt.desc()))
-    ads = result.scalars().all()
-    return [ad.to_dict() for ad in ads]
+from .ads_query import build_page_query, build_page, build_dump_query, row_to_dict, DEFAULT_PAGE_SIZE, SORTS
+from .ad_search import build_search_query, build_search_page, search_terms
+
+
+@app.get("/ads")
+async def get_ads(
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    view: str = "card",
+    ids: Optional[str] = None,
+    niche: Optional[str] = None,
+    platform: Optional[str] = None,
+    status: Optional[str] = None,
+    tld: Optional[str] = None,
+    min_ad_count: Optional[int] = None,
+    max_ad_count: Optional[int] = None,
+    sort: str = "recent",
+    full: bool = False,
+    collapse: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    # Listings are the largest responses: plain SQL rows encoded by orjson, no
+    # ORM objects and no response_model revalidation
+    # Legacy full dump (every column of every ad), kept for older clients
+    if full:
+        result = await db.execute(build_dump_query())
+        return FastJSONResponse([row_to_dict(r) for r in result.all()])
+
+    if view not in ("card", "full"):
+        raise HTTPException(status_code=400, detail="view must be 'card' or 'full'")
+    if sort not in SORTS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(SORTS)}")
+
+    stmt, limit = build_page_query(
+        view=view, cursor=cursor, limit=limit, sort=sort,
+        ids=[i for i in ids.split(",") if i] if ids else None,
+        niche=niche, platform=platform, status=status, tld=tld,
+        min_ad_count=min_ad_count, max_ad_count=max_ad_count, collapse=collapse
+    )
+    result = await db.execute(stmt)
+    return FastJSONResponse(build_page(result.all(), limit, sort=sort))
+
+@app.get("/ads/search")
+async def search_ads(
+    q: str,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    niche: Optional[str] = None,
+    platform: Optional[str] = None,
+    status: Optional[str] = None,
+    tld: Optional[str] = None,
+    min_ad_count: Optional[int] = None,
+    max_ad_count: Optional[int] = None,
+    collapse: bool = False,
+    db: AsyncSession = Depends(get_db)
+):
+    """Ranked full-text search over title, copy, insights and tags (card projection + score)."""
+    if not search_terms(q):
+        raise HTTPException(status_code=400, detail="q must contain at least one word")
+    stmt, limit, offset = build_search_query(
+        engine.dialect.name, q, cursor=cursor, limit=limit,
+        niche=niche, platform=platform, status=status, tld=tld,
+        min_ad_count=min_ad_count, max_ad_count=max_ad_count, collapse=collapse
+    )
+    result = await db.execute(stmt)
+    return FastJSONResponse(build_search_page(result.all(), limit, offset))
+
+@app.get("/ads/clusters")
+async def get_duplicate_clusters(min_size: int = 2, limit: int = 50, offset: int = 0,
+                                 db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
+    """Near-duplicate clusters, largest first: canonical ad, size and member ids."""
+    limit, offset = max(1, min(limit, 200)), max(0, offset)
+    return await db.run_sync(lambda s: list_clusters(s.connection(), min_size, limit, offset))
+
+@app.get("/ads/media-queue")
+async def get_media_queue(db: AsyncSession = Depends(get_db), current_admin = Depends(get_current_admin)):
+    """Ads still on external media: pending / expired / failed counts and the nearest expiry."""
+    return await db.run_sync(lambda s: queue_stats(s.connection()))
+
+@app.get("/ads/{ad_id}/similar")
+async def get_similar_ads(ad_id: str, limit: int = 20, db: AsyncSession = Depends(get_db),
+                          current_user = Depends(get_current_user)):
+    """Same creative, near-identical image or similar copy (card projection + how each ad matches)."""
+    result = await db.run_sync(lambda s: similar_ads(s.connection(), ad_id, limit))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Ad not found")
+    return FastJSONResponse(result)
 
 # --- AD ROUTES (Protected/Admin) ---
 
+async def _library_rows(db: AsyncSession, ids: List[str], extra=()):
+    return await db.run_sync(lambda s: library_rows(s.connection(), ids, extra))
+
+async def _track_library_change(db: AsyncSession, ids: List[str], before):
+    # Moves the /analytics/library snapshot to the ads' new state, inside the caller's transaction
+    await db.flush()
+    await db.run_sync(lambda s: apply_library_delta(s.connection(), before, library_rows(s.connection(), ids)))
+
+async def _record_history(db: AsyncSession, ad_data: dict, before):
+    """History change point for an ad written through the API (same transaction)."""
+    points = changed_points([ad_data], {r.id: r.adCount for r in before})
+    await db.run_sync(lambda s: record_points(s.connection(), points))
+
+async def _fingerprint(db: AsyncSession, ad_data: dict):
+    """Near-duplicate fingerprints for an ad written through the API (same transaction)."""
+    await db.flush()
+    await db.run_sync(lambda s: fingerprint_ads(s.connection(), [ad_data]))
+
+def _keep_eviction(ad_data: dict, current: AdModel):
+    """An edit that keeps the poster a quota eviction left keeps the mark (and no creative hash)."""
+    if current.mediaEvictedAt and ad_data.get("mediaUrl") == current.mediaUrl:
+        ad_data.update(mediaHash=None, mediaEvictedAt=current.mediaEvictedAt)
+    else:
+        ad_data["mediaEvictedAt"] = None
+
 @app.post("/ads", response_model=Ad)
 async def create_ad(ad: AdCreate, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_admin)):
     ad_data = ad.dict()
+    ad_data["mediaHash"] = sha_from_path(ad_data.get("mediaUrl"))
+    # Untagged ads (schema default) get a niche from their copy, like CSV imports
+    if not ad_data.get("niche") or ad_data["niche"] == "Business":
+        ad_data["niche"] = NICHE.classify(f"{ad_data.get('copy') or ''} {ad_data.get('title') or ''}")
     # Check if exists
+    before = await _library_rows(db, [ad.id], VELOCITY_COLUMNS)
+    ad_data = score_rows([ad_data], {r.id: r for r in before})[0]
     result = await db.execute(select(AdModel).where(AdModel.id == ad.id))
     existing = result.scalars().first()
     if existing:
         # Update
+        _keep_eviction(ad_data, existing)
         for key, value in ad_data.items():
             setattr(existing, key, value)
+        await _track_library_change(db, [ad.id], before)
+        await _record_history(db, ad_data, before)
+        await _fingerprint(db, ad_data)
         await db.commit()
         await db.refresh(existing)
         return existing.to_dict()
     
-    # Persistence Logic for Single Create
-    original_media = ad_data.get('mediaUrl')
-    if original_media:
-        # Run blocking I/O in threadpool to keep API responsive
-        local_path = await run_in_threadpool(download_file, original_media, ad_data['id'])
-        if local_path:
-            ad_data['mediaUrl'] = local_path
-            if ad_data.get('thumbnail') == original_media:
-                ad_data['thumbnail'] = local_path
-
     db_ad = AdModel(**ad_data)
     db.add(db_ad)
+    await _track_library_change(db, [ad.id], before)
+    await _record_history(db, ad_data, before)
+    await _fingerprint(db, ad_data)
     await db.commit()
     await db.refresh(db_ad)
-    
-    # Record Initial History (Fail-safe)
-    try:
-        history = AdHistoryModel(ad_id=db_ad.id, adCount=db_ad.adCount)
-        db.add(history)
-        await db.commit()
-    except Exception as e:
-        log_to_file(f"HISTORY SAVE FAILED for {db_ad.id}: {e}")
-        # Suppress error so user gets success
 
+    # Persistence Logic: media is fetched by the download pipeline, which repoints the ad
+    from .tasks import enqueue_media_downloads
+    from .media_pipeline import media_jobs
+    await run_in_threadpool(enqueue_media_downloads, media_jobs([ad_data]))
     
     return db_ad.to_dict()
 
 @app.post("/ads/import")
 async def import_ads(ads: List[AdCreate], current_user = Depends(get_current_admin)):
     ads_data = [ad.dict() for ad in ads]
-    log_to_file(f"Import request received for {len(ads_data)} ads")
+    log.info(f"Import request received for {len(ads_data)} ads")
     
     # Run synchronously so the frontend waits for completion
     # Run synchronously in a thread so the frontend waits for completion without blocking the server
+    from .tasks import import_ads_task
     result = await run_in_threadpool(import_ads_task, ads_data)
     
     return {
@@ -425,15 +574,22 @@ async def import_ads(ads: List[AdCreate], current_user = Depends(get_current_adm
 
 @app.put("/ads/{ad_id}", response_model=Ad)
 async def update_ad(ad_id: str, ad: AdCreate, db: AsyncSession = Depends(get_db)):
+    before = await _library_rows(db, [ad_id])
     result = await db.execute(select(AdModel).where(AdModel.id == ad_id))
     db_ad = result.scalars().first()
     if not db_ad:
         raise HTTPException(status_code=404, detail="Ad not found")
     
     ad_data = ad.dict()
+    ad_data["mediaHash"] = sha_from_path(ad_data.get("mediaUrl"))
+    _keep_eviction(ad_data, db_ad)
     for key, value in ad_data.items():
         setattr(db_ad, key, value)
         
+    await _track_library_change(db, [ad_id, db_ad.id], before)
+    if db_ad.id == ad_id:
+        await _record_history(db, ad_data, before)
+    await _fingerprint(db, ad_data)
     await db.commit()
     await db.refresh(db_ad)
     return db_ad.to_dict()
@@ -443,7 +599,10 @@ async def delete_ad(ad_id: str, db: AsyncSession = Depends(get_db), current_user
     result = await db.execute(select(AdModel).where(AdModel.id == ad_id))
     ad = result.scalars().first()
     if ad:
+        before = await _library_rows(db, [ad_id])
         await db.delete(ad)
+        await _track_library_change(db, [ad_id], before)
+        await db.run_sync(lambda s: forget_ads(s.connection(), [ad_id]))
         await db.commit()
         return {"ok": True}
     raise HTTPException(status_code=404, detail="Ad not found")
@@ -452,7 +611,10 @@ async def delete_ad(ad_id: str, db: AsyncSession = Depends(get_db), current_user
 async def batch_delete_ads(ad_ids: List[str], db: AsyncSession = Depends(get_db), current_user = Depends(get_current_admin)):
     try:
         from sqlalchemy import delete
+        before = await _library_rows(db, ad_ids)
         await db.execute(delete(AdModel).where(AdModel.id.in_(ad_ids)))
+        await _track_library_change(db, ad_ids, before)
+        await db.run_sync(lambda s: forget_ads(s.connection(), ad_ids))
         await db.commit()
         return {"ok": True, "count": len(ad_ids)}
     except Exception as e:
@@ -460,25 +622,36 @@ async def batch_delete_ads(ad_ids: List[str], db: AsyncSession = Depends(get_db)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/ads/clear")
-async def clear_all_ads(db: AsyncSession = Depends(get_db), current_user = Depends(get_current_admin)):
+async def clear_all_ads(background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_admin)):
     try:
         from sqlalchemy import delete
         await db.execute(delete(AdHistoryModel))
+        await db.execute(delete(AdHistoryRollupModel))
         await db.execute(delete(AdModel))
+        await db.execute(delete(AdFingerprintBandModel))
+        await db.execute(delete(AdFingerprintModel))
+        await db.run_sync(lambda s: invalidate_library_snapshot(s.connection()))
         await db.commit()
-        # Also clean up the media folder
-        import shutil
-        if os.path.exists(MEDIA_PATH):
-            shutil.rmtree(MEDIA_PATH)
-            os.makedirs(MEDIA_PATH, exist_ok=True)
-        return {"ok": True, "message": "All ads and media cleared"}
+        # Files are reclaimed by the vault GC (media_gc.py), off the request path; grace=0 still
+        # spares files younger than GC_MIN_GRACE_SECONDS (downloads not yet attached to their ad)
+        try:
+            from .tasks import media_gc_task
+            media_gc_task.delay(0)
+        except Exception as e:
+            log.warning(f"Celery unavailable ({e}), running the media GC in-process")
+            from .admin import media_gc
+            background_tasks.add_task(media_gc, grace=0)
+        return {"ok": True, "message": "All ads cleared, media is being reclaimed"}
     except Exception as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 # --- AI & ANALYTICS ROUTES ---
 
-from .ai_engine import ai_engine
+@app.get("/analytics/library")
+async def library_analytics(refresh: bool = False, current_user = Depends(get_current_user)):
+    """LibraryIntelligence for the dashboard (null for an empty library). Admins can force a full rebuild."""
+    return await run_in_threadpool(get_library_intelligence, None, refresh and current_user.role == 'admin')
 
 class AICopyRequest(BaseModel):
     ad_id: str
@@ -491,14 +664,31 @@ async def generate_ai_copy(req: AICopyRequest, db: AsyncSession = Depends(get_db
     if not ad:
         raise HTTPException(status_code=404, detail="Ad not found")
     
+    from .ai_engine import ai_engine
     variations = await ai_engine.generate_copy(ad.copy, ad.niche, req.tone)
     return {"variations": variations}
 
+def _history_resolution(resolution: str) -> str:
+    if resolution not in RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"resolution must be one of {', '.join(RESOLUTIONS)}")
+    return resolution
+
+@app.get("/ads/history")
+async def get_ads_history(ids: str, resolution: str = "raw", since: Optional[datetime.datetime] = None,
+                          db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
+    """adCount series for many ads in one query: ?ids=a,b,c -> {ad_id: [points]}."""
+    ad_ids = list(dict.fromkeys(i for i in ids.split(",") if i))
+    if len(ad_ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} ids per request")
+    resolution = _history_resolution(resolution)
+    return await db.run_sync(lambda s: history_series(s.connection(), ad_ids, resolution, since))
+
 @app.get("/ads/{ad_id}/history")
-async def get_ad_history(ad_id: str, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
-    result = await db.execute(select(AdHistoryModel).where(AdHistoryModel.ad_id == ad_id).order_by(AdHistoryModel.timestamp.asc()))
-    history = result.scalars().all()
-    return [h.to_dict() for h in history]
+async def get_ad_history(ad_id: str, resolution: str = "raw", since: Optional[datetime.datetime] = None,
+                         db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
+    resolution = _history_resolution(resolution)
+    series = await db.run_sync(lambda s: history_series(s.connection(), [ad_id], resolution, since))
+    return series[ad_id]
 
 @app.get("/ai/strategic-decode/{ad_id}")
 async def strategic_decode_ad(ad_id: str, db: AsyncSession = Depends(get_db), current_user = Depends(get_current_user)):
@@ -507,6 +697,7 @@ async def strategic_decode_ad(ad_id: str, db: AsyncSession = Depends(get_db), cu
     if not ad:
         raise HTTPException(status_code=404, detail="Ad not found")
     
+    from .ai_engine import ai_engine
     decode = await ai_engine.strategic_decode(ad.copy, ad.niche)
     return decode
 
@@ -516,11 +707,17 @@ async def log_requests(request, call_next):
     origin = request.headers.get("origin")
     method = request.method
     path = request.url.path
-    log_to_file(f"Request started: {method} {path} (Origin: {origin})")
+    request_log.debug(f"Request started: {method} {path} (Origin: {origin})")
     
     response = await call_next(request)
-    duration = time.time() - start_time
-    log_to_file(f"Request finished: {method} {path} - {response.status_code} ({duration:.2f}s)")
+    duration_ms = (time.time() - start_time) * 1000
+    if getattr(request.state, "slow_logged", False):
+        return response # Already logged as a slow request, with its SQL statements (metrics.py)
+    # Sampled by LOG_REQUEST_SAMPLE; server errors and slow requests are logged as warnings (always kept)
+    level = logging.WARNING if response.status_code >= 500 or duration_ms >= LOG_SLOW_REQUEST_MS else logging.INFO
+    request_log.log(level, f"Request finished: {method} {path} - {response.status_code} ({duration_ms / 1000:.2f}s)",
+                    extra={"fields": {"method": method, "path": path, "status": response.status_code,
+                                      "durationMs": round(duration_ms, 1), "origin": origin}})
     return response
 
 @app.get("/")
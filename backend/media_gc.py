@@ -0,0 +1,280 @@
+"""
+Media vault garbage collection and disk quota.
+
+Deleting ads never touched backend/media: rows went away and their files
+stayed, or /ads/clear removed the whole folder inside the request. The GC job
+reconciles the vault with the ads table instead:
+
+1. `ad_media` rows of deleted or repointed ads are released and
+   `media_assets.ref_count` is recomputed.
+2. One streaming pass over the ads builds the referenced set: creatives
+   (mediaUrl) with the last time their ads were active, plus pinned files
+   (thumbnails, brand logos and the posters of referenced creatives).
+3. The media directory is scanned shard by shard with os.scandir; files
+   outside the referenced set and older than GC_GRACE_SECONDS (downloads in
+   flight are not attached yet; never less than GC_MIN_GRACE_SECONDS, even
+   for grace=0) are deleted in batches of GC_BATCH. Each batch is re-checked
+   against the database before anything is removed.
+4. With MEDIA_QUOTA_BYTES set and the kept files above it, the coldest
+   creatives (least recently active ads first) are evicted down to
+   MEDIA_QUOTA_LOW_WATERMARK of the quota. Only creatives with a poster are
+   evictable: their ads fall back to it, so cards still render and nothing
+   re-downloads them. In the same transaction the ads lose their mediaHash
+   and fingerprint media hash (exact-duplicate clustering must not match a
+   deleted file) and get mediaEvictedAt, so the UI shows the poster as a
+   still. Pinned files are never evicted.
+
+Runs as media_gc_task (every 6 hours, see worker.py) or `adscale-admin gc`,
+under a leader lock, and reports the bytes it reclaimed.
+"""
+import os
+import time
+from datetime import datetime, timezone
+from typing import Optional, Dict, List, Tuple, Iterable
+
+from sqlalchemy import select, delete, update, func, and_, or_
+
+from .models import AdModel, MediaAssetModel, MediaUrlModel, AdMediaModel, MediaPosterModel
+from .media_vault import MediaVault, default_vault, sha_from_path
+from .ad_fingerprints import forget_media
+
+MEDIA_QUOTA_BYTES = int(os.getenv("MEDIA_QUOTA_BYTES", "0")) # 0: no quota
+MEDIA_QUOTA_LOW_WATERMARK = float(os.getenv("MEDIA_QUOTA_LOW_WATERMARK", "0.9"))
+GC_GRACE_SECONDS = int(os.getenv("MEDIA_GC_GRACE_SECONDS", "3600"))
+# Floor for any requested grace (even 0): a stored download is only referenced once apply_media_result commits
+GC_MIN_GRACE_SECONDS = 300
+GC_BATCH = 500
+AD_STREAM_ROWS = 5000
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _naive_utc(value: Optional[datetime]) -> datetime:
+    # velocityAt is a naive UTC TIMESTAMP, addedAt/updatedAt are timezone-aware on Postgres
+    if value is None:
+        return _EPOCH
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+# --- References ---
+
+def release_stale_links(conn) -> int:
+    """Drops ad_media rows whose ad is gone or no longer shows that creative, then recounts ref_count."""
+    ads, links, assets = AdModel.__table__, AdMediaModel.__table__, MediaAssetModel.__table__
+    current = select(ads.c.id).where(ads.c.id == links.c.ad_id, ads.c.mediaHash == links.c.sha256).exists()
+    released = conn.execute(delete(links).where(~current)).rowcount
+    count = select(func.count()).select_from(links).where(links.c.sha256 == assets.c.sha256).scalar_subquery()
+    conn.execute(update(assets).where(assets.c.ref_count != count).values(ref_count=count))
+    return released
+
+
+def referenced_media(conn) -> Tuple[Dict[str, datetime], set, set]:
+    """
+    (creatives: {sha: last activity of their ads}, pinned shas, legacy paths)
+    in one streaming pass over the ads.
+    """
+    ads, posters = AdModel.__table__, MediaPosterModel.__table__
+    creatives: Dict[str, datetime] = {}
+    pinned, legacy = set(), set()
+    rows = conn.execution_options(yield_per=AD_STREAM_ROWS).execute(select(
+        ads.c.mediaUrl, ads.c.thumbnail, ads.c.brandLogo, ads.c.addedAt, ads.c.updatedAt, ads.c.velocityAt))
+    for media_url, thumbnail, logo, added, updated, observed in rows:
+        sha = sha_from_path(media_url)
+        if sha:
+            active = max(_naive_utc(added), _naive_utc(updated), _naive_utc(observed))
+            if active > creatives.get(sha, _EPOCH):
+                creatives[sha] = active
+        elif media_url and media_url.startswith("/media/"):
+            legacy.add(media_url)
+        for path in (thumbnail, logo):
+            if path and path.startswith("/media/"):
+                sha = sha_from_path(path)
+                if sha:
+                    pinned.add(sha)
+                else:
+                    legacy.add(path)
+    for source, poster in conn.execute(select(posters.c.sha256, posters.c.poster_sha256)
+                                       .where(posters.c.poster_sha256.is_not(None))):
+        if source in creatives:
+            pinned.add(poster)
+    return creatives, pinned, legacy
+
+
+def still_referenced(conn, files: List[Tuple[str, str]]) -> set:
+    """Shas of a deletion batch that gained a reference since the scan (imports running meanwhile)."""
+    ads, links, posters = AdModel.__table__, AdMediaModel.__table__, MediaPosterModel.__table__
+    shas = [sha for sha, _ in files if sha]
+    paths = [path for _, path in files]
+    # Only links of ads that still show the creative: stale ones are what the GC releases
+    live = (links.join(ads, and_(ads.c.id == links.c.ad_id, ads.c.mediaHash == links.c.sha256)))
+    found = set(conn.execute(select(links.c.sha256).select_from(live).where(links.c.sha256.in_(shas))).scalars())
+    found.update(conn.execute(select(posters.c.poster_sha256).select_from(live.join(posters, posters.c.sha256 == links.c.sha256))
+                              .where(posters.c.poster_sha256.in_(shas))).scalars())
+    for column in (ads.c.mediaUrl, ads.c.thumbnail, ads.c.brandLogo):
+        found.update(sha_from_path(p) or p for p in conn.execute(select(column).where(column.in_(paths))).scalars())
+    return found
+
+
+# --- Deletion ---
+
+def forget_assets(conn, shas: Iterable[str], keep_posters: bool = False):
+    """Drops the vault rows of deleted files (source URLs, posters, the asset)."""
+    shas = list(shas)
+    posters = MediaPosterModel.__table__
+    conn.execute(delete(MediaUrlModel.__table__).where(MediaUrlModel.__table__.c.sha256.in_(shas)))
+    # A deleted poster is rendered again if its source stays. Evicted creatives keep the
+    # row, which marks their poster as one (it is not given a poster of its own)
+    stale = posters.c.poster_sha256.in_(shas)
+    conn.execute(delete(posters).where(stale if keep_posters else or_(posters.c.sha256.in_(shas), stale)))
+    conn.execute(delete(AdMediaModel.__table__).where(AdMediaModel.__table__.c.sha256.in_(shas)))
+    conn.execute(delete(MediaAssetModel.__table__).where(MediaAssetModel.__table__.c.sha256.in_(shas)))
+
+
+def _remove(paths: Iterable[str]) -> int:
+    removed = 0
+    for path in paths:
+        try:
+            size = os.stat(path).st_size
+            os.remove(path)
+            removed += size
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+class MediaGC:
+    def __init__(self, engine=None, vault: Optional[MediaVault] = None, quota: int = MEDIA_QUOTA_BYTES,
+                 grace: int = GC_GRACE_SECONDS, batch_size: int = GC_BATCH, dry_run: bool = False):
+        from .database import sync_engine
+        self.engine = engine or sync_engine
+        self.vault = vault or default_vault()
+        self.quota = quota
+        self.grace = grace
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.stats = {"scanned": 0, "scannedBytes": 0, "orphans": 0, "reclaimedBytes": 0, "kept": 0, "keptBytes": 0,
+                      "evicted": 0, "evictedBytes": 0, "linksReleased": 0, "tmpRemoved": 0}
+
+    def scan(self):
+        """Streams the vault directory; yields (sha, rel_path, disk_path, size, mtime) of every file."""
+        root = self.vault.root
+        if not os.path.isdir(root):
+            return
+        with os.scandir(root) as shards:
+            for shard in shards:
+                if shard.name == ".tmp":
+                    self._sweep_tmp(shard.path)
+                    continue
+                if shard.is_file(follow_symlinks=False):
+                    entries = [shard]
+                    prefix = "/media/"
+                elif shard.is_dir(follow_symlinks=False) and not shard.name.startswith("."):
+                    entries = os.scandir(shard.path)
+                    prefix = f"/media/{shard.name}/"
+                else:
+                    continue
+                for entry in entries:
+                    if not entry.is_file(follow_symlinks=False) or entry.name.startswith("."):
+                        continue
+                    st = entry.stat(follow_symlinks=False)
+                    rel_path = prefix + entry.name
+                    yield sha_from_path(rel_path), rel_path, entry.path, st.st_size, st.st_mtime
+                if prefix != "/media/":
+                    entries.close()
+
+    def _sweep_tmp(self, directory: str):
+        # Partial downloads of crashed workers; never the ones still being written, even with grace=0
+        cutoff = time.time() - max(self.grace, GC_GRACE_SECONDS)
+        with os.scandir(directory) as entries:
+            stale = [(e.path, e.stat().st_size) for e in entries if e.is_file() and e.stat().st_mtime < cutoff]
+        self.stats["reclaimedBytes"] += (sum(size for _, size in stale) if self.dry_run
+                                         else _remove(path for path, _ in stale))
+        self.stats["tmpRemoved"] += len(stale)
+
+    def _delete_batch(self, batch: List[Tuple[str, str, str, int]]) -> List[Tuple[str, str, str, int]]:
+        """Deletes a batch of unreferenced files; returns the ones that turned out to be in use."""
+        with self.engine.begin() as conn:
+            in_use = still_referenced(conn, [(sha, rel) for sha, rel, _, _ in batch])
+            doomed = [f for f in batch if (f[0] or f[1]) not in in_use]
+            if doomed and not self.dry_run:
+                forget_assets(conn, [sha for sha, _, _, _ in doomed if sha])
+        self.stats["orphans"] += len(doomed)
+        self.stats["reclaimedBytes"] += (sum(f[3] for f in doomed) if self.dry_run
+                                         else _remove(disk for _, _, disk, _ in doomed))
+        return [f for f in batch if (f[0] or f[1]) in in_use]
+
+    def _evict(self, cold: List[Tuple[datetime, str, str, str, int]]):
+        """Evicts the coldest creatives until the kept bytes are under the low watermark."""
+        target = int(self.quota * MEDIA_QUOTA_LOW_WATERMARK)
+        ads, links, posters, assets = (AdModel.__table__, AdMediaModel.__table__,
+                                       MediaPosterModel.__table__, MediaAssetModel.__table__)
+        cold.sort()
+        for start in range(0, len(cold), self.batch_size):
+            if self.stats["keptBytes"] <= target:
+                break
+            batch = cold[start:start + self.batch_size]
+            evicted, on_poster, now = [], [], datetime.utcnow()
+            with self.engine.begin() as conn:
+                poster_of = dict(conn.execute(select(posters.c.sha256, assets.c.path)
+                                              .join(assets, assets.c.sha256 == posters.c.poster_sha256)
+                                              .where(posters.c.sha256.in_([f[1] for f in batch]))).all())
+                for _, sha, rel_path, disk_path, size in batch:
+                    if self.stats["keptBytes"] <= target:
+                        break
+                    if sha not in poster_of:
+                        continue
+                    if not self.dry_run:
+                        showing = ads.c.id.in_(select(links.c.ad_id).where(links.c.sha256 == sha))
+                        moved = conn.execute(select(ads.c.id).where(showing, ads.c.mediaUrl == rel_path)).scalars().all()
+                        conn.execute(update(ads).where(ads.c.id.in_(moved)).values(
+                            mediaUrl=poster_of[sha], mediaHash=None, mediaEvictedAt=now))
+                        on_poster.extend(moved)
+                    evicted.append((sha, disk_path, size))
+                    self.stats["keptBytes"] -= size
+                if evicted and not self.dry_run:
+                    forget_media(conn, on_poster)
+                    forget_assets(conn, [sha for sha, _, _ in evicted], keep_posters=True)
+            self.stats["evicted"] += len(evicted)
+            self.stats["evictedBytes"] += (sum(size for _, _, size in evicted) if self.dry_run
+                                           else _remove(disk for _, disk, _ in evicted))
+
+    def run(self) -> Dict[str, object]:
+        started = time.time()
+        with self.engine.begin() as conn:
+            if not self.dry_run:
+                self.stats["linksReleased"] = release_stale_links(conn)
+            creatives, pinned, legacy = referenced_media(conn)
+
+        cutoff = started - max(self.grace, GC_MIN_GRACE_SECONDS)
+        batch, cold = [], []
+        for sha, rel_path, disk_path, size, mtime in self.scan():
+            self.stats["scanned"] += 1
+            self.stats["scannedBytes"] += size
+            if sha in creatives or sha in pinned or rel_path in legacy or mtime >= cutoff:
+                self.stats["kept"] += 1
+                self.stats["keptBytes"] += size
+                if sha in creatives and sha not in pinned:
+                    cold.append((creatives[sha], sha, rel_path, disk_path, size))
+                continue
+            batch.append((sha, rel_path, disk_path, size))
+            if len(batch) >= self.batch_size:
+                self._keep(self._delete_batch(batch))
+                batch = []
+        if batch:
+            self._keep(self._delete_batch(batch))
+
+        if self.quota and self.stats["keptBytes"] > self.quota:
+            self._evict(cold)
+        self.stats.update({"quota": self.quota, "dryRun": self.dry_run, "seconds": round(time.time() - started, 2)})
+        return self.stats
+
+    def _keep(self, files):
+        self.stats["kept"] += len(files)
+        self.stats["keptBytes"] += sum(f[3] for f in files)
+
+
+def collect_garbage(engine=None, vault: Optional[MediaVault] = None, quota: Optional[int] = None,
+                    grace: int = GC_GRACE_SECONDS, dry_run: bool = False) -> Dict[str, object]:
+    return MediaGC(engine, vault, MEDIA_QUOTA_BYTES if quota is None else quota, grace=grace, dry_run=dry_run).run()
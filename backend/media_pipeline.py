@@ -0,0 +1,237 @@
+"""
+Media download pipeline, decoupled from row ingestion.
+
+Importers write ads with their external URLs first and then hand (ad_id, url)
+jobs to a MediaPipeline: a bounded thread pool with its own concurrency limit,
+a per-host connection cap, retries with exponential backoff and a follow-up
+UPDATE of mediaUrl/thumbnail/mediaHash once the file is on disk, which also
+fingerprints the creative for near-duplicate detection (ad_fingerprints.py)
+and picks up its poster if one was already rendered (media_posters.py).
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from typing import Optional, Iterable, Dict, Any, Callable
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from sqlalchemy import update, delete
+
+from .media_vault import MEDIA_DIR, MediaVault, default_vault, media_extension, sha_from_path
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Referer': 'https://www.facebook.com/',
+    'Connection': 'keep-alive'
+}
+
+# 408/429 and 5xx are worth retrying; 403/404 (e.g. an expired presigned URL) are not
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class MediaDownloadError(Exception):
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def make_session(per_host: int = 4) -> requests.Session:
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=per_host)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+_default_session = make_session()
+
+
+def fetch_media(url: str, ad_id: str, session: Optional[requests.Session] = None,
+                timeout: float = 30, vault: Optional[MediaVault] = None) -> str:
+    """
+    Returns the vault path for url, downloading only if its canonical URL is unknown.
+    Raises MediaDownloadError.
+    """
+    if url.startswith("/media/"):
+        return url
+    if not url or not url.startswith("http"):
+        raise MediaDownloadError(f"not an http url: {url!r}", retryable=False)
+
+    vault = vault or default_vault()
+    known = vault.lookup(url)
+    if known:
+        return known
+
+    try:
+        response = (session or _default_session).get(url, stream=True, timeout=timeout)
+    except requests.RequestException as e:
+        raise MediaDownloadError(str(e), retryable=True)
+
+    with response:
+        if response.status_code != 200:
+            raise MediaDownloadError(f"HTTP {response.status_code}",
+                                     retryable=response.status_code in RETRYABLE_STATUS)
+        try:
+            sha, rel_path, size = vault.store(response.iter_content(chunk_size=65536), media_extension(url))
+        except requests.RequestException as e:
+            raise MediaDownloadError(str(e), retryable=True)
+
+    vault.register(url, sha, rel_path, size, response.headers.get("Content-Type"))
+    return rel_path
+
+
+def apply_media_result(ad_id: str, url: str, local_path: str, engine=None, vault: Optional[MediaVault] = None):
+    """Points the ad at the local copy, unless its media changed while we were fetching."""
+    from .database import sync_engine
+    from .models import AdModel, MediaQueueModel
+    from .ad_fingerprints import fingerprint_media, image_hash
+    from .media_posters import apply_posters
+
+    ads = AdModel.__table__
+    vault = vault or default_vault()
+    sha = sha_from_path(local_path)
+    # Decoded before the transaction: the pipeline serialises these writes
+    image = image_hash(vault.disk_path(local_path)) if sha else None
+    with (engine or sync_engine).begin() as conn:
+        moved = conn.execute(update(ads).where(ads.c.id == ad_id, ads.c.mediaUrl == url)
+                             .values(mediaUrl=local_path, mediaHash=sha))
+        conn.execute(update(ads).where(ads.c.id == ad_id, ads.c.thumbnail == url).values(thumbnail=local_path))
+        if moved.rowcount:
+            vault.attach(conn, ad_id, local_path)
+            conn.execute(delete(MediaQueueModel.__table__).where(MediaQueueModel.__table__.c.ad_id == ad_id))
+            if sha:
+                fingerprint_media(conn, ad_id, sha, image)
+                # Creative already known to the vault: its poster may exist
+                apply_posters(conn, ad_ids=[ad_id])
+
+
+def resolve_known_media(ads: Iterable[Dict[str, Any]], vault: Optional[MediaVault] = None) -> int:
+    """
+    Swaps external mediaUrl/thumbnail values for vault paths when the creative is
+    already stored, in place. Returns how many ads were resolved without a download.
+    """
+    ads = list(ads)
+    urls = [ad.get(k) for ad in ads for k in ("mediaUrl", "thumbnail") if isinstance(ad.get(k), str)]
+    known = (vault or default_vault()).lookup_many(urls)
+    resolved = 0
+    for ad in ads:
+        original = ad.get("mediaUrl")
+        if original in known:
+            ad["mediaUrl"] = known[original]
+            resolved += 1
+        if ad.get("thumbnail") in known:
+            ad["thumbnail"] = known[ad["thumbnail"]]
+    return resolved
+
+
+class MediaPipeline:
+    def __init__(self, max_workers: int = 16, per_host: int = 4, retries: int = 3,
+                 backoff: float = 1.0, timeout: float = 30,
+                 fetch: Callable[..., str] = fetch_media,
+                 on_done: Optional[Callable[[str, str, str], None]] = apply_media_result,
+                 on_failed: Optional[Callable[[str, str, Exception], None]] = None,
+                 vault: Optional[MediaVault] = None):
+        self.per_host = per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.fetch = fetch
+        self.on_done = on_done
+        self.on_failed = on_failed
+        self.vault = vault
+        self.session = make_session(per_host)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="media")
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+        # Serialises the follow-up UPDATEs so SQLite sees a single writer
+        self._write_lock = threading.Lock()
+        self._pending = set()
+        self.stats = {"queued": 0, "downloaded": 0, "failed": 0, "retries": 0}
+
+    def _slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_slots[host]
+
+    def _run(self, ad_id: str, url: str) -> Optional[str]:
+        slot = self._slot(url)
+        for attempt in range(self.retries + 1):
+            try:
+                with slot:
+                    local_path = self.fetch(url, ad_id, session=self.session, timeout=self.timeout, vault=self.vault)
+                if self.on_done:
+                    with self._write_lock:
+                        self.on_done(ad_id, url, local_path)
+                self._count("downloaded")
+                return local_path
+            except MediaDownloadError as e:
+                error = e
+                if not e.retryable or attempt == self.retries:
+                    print(f"[Media] Giving up on {ad_id} ({e})")
+                    break
+                self._count("retries")
+                # Exponential backoff with jitter, outside the host slot
+                time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random()))
+            except Exception as e:
+                error = e
+                print(f"[Media] Error for {ad_id}: {e}")
+                break
+        self._count("failed")
+        if self.on_failed:
+            self.on_failed(ad_id, url, error)
+        return None
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def submit(self, ad_id: str, url: str) -> Future:
+        future = self._executor.submit(self._run, ad_id, url)
+        with self._lock:
+            self.stats["queued"] += 1
+            self._pending.add(future)
+        future.add_done_callback(self._discard)
+        return future
+
+    def _discard(self, future: Future):
+        with self._lock:
+            self._pending.discard(future)
+
+    def submit_many(self, jobs: Iterable[Dict[str, Any]]):
+        return [self.submit(job["ad_id"], job["url"]) for job in jobs]
+
+    def wait(self, timeout: Optional[float] = None) -> Dict[str, int]:
+        with self._lock:
+            pending = list(self._pending)
+        wait(pending, timeout=timeout)
+        return dict(self.stats)
+
+    def shutdown(self, wait_for_jobs: bool = True):
+        self._executor.shutdown(wait=wait_for_jobs)
+
+
+def media_jobs(ads: Iterable[Dict[str, Any]]):
+    """(ad_id, url) download jobs for ads whose media is still external."""
+    return [
+        {"ad_id": str(ad["id"]), "url": ad["mediaUrl"]}
+        for ad in ads
+        if ad.get("id") and isinstance(ad.get("mediaUrl"), str) and ad["mediaUrl"].startswith("http")
+    ]
+
+
+_local_pipeline: Optional[MediaPipeline] = None
+
+
+def local_pipeline() -> MediaPipeline:
+    """Process-wide pipeline used when no Celery worker is reachable."""
+    global _local_pipeline
+    if _local_pipeline is None:
+        _local_pipeline = MediaPipeline()
+    return _local_pipeline
@@ -0,0 +1,186 @@
+"""
+Card-sized posters for stored creatives.
+
+Ads used to carry the creative itself as their thumbnail, so a grid of cards
+downloaded whole MP4s (as <video poster>, which cannot even render them) and
+full-size images. The poster job renders one small JPEG per vault asset:
+
+- videos: a frame POSTER_SEEK seconds in, via ffmpeg (first frame for shorter clips);
+- images: downscaled with Pillow (first frame of GIFs).
+
+Posters are vault assets themselves (content-addressed, served as immutable)
+and `media_posters` maps each source asset to its poster. Thumbnails that are
+missing, external or equal to the creative are repointed at the poster, both
+by the job and when a download lands on an asset that already has one.
+Renders that fail are retried up to POSTER_ATTEMPTS times; assets whose tool
+is not installed (no ffmpeg / Pillow) are left pending.
+"""
+import io
+import os
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional, Dict, Iterable, List
+
+from sqlalchemy import select, update, or_, and_, exists
+
+from .models import AdModel, MediaAssetModel, AdMediaModel, MediaPosterModel
+from .media_vault import MediaVault, default_vault
+from .ad_fingerprints import IMAGE_EXTENSIONS, Image
+
+POSTER_WIDTH = int(os.getenv("MEDIA_POSTER_WIDTH", "480"))
+POSTER_QUALITY = int(os.getenv("MEDIA_POSTER_QUALITY", "75"))
+POSTER_SEEK = float(os.getenv("MEDIA_POSTER_SEEK", "1.0"))
+POSTER_BATCH = int(os.getenv("MEDIA_POSTER_BATCH", "500"))
+POSTER_WORKERS = int(os.getenv("MEDIA_POSTER_WORKERS", "4"))
+POSTER_ATTEMPTS = 3
+FFMPEG = os.getenv("FFMPEG_BINARY", "ffmpeg")
+FFMPEG_TIMEOUT = 60
+
+VIDEO_EXTENSIONS = {"mp4", "webm", "mov", "m4v", "ogg", "ogv", "mkv"}
+
+
+class PosterUnavailable(Exception):
+    """The tool for this kind of creative is not installed here."""
+
+
+def media_kind(path: str, content_type: Optional[str] = None) -> Optional[str]:
+    ext = path.rsplit(".", 1)[-1].lower()
+    if ext in IMAGE_EXTENSIONS or (content_type or "").startswith("image/"):
+        return "image"
+    if ext in VIDEO_EXTENSIONS or (content_type or "").startswith("video/"):
+        return "video"
+    return None
+
+
+def _video_frame(path: str, seek: float) -> bytes:
+    command = [FFMPEG, "-nostdin", "-v", "error", "-ss", str(seek), "-i", path, "-frames:v", "1",
+               "-vf", f"scale='min({POSTER_WIDTH},iw)':-2", "-q:v", "5", "-f", "image2pipe", "-c:v", "mjpeg", "pipe:1"]
+    try:
+        done = subprocess.run(command, capture_output=True, timeout=FFMPEG_TIMEOUT, check=False)
+    except subprocess.TimeoutExpired:
+        return b""
+    return done.stdout if done.returncode == 0 else b""
+
+
+def _image_poster(path: str) -> bytes:
+    with Image.open(path) as img:
+        img.draft("RGB", (POSTER_WIDTH, POSTER_WIDTH * 4)) # JPEG: decode at reduced size
+        img = img.convert("RGB")
+        img.thumbnail((POSTER_WIDTH, POSTER_WIDTH * 4), Image.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, "JPEG", quality=POSTER_QUALITY, optimize=True, progressive=True)
+        return out.getvalue()
+
+
+def render_poster(path: str, kind: str) -> Optional[bytes]:
+    """JPEG bytes of the poster; None when the file cannot be decoded. Raises PosterUnavailable."""
+    if kind == "video":
+        if not shutil.which(FFMPEG):
+            raise PosterUnavailable(FFMPEG)
+        # Short clips have nothing at POSTER_SEEK: fall back to the first frame
+        return _video_frame(path, POSTER_SEEK) or _video_frame(path, 0) or None
+    if Image is None:
+        raise PosterUnavailable("Pillow")
+    try:
+        return _image_poster(path)
+    except Exception:
+        return None
+
+
+def renderable(kind: Optional[str]) -> bool:
+    if kind == "video":
+        return shutil.which(FFMPEG) is not None
+    return kind == "image" and Image is not None
+
+
+# --- Thumbnails ---
+
+def apply_posters(conn, shas: Optional[Iterable[str]] = None, ad_ids: Optional[Iterable[str]] = None) -> int:
+    """Points thumbnails that are missing, external or the creative itself at the creative's poster."""
+    ads, links, posters, assets = (AdModel.__table__, AdMediaModel.__table__,
+                                   MediaPosterModel.__table__, MediaAssetModel.__table__)
+    poster_path = (select(assets.c.path)
+                   .select_from(links.join(posters, posters.c.sha256 == links.c.sha256)
+                                .join(assets, assets.c.sha256 == posters.c.poster_sha256))
+                   .where(links.c.ad_id == ads.c.id).scalar_subquery())
+    stmt = update(ads).where(
+        or_(ads.c.thumbnail.is_(None), ads.c.thumbnail == "", ads.c.thumbnail == ads.c.mediaUrl,
+            ads.c.thumbnail.like("http%")),
+        poster_path.is_not(None),
+    ).values(thumbnail=poster_path)
+    if shas is not None:
+        stmt = stmt.where(ads.c.id.in_(select(links.c.ad_id).where(links.c.sha256.in_(list(shas)))))
+    if ad_ids is not None:
+        stmt = stmt.where(ads.c.id.in_(list(ad_ids)))
+    return conn.execute(stmt).rowcount
+
+
+# --- Job ---
+
+def pending_assets(conn, limit: int = POSTER_BATCH) -> List[Dict]:
+    """Assets without a poster that this host can render, most referenced first."""
+    assets, posters = MediaAssetModel.__table__, MediaPosterModel.__table__
+    used_as = posters.alias("used_as")
+    is_poster = exists().where(used_as.c.poster_sha256 == assets.c.sha256)
+    rows = conn.execute(
+        select(assets.c.sha256, assets.c.path, assets.c.size, assets.c.content_type)
+        .outerjoin(posters, posters.c.sha256 == assets.c.sha256)
+        .where(or_(posters.c.sha256.is_(None),
+                   and_(posters.c.poster_sha256.is_(None), posters.c.attempts < POSTER_ATTEMPTS)),
+               ~is_poster)
+        .order_by(assets.c.ref_count.desc(), assets.c.created_at.desc())
+    ).fetchall()
+    pending = []
+    for row in rows:
+        kind = media_kind(row.path, row.content_type)
+        if renderable(kind):
+            pending.append({"sha256": row.sha256, "path": row.path, "size": row.size or 0, "kind": kind})
+            if len(pending) >= limit:
+                break
+    return pending
+
+
+def generate_posters(limit: int = POSTER_BATCH, engine=None, vault: Optional[MediaVault] = None) -> Dict[str, int]:
+    """Renders up to `limit` pending posters and repoints the affected thumbnails."""
+    from .database import sync_engine
+    from .ingest import dialect_insert
+
+    engine = engine or sync_engine
+    vault = vault or default_vault()
+    with engine.connect() as conn:
+        pending = pending_assets(conn, limit)
+    summary = {"pending": len(pending), "rendered": 0, "failed": 0, "thumbnails": 0, "sourceBytes": 0, "posterBytes": 0}
+    if not pending:
+        return summary
+
+    def render(asset):
+        try:
+            return asset, render_poster(vault.disk_path(asset["path"]), asset["kind"])
+        except (PosterUnavailable, OSError):
+            return asset, None
+
+    posters = MediaPosterModel.__table__
+    insert = dialect_insert(engine.dialect.name)
+    with ThreadPoolExecutor(max_workers=POSTER_WORKERS) as pool:
+        for asset, data in pool.map(render, pending):
+            poster_sha = None
+            with engine.begin() as conn:
+                if data:
+                    poster_sha, rel_path, size = vault.store([data], "jpg")
+                    vault.add_asset(conn, poster_sha, rel_path, size, "image/jpeg")
+                    summary["rendered"] += 1
+                    summary["sourceBytes"] += asset["size"]
+                    summary["posterBytes"] += size
+                else:
+                    summary["failed"] += 1
+                stmt = insert(posters).values(sha256=asset["sha256"], poster_sha256=poster_sha, attempts=1,
+                                              updated_at=datetime.utcnow())
+                conn.execute(stmt.on_conflict_do_update(index_elements=["sha256"], set_={
+                    "poster_sha256": stmt.excluded.poster_sha256, "attempts": posters.c.attempts + 1,
+                    "updated_at": stmt.excluded.updated_at}))
+                if poster_sha:
+                    summary["thumbnails"] += apply_posters(conn, shas=[asset["sha256"]])
+    return summary
+
@@ -0,0 +1,184 @@
+"""
+Expiry-aware refresh of media that is still external.
+
+Scalatracker exports carry presigned URLs (DigitalOcean Spaces,
+X-Amz-Expires=28800): when the import-time download fails, the ad keeps a
+URL that dies eight hours later, and clean_ads used to delete such ads. They
+are now kept in `media_queue` and refreshed by a scheduler instead:
+
+- sync_queue(): every ad whose mediaUrl is external gets a row, with the
+  expiry parsed from its signature (url_expiry). Rows of ads that became
+  local, changed URL (a re-import with a fresh signature starts over) or
+  were deleted are dropped.
+- run_refresh_cycle(): due rows are downloaded soonest-expiring first,
+  REFRESH_BATCH per cycle, through the media pipeline. Failures back off
+  exponentially, but each retry is scheduled at most halfway to the
+  expiry, so several attempts happen while the URL is still valid. Rows
+  whose URL expired become `expired` (an expiry miss), and rows that keep
+  failing after REFRESH_MAX_ATTEMPTS become `failed`. Both keep their ad
+  until a re-import brings a fresh URL.
+
+media_refresh_task runs a cycle every two minutes (see worker.py); each cycle
+reports its throughput and expiry misses.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any, List
+from urllib.parse import urlsplit, parse_qsl
+
+from sqlalchemy import select, delete, update, func, exists
+
+from .models import AdModel, MediaQueueModel
+
+REFRESH_BATCH = int(os.getenv("MEDIA_REFRESH_BATCH", "400"))
+REFRESH_MAX_ATTEMPTS = int(os.getenv("MEDIA_REFRESH_MAX_ATTEMPTS", "8"))
+REFRESH_BACKOFF = 60 # seconds before the first retry, doubled per attempt
+REFRESH_MAX_BACKOFF = 6 * 3600
+# New rows wait for the import-time download first, unless their URL expires sooner than this
+REFRESH_INITIAL_DELAY = 300
+REFRESH_URGENT = 3600
+
+
+def _utc(value: datetime) -> datetime:
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+
+def url_expiry(url: str) -> Optional[datetime]:
+    """When a presigned URL stops working (naive UTC); None for unsigned or unknown schemes."""
+    try:
+        params = {k.lower(): v for k, v in parse_qsl(urlsplit(url).query)}
+        # SigV4 (S3, DigitalOcean Spaces) and GCS V4: signed at *-date, valid for *-expires seconds
+        for prefix in ("x-amz-", "x-goog-"):
+            if f"{prefix}date" in params and f"{prefix}expires" in params:
+                signed = datetime.strptime(params[f"{prefix}date"], "%Y%m%dT%H%M%SZ")
+                return signed + timedelta(seconds=int(params[f"{prefix}expires"]))
+        # SigV2 / CloudFront: absolute epoch seconds
+        if params.get("expires", "").isdigit():
+            return datetime.utcfromtimestamp(int(params["expires"]))
+        # Facebook / Instagram CDN: hex epoch seconds
+        if "oe" in params:
+            return datetime.utcfromtimestamp(int(params["oe"], 16))
+        # Azure SAS: ISO 8601
+        if "se" in params:
+            return _utc(datetime.fromisoformat(params["se"].replace("Z", "+00:00")))
+    except (ValueError, OverflowError, OSError):
+        return None
+    return None
+
+
+def next_attempt(attempts: int, now: datetime, expires_at: Optional[datetime]) -> datetime:
+    delay = min(REFRESH_BACKOFF * 2 ** max(attempts - 1, 0), REFRESH_MAX_BACKOFF)
+    if expires_at is not None:
+        # Never wait past half of the time the URL has left
+        delay = min(delay, max((expires_at - now).total_seconds() / 2, 0))
+    return now + timedelta(seconds=delay)
+
+
+# --- Queue ---
+
+def sync_queue(conn, now: Optional[datetime] = None) -> Dict[str, int]:
+    """Brings media_queue in line with the ads that still point at external media."""
+    ads, queue = AdModel.__table__, MediaQueueModel.__table__
+    now = now or datetime.utcnow()
+    current = exists().where(ads.c.id == queue.c.ad_id, ads.c.mediaUrl == queue.c.url)
+    resolved = conn.execute(delete(queue).where(~current)).rowcount
+
+    missing = conn.execute(select(ads.c.id, ads.c.mediaUrl)
+                           .outerjoin(queue, queue.c.ad_id == ads.c.id)
+                           .where(ads.c.mediaUrl.like("http%"), queue.c.ad_id.is_(None))).fetchall()
+    rows, expired = [], 0
+    for ad_id, url in missing:
+        expires_at = url_expiry(url)
+        status = "pending"
+        if expires_at is not None and expires_at <= now:
+            status, expired = "expired", expired + 1
+        urgent = expires_at is not None and (expires_at - now).total_seconds() < REFRESH_URGENT
+        rows.append({"ad_id": ad_id, "url": url, "expires_at": expires_at, "status": status, "attempts": 0,
+                     "next_attempt_at": now if urgent else now + timedelta(seconds=REFRESH_INITIAL_DELAY),
+                     "last_error": "signature expired" if status == "expired" else None})
+    for start in range(0, len(rows), 1000):
+        conn.execute(queue.insert(), rows[start:start + 1000])
+    return {"queued": len(rows), "expired": expired, "resolved": resolved}
+
+
+def queue_stats(conn, now: Optional[datetime] = None) -> Dict[str, Any]:
+    queue = MediaQueueModel.__table__
+    now = now or datetime.utcnow()
+    by_status = dict(conn.execute(select(queue.c.status, func.count()).group_by(queue.c.status)).all())
+    pending = queue.c.status == "pending"
+    expiring, next_expiry = conn.execute(select(
+        func.count().filter(queue.c.expires_at <= now + timedelta(hours=1)), func.min(queue.c.expires_at)
+    ).where(pending)).one()
+    return {"pending": by_status.get("pending", 0), "expired": by_status.get("expired", 0),
+            "failed": by_status.get("failed", 0), "expiringWithinHour": expiring or 0,
+            "nextExpiry": next_expiry.isoformat() + "Z" if next_expiry else None}
+
+
+# --- Scheduler ---
+
+def run_refresh_cycle(engine=None, limit: int = REFRESH_BATCH, **pipeline_options) -> Dict[str, Any]:
+    """One scheduler pass: sync, expire, download the most urgent due rows, reschedule the failures."""
+    from .database import sync_engine
+    from .media_pipeline import MediaPipeline, MediaDownloadError
+
+    engine = engine or sync_engine
+    queue = MediaQueueModel.__table__
+    started, now = time.time(), datetime.utcnow()
+    with engine.begin() as conn:
+        synced = sync_queue(conn, now)
+        misses = conn.execute(update(queue).where(queue.c.status == "pending", queue.c.expires_at <= now)
+                              .values(status="expired", last_error="signature expired")).rowcount
+        due = conn.execute(select(queue.c.ad_id, queue.c.url, queue.c.expires_at, queue.c.attempts)
+                           .where(queue.c.status == "pending", queue.c.next_attempt_at <= now)
+                           .order_by(queue.c.expires_at.asc().nulls_last(), queue.c.next_attempt_at)
+                           .limit(limit)).fetchall()
+
+    failures: List[tuple] = []
+    lock = threading.Lock()
+
+    def failed(ad_id, url, error):
+        with lock:
+            failures.append((ad_id, error))
+
+    report = {"queued": synced["queued"], "resolved": synced["resolved"],
+              "expiryMisses": misses + synced["expired"], "due": len(due), "downloaded": 0, "retrying": 0,
+              "gaveUp": 0}
+    if due:
+        # One quick retry inside the cycle for transient errors; the queue handles the rest
+        pipeline = MediaPipeline(**{"retries": 1, **pipeline_options, "on_failed": failed})
+        pipeline.submit_many({"ad_id": r.ad_id, "url": r.url} for r in due)
+        stats = pipeline.wait()
+        pipeline.shutdown()
+        report["downloaded"] = stats["downloaded"]
+
+        rows = {r.ad_id: r for r in due}
+        after = datetime.utcnow()
+        with engine.begin() as conn:
+            for ad_id, error in failures:
+                row = rows[ad_id]
+                attempts = row.attempts + 1
+                expired = row.expires_at is not None and row.expires_at <= after
+                retryable = not isinstance(error, MediaDownloadError) or error.retryable
+                if expired:
+                    status = "expired"
+                    report["expiryMisses"] += 1
+                elif attempts >= REFRESH_MAX_ATTEMPTS or not retryable:
+                    status = "failed"
+                    report["gaveUp"] += 1
+                else:
+                    status = "pending"
+                    report["retrying"] += 1
+                conn.execute(update(queue).where(queue.c.ad_id == ad_id, queue.c.url == row.url).values(
+                    status=status, attempts=attempts, last_error=str(error)[:500],
+                    next_attempt_at=next_attempt(attempts, after, row.expires_at)))
+            report.update(queue_stats(conn, after))
+    else:
+        with engine.connect() as conn:
+            report.update(queue_stats(conn, now))
+
+    seconds = time.time() - started
+    report.update({"seconds": round(seconds, 2),
+                   "perMinute": round(report["downloaded"] * 60 / seconds, 1) if seconds else 0.0})
+    return report
@@ -0,0 +1,104 @@
+"""
+/media: vault files for <img>/<video> tags, replacing the plain StaticFiles mount.
+
+- Content-addressed files (/media/<sha[:2]>/<sha>.<ext>) never change: the sha
+  is their strong ETag and they are cacheable for a year with `immutable`, so
+  browsers stop revalidating them. Files with legacy names keep the
+  mtime/size ETag and a short max-age.
+- If-None-Match answers 304; Range / If-Range (video seeking, and the first
+  bytes a <video> reads for its metadata) answer 206 from FileResponse.
+- MEDIA_SERVE_MODE=accel: when the request came through the nginx in front of
+  the API (it sends the X-Media-Accel header with its internal location, see
+  nginx.conf), the API only resolves the file and sets the headers; nginx
+  sends the bytes via X-Accel-Redirect. Requests that reach uvicorn directly
+  are still streamed by the app.
+"""
+import os
+import stat
+from mimetypes import guess_type
+from typing import Optional
+from urllib.parse import quote
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, PlainTextResponse, Response
+
+from .media_vault import sha_from_path
+
+MEDIA_SERVE_MODE = os.getenv("MEDIA_SERVE_MODE", "app") # app | accel
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+LEGACY_CACHE = "public, max-age=3600"
+ACCEL_HEADER = "x-media-accel"
+
+
+class MediaFileResponse(FileResponse):
+    # Larger reads: fewer trips through the middleware stack per video
+    chunk_size = 256 * 1024
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in tags or f"W/{etag}" in tags
+
+
+class MediaFiles:
+    """ASGI app serving `directory` at its mount point (GET/HEAD only)."""
+
+    def __init__(self, directory: str, mode: str = MEDIA_SERVE_MODE):
+        self.directory = os.path.realpath(directory)
+        self.mode = mode
+
+    def resolve(self, rel_path: str) -> Optional[str]:
+        """Disk path for /<sub>/<name>; None for traversal, dotfiles (.tmp) or anything outside the vault."""
+        parts = [p for p in rel_path.split("/") if p]
+        if not parts or any(p.startswith(".") or "\\" in p or "\0" in p for p in parts):
+            return None
+        full = os.path.realpath(os.path.join(self.directory, *parts))
+        if os.path.commonpath([full, self.directory]) != self.directory:
+            return None
+        return full
+
+    async def __call__(self, scope, receive, send):
+        assert scope["type"] == "http"
+        if scope["method"] not in ("GET", "HEAD"):
+            await PlainTextResponse("Method Not Allowed", status_code=405, headers={"Allow": "GET, HEAD"})(scope, receive, send)
+            return
+
+        # Path relative to the mount ("/ab/<sha>.mp4")
+        path, root = scope["path"], scope.get("root_path", "")
+        rel_path = path[len(root):] if root and path.startswith(root) else path
+        full = self.resolve(rel_path)
+        try:
+            stat_result = await anyio.to_thread.run_sync(os.stat, full) if full else None
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            stat_result = None
+        if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+            await PlainTextResponse("Not Found", status_code=404)(scope, receive, send)
+            return
+
+        sha = sha_from_path("/media" + rel_path)
+        headers = {"cache-control": IMMUTABLE_CACHE if sha else LEGACY_CACHE}
+        if sha:
+            headers["etag"] = f'"{sha}"'
+        response = MediaFileResponse(full, headers=headers, stat_result=stat_result)
+
+        request_headers = Headers(scope=scope)
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match and _etag_matches(if_none_match, response.headers["etag"]):
+            not_modified = {k: response.headers[k] for k in ("etag", "cache-control", "last-modified")}
+            await Response(status_code=304, headers=not_modified)(scope, receive, send)
+            return
+
+        accel_prefix = request_headers.get(ACCEL_HEADER)
+        if self.mode == "accel" and accel_prefix:
+            # nginx serves the bytes (and Range) from its internal location; the body here stays empty
+            await Response(headers={
+                **{k: response.headers[k] for k in ("etag", "cache-control", "last-modified")},
+                "content-type": guess_type(full)[0] or "application/octet-stream",
+                "x-accel-redirect": accel_prefix.rstrip("/") + quote(rel_path),
+            })(scope, receive, send)
+            return
+
+        await response(scope, receive, send)
@@ -0,0 +1,201 @@
+"""
+Content-addressed media vault under backend/media.
+
+Files are stored once per SHA-256 of their bytes at /media/<sha[:2]>/<sha>.<ext>.
+`media_urls` maps canonical source URLs (presigned signature/expiry params removed)
+to the content hash, so re-importing a creative whose URL was merely re-signed
+resolves to the existing file without downloading it again. `ad_media` records
+which ad points at which asset and `media_assets.ref_count` counts those ads.
+"""
+import hashlib
+import os
+import uuid
+from typing import Optional, Iterable, Dict, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from sqlalchemy import select, update, func
+
+MEDIA_DIR = "backend/media"
+
+# Query params that only sign/authorise a URL and change on every export
+SIGNATURE_PARAMS = {
+    "signature", "expires", "key-pair-id", "policy", "awsaccesskeyid",
+    "oh", "oe", "sig", "se", "sp", "sv", "sr", "st", "token",
+}
+SIGNATURE_PREFIXES = ("x-amz-", "x-goog-", "_nc_")
+
+
+def canonical_url(url: str) -> str:
+    parts = urlsplit(url.strip())
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in SIGNATURE_PARAMS and not k.lower().startswith(SIGNATURE_PREFIXES)
+    ]
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, urlencode(sorted(query)), ""))
+
+
+def media_extension(url: str) -> str:
+    clean_url = url.split("?")[0].split("#")[0]
+    ext = clean_url.split(".")[-1].lower() if "." in clean_url.rsplit("/", 1)[-1] else "mp4"
+    if len(ext) > 4 or not ext.isalnum():
+        ext = "mp4"
+    return ext
+
+
+def sha_from_path(path: str) -> Optional[str]:
+    """Extracts the hash from a vault path (/media/ab/<sha>.ext); None for legacy files."""
+    if not path or not path.startswith("/media/"):
+        return None
+    name = path.rsplit("/", 1)[-1].split(".", 1)[0]
+    if len(name) == 64 and all(c in "0123456789abcdef" for c in name):
+        return name
+    return None
+
+
+class MediaVault:
+    def __init__(self, root: Optional[str] = None, engine=None):
+        self._root = root
+        self._engine = engine
+
+    @property
+    def root(self) -> str:
+        # Resolved lazily so tools can repoint MEDIA_DIR before first use
+        return self._root or MEDIA_DIR
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            from .database import sync_engine
+            self._engine = sync_engine
+        return self._engine
+
+    def relative_path(self, sha: str, ext: str) -> str:
+        return f"/media/{sha[:2]}/{sha}.{ext}"
+
+    def disk_path(self, rel_path: str) -> str:
+        return os.path.join(self.root, rel_path[len("/media/"):])
+
+    def exists(self, rel_path: str) -> bool:
+        return os.path.exists(self.disk_path(rel_path))
+
+    # --- lookups ---
+
+    def lookup(self, url: str) -> Optional[str]:
+        return self.lookup_many([url]).get(url)
+
+    def lookup_many(self, urls: Iterable[str]) -> Dict[str, str]:
+        """Maps source URLs to vault paths for creatives already stored (one query)."""
+        from .models import MediaAssetModel, MediaUrlModel
+
+        by_canonical: Dict[str, list] = {}
+        for url in urls:
+            if url and url.startswith("http"):
+                by_canonical.setdefault(canonical_url(url), []).append(url)
+        if not by_canonical:
+            return {}
+
+        resolved = {}
+        keys = list(by_canonical)
+        with self.engine.connect() as conn:
+            for i in range(0, len(keys), 500):
+                rows = conn.execute(
+                    select(MediaUrlModel.canonical_url, MediaAssetModel.path)
+                    .join(MediaAssetModel, MediaAssetModel.sha256 == MediaUrlModel.sha256)
+                    .where(MediaUrlModel.canonical_url.in_(keys[i:i + 500]))
+                ).all()
+                for canonical, path in rows:
+                    if self.exists(path):
+                        for url in by_canonical[canonical]:
+                            resolved[url] = path
+        return resolved
+
+    # --- writes ---
+
+    def store(self, chunks: Iterable[bytes], ext: str) -> Tuple[str, str, int]:
+        """Streams bytes to disk while hashing; returns (sha256, vault path, size)."""
+        tmp_dir = os.path.join(self.root, ".tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        tmp_path = os.path.join(tmp_dir, uuid.uuid4().hex)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with open(tmp_path, "wb") as f:
+                for chunk in chunks:
+                    if chunk:
+                        digest.update(chunk)
+                        size += len(chunk)
+                        f.write(chunk)
+            sha = digest.hexdigest()
+            rel_path = self.relative_path(sha, ext)
+            final_path = self.disk_path(rel_path)
+            if not os.path.exists(final_path):
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(tmp_path, final_path)
+            else:
+                # Known creative: restart its GC grace period until the new ad points at it
+                os.utime(final_path)
+            return sha, rel_path, size
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def register(self, url: str, sha: str, rel_path: str, size: int, content_type: Optional[str] = None):
+        from .ingest import dialect_insert
+        from .models import MediaUrlModel
+
+        insert = dialect_insert(self.engine.dialect.name)
+        with self.engine.begin() as conn:
+            self.add_asset(conn, sha, rel_path, size, content_type)
+            stmt = insert(MediaUrlModel.__table__).values(canonical_url=canonical_url(url), sha256=sha)
+            conn.execute(stmt.on_conflict_do_update(
+                index_elements=["canonical_url"],
+                set_={"sha256": stmt.excluded.sha256, "last_seen_at": func.now()},
+            ))
+
+    def add_asset(self, conn, sha: str, rel_path: str, size: int, content_type: Optional[str] = None):
+        """Records a stored file; register() also maps its source URL, generated files (posters) have none."""
+        from .ingest import dialect_insert
+        from .models import MediaAssetModel
+
+        insert = dialect_insert(conn.dialect.name)
+        conn.execute(insert(MediaAssetModel.__table__).values(
+            sha256=sha, path=rel_path, size=size, content_type=content_type, ref_count=0
+        ).on_conflict_do_nothing(index_elements=["sha256"]))
+
+    def attach(self, conn, ad_id: str, rel_path: Optional[str]):
+        """Points ad_id at the asset behind rel_path, keeping ref_count in step."""
+        from .models import MediaAssetModel, AdMediaModel
+
+        sha = sha_from_path(rel_path)
+        if not sha:
+            return
+        assets, links = MediaAssetModel.__table__, AdMediaModel.__table__
+        current = conn.execute(select(links.c.sha256).where(links.c.ad_id == ad_id)).scalar()
+        if current == sha:
+            return
+        if current:
+            conn.execute(update(assets).where(assets.c.sha256 == current, assets.c.ref_count > 0)
+                         .values(ref_count=assets.c.ref_count - 1))
+            conn.execute(update(links).where(links.c.ad_id == ad_id).values(sha256=sha))
+        else:
+            conn.execute(links.insert().values(ad_id=ad_id, sha256=sha))
+        conn.execute(update(assets).where(assets.c.sha256 == sha).values(ref_count=assets.c.ref_count + 1))
+
+    def attach_ads(self, ads: Iterable[Dict]):
+        """Records references for ads that were written already pointing at the vault."""
+        ads = [ad for ad in ads if sha_from_path(ad.get("mediaUrl"))]
+        if not ads:
+            return
+        with self.engine.begin() as conn:
+            for ad in ads:
+                self.attach(conn, str(ad["id"]), ad["mediaUrl"])
+
+
+_default_vault: Optional[MediaVault] = None
+
+
+def default_vault() -> MediaVault:
+    global _default_vault
+    if _default_vault is None:
+        _default_vault = MediaVault()
+    return _default_vault
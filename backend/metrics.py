@@ -0,0 +1,256 @@
+"""
+Prometheus metrics for the API and the Celery workers, served on GET /metrics.
+
+- HTTP: latency histogram per route template / method / status class, in-flight gauge.
+- SQL: statements and DB time per request (histograms per route), statement
+  latency per engine, via SQLAlchemy cursor events on both engines.
+- Pool: checked-out / idle / overflow connections of the async and sync engines,
+  read at scrape time.
+- Celery: task duration per task and final state (task_prerun / task_postrun
+  signals, in the worker) and broker queue depths (Redis LLEN at scrape time).
+
+Requests slower than LOG_SLOW_REQUEST_MS (app_logging.py) are sampled: their
+SQL statements (grouped, with counts and time) are logged as the request's
+single warning line and kept in a small ring buffer served by GET /metrics/slow,
+so N+1 patterns are visible directly.
+
+The API and the worker are separate processes: with PROMETHEUS_MULTIPROC_DIR set
+(a directory shared by both, emptied on deploy) /metrics aggregates the worker
+metrics as well. That is the deployed setup, so /metrics then requires
+METRICS_TOKEN and stays closed while it is unset.
+"""
+import contextvars
+import os
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from prometheus_client import (CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram,
+                               REGISTRY, generate_latest)
+from prometheus_client.core import GaugeMetricFamily
+
+from .app_logging import LOG_SLOW_REQUEST_MS
+
+METRICS_SLOW_SAMPLES = int(os.getenv("METRICS_SLOW_SAMPLES", "50"))
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+CELERY_QUEUES = [q for q in os.getenv("CELERY_QUEUES", "celery").split(",") if q]
+# Statements kept per request for slow-request samples
+MAX_STATEMENTS = 500
+QUEUE_DEPTH_TTL = 5
+
+MULTIPROC = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency",
+                         ["method", "route", "status"], buckets=LATENCY_BUCKETS)
+HTTP_IN_FLIGHT = Gauge("http_requests_in_progress", "HTTP requests being served", ["method"],
+                       multiprocess_mode="livesum")
+REQUEST_QUERIES = Histogram("http_request_db_queries", "SQL statements per request", ["route"],
+                            buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 250, 1000))
+REQUEST_DB_TIME = Histogram("http_request_db_seconds", "Time spent in SQL per request", ["route"],
+                            buckets=LATENCY_BUCKETS)
+DB_QUERY_LATENCY = Histogram("db_query_duration_seconds", "SQL statement latency", ["engine"],
+                             buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1, 5))
+SLOW_REQUESTS = Counter("http_slow_requests_total", "Requests above LOG_SLOW_REQUEST_MS", ["route"])
+CELERY_TASK_LATENCY = Histogram("celery_task_duration_seconds", "Celery task run time", ["task", "state"],
+                                buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600))
+
+_scrape_collectors: List[Any] = []
+_request_stats: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("request_stats", default=None)
+slow_samples: deque = deque(maxlen=METRICS_SLOW_SAMPLES)
+
+
+# --- SQLAlchemy ---
+
+def instrument_engine(sync_engine, name: str):
+    """Counts statements and their latency; attributes them to the current request, if any."""
+    from sqlalchemy import event
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        DB_QUERY_LATENCY.labels(name).observe(elapsed)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats["queries"] += 1
+            stats["dbTime"] += elapsed
+            if len(stats["statements"]) < MAX_STATEMENTS:
+                stats["statements"].append((statement, elapsed))
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+
+class PoolCollector:
+    """Connection pool usage, read when Prometheus scrapes (no bookkeeping on the hot path)."""
+
+    def __init__(self, engines: Dict[str, Any]):
+        self.engines = engines
+
+    def describe(self):
+        # Without describe() REGISTRY.register() calls collect() once to learn the names
+        return []
+
+    def collect(self):
+        checked_out = GaugeMetricFamily("db_pool_checked_out", "Connections in use", labels=["engine"])
+        idle = GaugeMetricFamily("db_pool_idle", "Idle connections in the pool", labels=["engine"])
+        overflow = GaugeMetricFamily("db_pool_overflow", "Connections above pool_size", labels=["engine"])
+        size = GaugeMetricFamily("db_pool_size", "Configured pool_size", labels=["engine"])
+        for name, pool in self.engines.items():
+            # Not every pool class (e.g. NullPool / StaticPool) reports usage
+            for family, attr in ((checked_out, "checkedout"), (idle, "checkedin"), (overflow, "overflow"), (size, "size")):
+                fn = getattr(pool, attr, None)
+                if fn is not None:
+                    # QueuePool.overflow() counts down from -pool_size until the pool is exhausted
+                    family.add_metric([name], max(fn(), 0))
+        yield from (checked_out, idle, overflow, size)
+
+
+class QueueDepthCollector:
+    """Celery broker queue lengths (Redis LLEN), cached for QUEUE_DEPTH_TTL seconds."""
+
+    def __init__(self, redis_url: Optional[str] = None, queues: List[str] = CELERY_QUEUES):
+        self.redis_url = redis_url or os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        self.queues = queues
+        self._cached = (0.0, {})
+
+    def describe(self):
+        # Registration must not open a Redis connection at import time (worker spawn)
+        return []
+
+    def _depths(self) -> Dict[str, int]:
+        fetched_at, depths = self._cached
+        if time.monotonic() - fetched_at < QUEUE_DEPTH_TTL:
+            return depths
+        try:
+            import redis
+            client = redis.Redis.from_url(self.redis_url, socket_timeout=0.2, socket_connect_timeout=0.2)
+            pipe = client.pipeline()
+            for name in self.queues:
+                pipe.llen(name)
+            depths = dict(zip(self.queues, pipe.execute()))
+        except Exception:
+            depths = {}
+        self._cached = (time.monotonic(), depths)
+        return depths
+
+    def collect(self):
+        family = GaugeMetricFamily("celery_queue_depth", "Messages waiting in the broker queue", labels=["queue"])
+        for name, depth in self._depths().items():
+            family.add_metric([name], depth)
+        yield family
+
+
+# --- HTTP ---
+
+def _route_template(request) -> str:
+    route = request.scope.get("route")
+    # Unmatched paths share one label so scanners cannot blow up the cardinality
+    return getattr(route, "path", None) or "unmatched"
+
+
+def _group_statements(statements) -> List[Dict[str, Any]]:
+    grouped: Dict[str, Dict[str, Any]] = {}
+    for statement, elapsed in statements:
+        g = grouped.setdefault(statement, {"statement": statement[:500], "count": 0, "totalMs": 0.0})
+        g["count"] += 1
+        g["totalMs"] += elapsed * 1000
+    rows = sorted(grouped.values(), key=lambda g: (-g["count"], -g["totalMs"]))
+    for g in rows:
+        g["totalMs"] = round(g["totalMs"], 2)
+    return rows
+
+
+def instrument_app(app, engines: Dict[str, Any], log=None):
+    """
+    Installs the metrics middleware and SQL listeners. `engines` maps a label to
+    a sync Engine (for an AsyncEngine pass its `.sync_engine`).
+    """
+    for name, sync_engine in engines.items():
+        instrument_engine(sync_engine, name)
+    _scrape_collectors[:] = [PoolCollector({name: e.pool for name, e in engines.items()}), QueueDepthCollector()]
+    if not MULTIPROC:
+        for collector in _scrape_collectors:
+            REGISTRY.register(collector)
+
+    @app.middleware("http")
+    async def metrics_middleware(request, call_next):
+        method = request.method
+        stats = {"queries": 0, "dbTime": 0.0, "statements": []}
+        token = _request_stats.set(stats)
+        HTTP_IN_FLIGHT.labels(method).inc()
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_IN_FLIGHT.labels(method).dec()
+            _request_stats.reset(token)
+            route = _route_template(request)
+            HTTP_LATENCY.labels(method, route, f"{status // 100}xx").observe(elapsed)
+            REQUEST_QUERIES.labels(route).observe(stats["queries"])
+            REQUEST_DB_TIME.labels(route).observe(stats["dbTime"])
+            if elapsed * 1000 >= LOG_SLOW_REQUEST_MS:
+                SLOW_REQUESTS.labels(route).inc()
+                sample = {
+                    "at": time.time(), "method": method, "path": request.url.path, "route": route,
+                    "status": status, "durationMs": round(elapsed * 1000, 1), "queries": stats["queries"],
+                    "dbMs": round(stats["dbTime"] * 1000, 1), "statements": _group_statements(stats["statements"]),
+                }
+                slow_samples.append(sample)
+                if log is not None:
+                    log.warning(f"Slow request: {method} {request.url.path} {sample['durationMs']}ms, "
+                                f"{stats['queries']} SQL statements", extra={"fields": sample})
+                    # The access log middleware skips its own line for this request
+                    request.state.slow_logged = True
+
+
+def metrics_response():
+    from fastapi import Response
+    if MULTIPROC:
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        for collector in _scrape_collectors:
+            registry.register(collector)
+        payload = generate_latest(registry)
+    else:
+        payload = generate_latest(REGISTRY)
+    return Response(payload, media_type=CONTENT_TYPE_LATEST)
+
+
+# --- Celery ---
+
+def instrument_celery():
+    """Task duration histogram, recorded by the worker (connect once, from worker.py)."""
+    from celery import signals
+    started: Dict[str, float] = {}
+
+    @signals.task_prerun.connect(weak=False)
+    def _prerun(task_id=None, **kwargs):
+        started[task_id] = time.perf_counter()
+
+    @signals.task_postrun.connect(weak=False)
+    def _postrun(task_id=None, task=None, state=None, **kwargs):
+        start = started.pop(task_id, None)
+        if start is not None:
+            CELERY_TASK_LATENCY.labels(getattr(task, "name", "unknown"), state or "UNKNOWN").observe(time.perf_counter() - start)
+
+    if MULTIPROC:
+        @signals.worker_process_shutdown.connect(weak=False)
+        def _mark_dead(pid=None, **kwargs):
+            from prometheus_client import multiprocess
+            multiprocess.mark_process_dead(pid or os.getpid())
@@ -0,0 +1,273 @@
+"""
+Versioned schema migrations.
+
+Run as a separate deploy step, before the API/worker processes start:
+
+    python -m backend.migrations            # apply pending migrations
+    python -m backend.migrations --status   # list applied / pending versions
+
+Each migration runs in its own transaction and is recorded in `schema_migrations`,
+so re-running the command is a no-op once the database is up to date.
+"""
+import sys
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import inspect, text, update, func, select, bindparam, Table, Column, String, DateTime, MetaData
+
+from .database import sync_engine, Base
+from .models import AdModel, AdHistoryModel, MediaAssetModel, MediaUrlModel, AdMediaModel, UserModel, SubscriptionModel, AnalyticsSnapshotModel, AdHistoryRollupModel, AdFingerprintModel, AdFingerprintBandModel, MediaPosterModel, MediaQueueModel
+from .principals import access_until_from_subscriptions
+from .ad_history import rollup_rows, upsert_rollups
+from .velocity import replay_history
+from .ad_search import create_search_index
+from .ad_fingerprints import backfill_fingerprints, rebuild_clusters, forget_media
+from .media_refresh import sync_queue
+
+MIGRATIONS = []
+
+
+def migration(version: str, name: str):
+    def register(fn):
+        MIGRATIONS.append((version, name, fn))
+        return fn
+    return register
+
+
+_meta = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _meta,
+    Column("version", String, primary_key=True),
+    Column("name", String),
+    Column("applied_at", DateTime(timezone=True)),
+)
+
+
+def _add_column_if_missing(conn, table: str, column: str, ddl: str):
+    existing = {c["name"] for c in inspect(conn).get_columns(table)}
+    if column not in existing:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {ddl}"))
+
+
+def _create_indexes(conn, model, names: List[str]):
+    """Creates indexes declared on the model (single source of truth) if missing."""
+    for index in model.__table__.indexes:
+        if index.name in names:
+            index.create(conn, checkfirst=True)
+
+
+# --- MIGRATIONS ---
+
+@migration("0001", "baseline_ads_pixels_tld")
+def _baseline(conn):
+    # Former startup hook: create missing tables and the late-added ads columns
+    Base.metadata.create_all(conn)
+    _add_column_if_missing(conn, "ads", "pixels", "pixels JSON DEFAULT '[]'")
+    _add_column_if_missing(conn, "ads", "tld", "tld VARCHAR")
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_ads_tld ON ads (tld)"))
+
+
+@migration("0002", "ads_hot_path_indexes")
+def _hot_path_indexes(conn):
+    # Keyset pagination assumes addedAt is never NULL
+    conn.execute(
+        update(AdModel.__table__)
+        .where(AdModel.__table__.c.addedAt.is_(None))
+        .values(addedAt=func.now())
+    )
+    _create_indexes(conn, AdModel, [
+        "ix_ads_added_at_id",
+        "ix_ads_niche_added_at",
+        "ix_ads_platform_added_at",
+        "ix_ads_status_added_at",
+        "ix_ads_ad_count",
+        "ix_ads_scaling_added_at",
+    ])
+    _create_indexes(conn, AdHistoryModel, ["ix_ad_history_ad_id_timestamp"])
+
+
+@migration("0003", "media_vault")
+def _media_vault(conn):
+    for model in (MediaAssetModel, MediaUrlModel, AdMediaModel):
+        model.__table__.create(conn, checkfirst=True)
+
+
+@migration("0004", "user_entitlement_snapshot")
+def _entitlement_snapshot(conn):
+    # Same type as the model (DateTime(timezone=True)), so upgraded and fresh databases match
+    ddl = "TIMESTAMP WITH TIME ZONE" if conn.dialect.name == "postgresql" else "TIMESTAMP"
+    _add_column_if_missing(conn, "users", "access_until", f"access_until {ddl}")
+    _create_indexes(conn, UserModel, ["ix_users_access_until"])
+    # Backfill from existing subscriptions (same rules the webhook handlers apply)
+    subs = SubscriptionModel.__table__.c
+    by_user = {}
+    for row in conn.execute(select(subs.user_id, subs.status, subs.current_period_end)):
+        by_user.setdefault(row.user_id, []).append(row)
+    users = UserModel.__table__
+    rows = [{"_id": user_id, "_until": access_until_from_subscriptions(rows)} for user_id, rows in by_user.items()]
+    if rows:
+        conn.execute(users.update().where(users.c.id == bindparam("_id")).values(access_until=bindparam("_until")), rows)
+
+
+@migration("0005", "analytics_snapshots")
+def _analytics_snapshots(conn):
+    # Filled lazily: the first /analytics/library read does a full rebuild
+    AnalyticsSnapshotModel.__table__.create(conn, checkfirst=True)
+
+
+@migration("0006", "ad_history_rle_rollups")
+def _ad_history_rle_rollups(conn):
+    AdHistoryRollupModel.__table__.create(conn, checkfirst=True)
+    # Run-length encode the existing history: drop points equal to the ad's previous one
+    h = AdHistoryModel.__table__
+    ordered = select(h.c.id, h.c.adCount, func.lag(h.c.adCount).over(
+        partition_by=h.c.ad_id, order_by=(h.c.timestamp, h.c.id)).label("prev")).subquery()
+    repeats = select(ordered.c.id).where(ordered.c.prev == ordered.c.adCount)
+    removed = conn.execute(h.delete().where(h.c.id.in_(repeats))).rowcount
+    print(f"[Migrations] Compacted {removed} unchanged history points")
+    # Backfill day/week rollups from the remaining points, in time order
+    points = conn.execute(select(h.c.ad_id, h.c.adCount, h.c.timestamp)
+                          .where(h.c.timestamp.isnot(None))
+                          .order_by(h.c.ad_id, h.c.timestamp)).mappings().fetchall()
+    for start in range(0, len(points), 5000):
+        upsert_rollups(conn, rollup_rows(points[start:start + 5000]))
+
+
+@migration("0007", "ads_scaling_velocity")
+def _ads_scaling_velocity(conn):
+    _add_column_if_missing(conn, "ads", "velocity", "velocity FLOAT NOT NULL DEFAULT 0")
+    _add_column_if_missing(conn, "ads", "acceleration", "acceleration FLOAT NOT NULL DEFAULT 0")
+    _add_column_if_missing(conn, "ads", "velocityAt", '"velocityAt" TIMESTAMP')
+    _create_indexes(conn, AdModel, ["ix_ads_velocity_id"])
+    # Seed the scores by replaying the (run-length encoded) history once; ingest takes over from here
+    h = AdHistoryModel.__table__.c
+    points = conn.execute(select(h.ad_id, h.adCount, h.timestamp).where(h.timestamp.isnot(None))
+                          .order_by(h.ad_id, h.timestamp)).fetchall()
+    rows = [{"_id": ad_id, "_v": s["velocity"], "_a": s["acceleration"], "_at": s["velocityAt"]}
+            for ad_id, s in replay_history(points).items()]
+    ads = AdModel.__table__
+    stmt = ads.update().where(ads.c.id == bindparam("_id")).values(
+        velocity=bindparam("_v"), acceleration=bindparam("_a"), velocityAt=bindparam("_at"))
+    for start in range(0, len(rows), 5000):
+        conn.execute(stmt, rows[start:start + 5000])
+
+
+@migration("0008", "ads_full_text_search")
+def _ads_full_text_search(conn):
+    # Postgres: generated tsvector + GIN; SQLite: FTS5 table + triggers, filled from the existing ads
+    create_search_index(conn)
+
+
+@migration("0009", "ad_fingerprints")
+def _ad_fingerprints(conn):
+    for model in (AdFingerprintModel, AdFingerprintBandModel):
+        model.__table__.create(conn, checkfirst=True)
+    # mediaHash used to be a placeholder ("AS-" + the id's last 4 chars): it is now the creative's SHA-256
+    ads, links = AdModel.__table__, AdMediaModel.__table__
+    conn.execute(ads.update().where(ads.c.mediaHash.like("AS-%")).values(mediaHash=None))
+    conn.execute(ads.update().values(mediaHash=select(links.c.sha256).where(links.c.ad_id == ads.c.id)
+                                     .scalar_subquery()).where(ads.c.id.in_(select(links.c.ad_id))))
+    # Copy and media fingerprints now; image hashes are filled by the daily fingerprint job
+    count = backfill_fingerprints(conn)
+    summary = rebuild_clusters(conn)
+    print(f"[Migrations] Fingerprinted {count} ads, {summary['clusters']} duplicate clusters")
+
+
+@migration("0010", "media_posters")
+def _media_posters(conn):
+    # Filled by the poster job (media_posters.py), which also repoints thumbnails that were the full creative
+    MediaPosterModel.__table__.create(conn, checkfirst=True)
+
+
+@migration("0011", "media_queue")
+def _media_queue(conn):
+    # Ads still on external URLs are queued (with their signature expiry) instead of being dropped by clean_ads
+    MediaQueueModel.__table__.create(conn, checkfirst=True)
+    report = sync_queue(conn)
+    print(f"[Migrations] Queued {report['queued']} ads with external media ({report['expired']} already expired)")
+
+
+@migration("0012", "users_access_until_timestamptz")
+def _access_until_timestamptz(conn):
+    # Databases upgraded through 0004 before it matched the model got a naive TIMESTAMP;
+    # the stored values are naive UTC (principals._naive_utc)
+    if conn.dialect.name != "postgresql":
+        return
+    column = next(c for c in inspect(conn).get_columns("users") if c["name"] == "access_until")
+    if not getattr(column["type"], "timezone", False):
+        conn.execute(text("ALTER TABLE users ALTER COLUMN access_until TYPE TIMESTAMP WITH TIME ZONE "
+                          "USING access_until AT TIME ZONE 'UTC'"))
+
+
+@migration("0013", "ads_added_at_not_null")
+def _ads_added_at_not_null(conn):
+    # A null addedAt broke keyset pagination (ads_query.py). Those rows sorted last, so they
+    # get the oldest date in the library and keep sorting last (ties broken by id)
+    ads = AdModel.__table__
+    oldest = conn.execute(select(func.min(ads.c.addedAt))).scalar() or datetime.utcnow()
+    filled = conn.execute(update(ads).where(ads.c.addedAt.is_(None)).values(addedAt=oldest)).rowcount
+    if conn.dialect.name == "postgresql":
+        conn.execute(text('ALTER TABLE ads ALTER COLUMN "addedAt" SET NOT NULL'))
+    # SQLite cannot alter the constraint in place: ingest no longer writes nulls
+    print(f"[Migrations] Backfilled addedAt on {filled} ads")
+
+
+@migration("0014", "ads_media_evicted")
+def _ads_media_evicted(conn):
+    _add_column_if_missing(conn, "ads", "mediaEvictedAt", '"mediaEvictedAt" TIMESTAMP')
+    # Ads on the poster of a creative the quota GC already evicted still carry its hash:
+    # the evicted creative kept its media_posters row, its media_assets row is gone
+    ads, posters, assets = AdModel.__table__, MediaPosterModel.__table__, MediaAssetModel.__table__
+    gone = select(posters.c.sha256).where(~select(assets.c.sha256).where(assets.c.sha256 == posters.c.sha256).exists())
+    evicted = conn.execute(select(ads.c.id).where(ads.c.mediaHash.in_(gone))).scalars().all()
+    for start in range(0, len(evicted), 5000):
+        conn.execute(update(ads).where(ads.c.id.in_(evicted[start:start + 5000]))
+                     .values(mediaHash=None, mediaEvictedAt=datetime.utcnow()))
+    forget_media(conn, evicted)
+    print(f"[Migrations] Marked {len(evicted)} ads whose creative was evicted")
+
+
+# --- RUNNER ---
+
+def applied_versions(engine=sync_engine) -> List[str]:
+    with engine.begin() as conn:
+        _meta.create_all(conn)
+        rows = conn.execute(schema_migrations.select()).fetchall()
+    return sorted(r.version for r in rows)
+
+
+def pending_migrations(engine=sync_engine):
+    done = set(applied_versions(engine))
+    return [m for m in sorted(MIGRATIONS) if m[0] not in done]
+
+
+def run_migrations(engine=sync_engine, target: str = None) -> List[str]:
+    applied = []
+    for version, name, fn in pending_migrations(engine):
+        if target and version > target:
+            break
+        with engine.begin() as conn:
+            fn(conn)
+            conn.execute(schema_migrations.insert().values(
+                version=version, name=name, applied_at=datetime.utcnow()
+            ))
+        print(f"[Migrations] Applied {version}_{name}")
+        applied.append(version)
+    if not applied:
+        print("[Migrations] Database is up to date.")
+    return applied
+
+
+def main(argv=None):
+    argv = argv if argv is not None else sys.argv[1:]
+    if "--status" in argv:
+        done = set(applied_versions())
+        for version, name, _ in sorted(MIGRATIONS):
+            print(f"{'applied' if version in done else 'pending'}  {version}_{name}")
+        return
+    target = argv[argv.index("--to") + 1] if "--to" in argv else None
+    run_migrations(target=target)
+
+
+if __name__ == "__main__":
+    main()
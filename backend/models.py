@@ -1,7 +1,7 @@
 
-from sqlalchemy import Column, String, Integer, Float, Boolean, JSON, DateTime, Text, ForeignKey
+from sqlalchemy import Column, String, Integer, BigInteger, Float, Boolean, JSON, DateTime, Text, LargeBinary, ForeignKey, Index
 from sqlalchemy.dialects.postgresql import UUID, JSONB
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from .database import Base
 from datetime import datetime
 import uuid
@@ -43,7 +43,7 @@ class AdModel(Base):
     rating = Column(Float)
     
     # Timezone aware timestamp
-    addedAt = Column(DateTime(timezone=True), default=func.now())
+    addedAt = Column(DateTime(timezone=True), default=func.now(), nullable=False)
     updatedAt = Column(DateTime(timezone=True), onupdate=func.now())
 
     adCount = Column(Integer)
@@ -63,6 +63,29 @@ class AdModel(Base):
     pixels = Column(JSON, default=[]) # List of detected pixel IDs
     tld = Column(String, index=True) # Domain TLD (e.g., .com.br, .shop)
 
+    # Scaling velocity, advanced at ingest (see velocity.py)
+    velocity = Column(Float, nullable=False, default=0.0, server_default="0") # adCount growth, ads/day
+    acceleration = Column(Float, nullable=False, default=0.0, server_default="0")
+    velocityAt = Column(DateTime) # observation the score reflects (naive UTC)
+    # Set when the quota GC evicted the creative and mediaUrl fell back to its poster (see media_gc.py)
+    mediaEvictedAt = Column(DateTime)
+
+    # Hot-path indexes for the library listing (see migrations 0002)
+    __table_args__ = (
+        Index("ix_ads_added_at_id", "addedAt", "id"),
+        Index("ix_ads_niche_added_at", "niche", "addedAt", "id"),
+        Index("ix_ads_platform_added_at", "platform", "addedAt", "id"),
+        Index("ix_ads_status_added_at", "status", "addedAt", "id"),
+        Index("ix_ads_ad_count", "adCount"),
+        Index("ix_ads_velocity_id", "velocity", "id"),
+        # Partial index: "Escala" is the default tab of the ScalingLive page
+        Index(
+            "ix_ads_scaling_added_at", "addedAt", "id",
+            postgresql_where=text("status = 'Escala'"),
+            sqlite_where=text("status = 'Escala'"),
+        ),
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -94,7 +117,10 @@ class AdModel(Base):
             "targeting": self.targeting,
             "forensicData": self.forensicData,
             "pixels": self.pixels,
-            "tld": self.tld
+            "tld": self.tld,
+            "velocity": self.velocity,
+            "acceleration": self.acceleration,
+            "mediaEvictedAt": self.mediaEvictedAt.isoformat() if self.mediaEvictedAt else None
         }
 
 class AdHistoryModel(Base):
@@ -106,12 +132,115 @@ class AdHistoryModel(Base):
     adCount = Column(Integer, nullable=False)
     timestamp = Column(DateTime(timezone=True), default=func.now())
 
+    __table_args__ = (
+        Index("ix_ad_history_ad_id_timestamp", "ad_id", "timestamp"),
+    )
+
     def to_dict(self):
         return {
             "adCount": self.adCount,
             "timestamp": self.timestamp.isoformat() if self.timestamp else None
         }
 
+class AdHistoryRollupModel(Base):
+    """Daily / weekly adCount rollups per ad (see ad_history.py); outlive the raw points."""
+    __tablename__ = "ad_history_rollups"
+
+    # No FK: rollups are kept for deleted ads until retention removes them
+    ad_id = Column(String, primary_key=True)
+    period = Column(String, primary_key=True) # day | week
+    bucket_start = Column(DateTime, primary_key=True)
+    min_count = Column(Integer, nullable=False)
+    max_count = Column(Integer, nullable=False)
+    last_count = Column(Integer, nullable=False)
+    changes = Column(Integer, nullable=False, default=1)
+
+# --- ANALYTICS ---
+
+class AnalyticsSnapshotModel(Base):
+    """Precomputed aggregates served by /analytics/library (see library_analytics.py)."""
+    __tablename__ = "analytics_snapshots"
+
+    key = Column(String, primary_key=True)
+    state = Column(JSON, nullable=False)
+    updated_at = Column(DateTime(timezone=True), default=func.now())
+
+# --- MEDIA VAULT (content-addressed storage) ---
+
+class MediaAssetModel(Base):
+    __tablename__ = "media_assets"
+
+    sha256 = Column(String(64), primary_key=True)
+    path = Column(String, unique=True, nullable=False) # /media/ab/<sha256>.mp4
+    size = Column(Integer)
+    content_type = Column(String, nullable=True)
+    ref_count = Column(Integer, default=0, nullable=False) # Ads currently pointing at this file
+    created_at = Column(DateTime(timezone=True), default=func.now())
+
+class MediaUrlModel(Base):
+    __tablename__ = "media_urls"
+
+    # Source URL with presigned/signature query params stripped
+    canonical_url = Column(String, primary_key=True)
+    sha256 = Column(String(64), ForeignKey("media_assets.sha256"), nullable=False, index=True)
+    last_seen_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
+
+class AdMediaModel(Base):
+    __tablename__ = "ad_media"
+
+    # No FK to ads: rows are released by the vault when ads are deleted or repointed
+    ad_id = Column(String, primary_key=True)
+    sha256 = Column(String(64), nullable=False, index=True)
+
+class MediaPosterModel(Base):
+    __tablename__ = "media_posters"
+
+    # Card-sized still of a stored creative (see media_posters.py); the poster is itself a vault asset
+    sha256 = Column(String(64), primary_key=True) # source asset
+    poster_sha256 = Column(String(64), nullable=True, index=True) # NULL until rendered
+    attempts = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime(timezone=True), default=func.now())
+
+class MediaQueueModel(Base):
+    """Ads whose creative is still external: the refresh scheduler's work list (see media_refresh.py)."""
+    __tablename__ = "media_queue"
+
+    # No FK to ads: rows are dropped once the ad's mediaUrl is local, changed or gone
+    ad_id = Column(String, primary_key=True)
+    url = Column(String, nullable=False)
+    expires_at = Column(DateTime, nullable=True, index=True) # naive UTC, from the URL signature
+    status = Column(String, nullable=False, default="pending") # pending | expired | failed
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, nullable=False)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), default=func.now())
+
+    __table_args__ = (
+        Index("ix_media_queue_due", "status", "next_attempt_at"),
+    )
+
+# --- NEAR-DUPLICATE DETECTION (see ad_fingerprints.py) ---
+
+class AdFingerprintModel(Base):
+    __tablename__ = "ad_fingerprints"
+
+    # No FK to ads: rows are dropped with deleted ads, or by the daily cluster rebuild
+    ad_id = Column(String, primary_key=True)
+    media_sha256 = Column(String(64), nullable=True, index=True) # creative in the media vault
+    image_hash = Column(String(16), nullable=True) # 64-bit dHash (hex) of image creatives
+    copy_minhash = Column(LargeBinary, nullable=True) # MinHash of the copy shingles, 64 x uint32
+    cluster_id = Column(String, nullable=False, index=True)
+    duplicate_of = Column(String, nullable=True) # canonical ad of the cluster; NULL for the canonical ad
+    updated_at = Column(DateTime(timezone=True), default=func.now())
+
+class AdFingerprintBandModel(Base):
+    """LSH index of the fingerprints: similar-ad lookups are exact matches on band_key."""
+    __tablename__ = "ad_fingerprint_bands"
+
+    # 64-bit hash of (kind, band, band bits): one column so `band_key IN (...)` seeks the primary key
+    band_key = Column(BigInteger, primary_key=True)
+    ad_id = Column(String, primary_key=True, index=True)
+
 class UserModel(Base):
     __tablename__ = "users"
 
@@ -129,6 +258,9 @@ class UserModel(Base):
     subscriptionActive = Column(Boolean, default=False)
     subscriptionPlan = Column(String, nullable=True)
     nextBillingDate = Column(DateTime(timezone=True), nullable=True)
+
+    # Entitlement snapshot ("access valid until"), maintained by the billing webhook handlers
+    access_until = Column(DateTime(timezone=True), nullable=True, index=True)
     
     favorites = Column(JSON, default=[])
     createdAt = Column(DateTime(timezone=True), default=func.now())
@@ -0,0 +1,201 @@
+"""
+Authenticated principal cache for `get_current_user`.
+
+A principal is the small, read-only view of a user that auth and permission
+checks need: id, email, role and the effective entitlement (the
+users.access_until snapshot kept by BillingService). It is cached per token
+subject (email) in two tiers:
+
+- in-process, for PRINCIPAL_LOCAL_TTL seconds (default 5), so hot users cost
+  no I/O at all;
+- Redis, for PRINCIPAL_CACHE_TTL seconds (default 60), shared by API workers.
+
+Billing webhooks and role changes call `invalidate_principal`, which drops the
+Redis entry and the local one of the calling process; other processes pick the
+change up once their local entry expires. If Redis is down the cache runs on
+the local tier alone. PRINCIPAL_CACHE_ENABLED=0 turns caching off.
+"""
+import json
+import os
+import time
+import datetime
+from typing import Any, Dict, Iterable, Optional
+
+from sqlalchemy.future import select
+
+from .models import UserModel
+
+PRINCIPAL_CACHE_ENABLED = os.getenv("PRINCIPAL_CACHE_ENABLED", "1") not in ("0", "false", "False")
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+PRINCIPAL_LOCAL_TTL = int(os.getenv("PRINCIPAL_LOCAL_TTL", "5"))
+KEY_PREFIX = "principal:"
+# After a Redis error, stay on the local tier for this long before trying again
+REDIS_RETRY_AFTER = 30
+
+# Entitlement of active/trialing subscriptions: valid regardless of the period end
+ACCESS_UNBOUNDED = datetime.datetime(9999, 12, 31)
+
+
+def _naive_utc(value: Optional[datetime.datetime]) -> Optional[datetime.datetime]:
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def access_until_from_subscriptions(subscriptions: Iterable) -> Optional[datetime.datetime]:
+    """
+    Effective "access valid until" for a user: unbounded for active/trialing
+    subscriptions, the period end for past_due/canceled ones (grace period or
+    paid until the end of the cycle), None when nothing grants access.
+    """
+    until = None
+    for sub in subscriptions:
+        if sub.status in ['active', 'trialing']:
+            return ACCESS_UNBOUNDED
+        if sub.status in ['past_due', 'canceled'] and sub.current_period_end:
+            end = _naive_utc(sub.current_period_end)
+            until = end if until is None or end > until else until
+    return until
+
+
+class Principal:
+    __slots__ = ("id", "email", "name", "role", "access_until")
+
+    def __init__(self, id: str, email: str, role: str, name: Optional[str] = None,
+                 access_until: Optional[datetime.datetime] = None):
+        self.id = id
+        self.email = email
+        self.name = name
+        self.role = role
+        self.access_until = access_until
+
+    def has_access(self, now: Optional[datetime.datetime] = None) -> bool:
+        if self.role == 'admin':
+            return True
+        return self.access_until is not None and self.access_until > (now or datetime.datetime.utcnow())
+
+    def to_cache(self) -> Dict[str, Any]:
+        return {"id": self.id, "email": self.email, "name": self.name, "role": self.role,
+                "access_until": self.access_until.isoformat() if self.access_until else None}
+
+    @classmethod
+    def from_cache(cls, data: Dict[str, Any]) -> "Principal":
+        until = data.get("access_until")
+        return cls(data["id"], data["email"], data["role"], data.get("name"),
+                   datetime.datetime.fromisoformat(until) if until else None)
+
+
+async def load_principal(db, email: str) -> Optional[Principal]:
+    """Builds the principal from one indexed users lookup (entitlement is the access_until snapshot)."""
+    result = await db.execute(
+        select(UserModel.id, UserModel.email, UserModel.role, UserModel.name, UserModel.access_until)
+        .where(UserModel.email == email)
+    )
+    row = result.first()
+    if row is None:
+        return None
+    return Principal(row.id, row.email, row.role, row.name, _naive_utc(row.access_until))
+
+
+class PrincipalCache:
+    def __init__(self, redis_url: Optional[str] = None, ttl: int = PRINCIPAL_CACHE_TTL,
+                 local_ttl: int = PRINCIPAL_LOCAL_TTL):
+        self.redis_url = redis_url or os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        self.ttl = ttl
+        self.local_ttl = min(local_ttl, ttl)
+        self.enabled = PRINCIPAL_CACHE_ENABLED
+        self.counters = {"localHits": 0, "redisHits": 0, "misses": 0, "invalidations": 0}
+        self._local: Dict[str, tuple] = {}
+        self._redis = None
+        self._redis_down_until = 0.0
+
+    def _client(self):
+        if self._redis_down_until > time.monotonic():
+            return None
+        if self._redis is None:
+            try:
+                import redis.asyncio as aioredis
+                self._redis = aioredis.Redis.from_url(self.redis_url, socket_timeout=0.2, socket_connect_timeout=0.2)
+            except Exception:
+                self._redis_down_until = time.monotonic() + REDIS_RETRY_AFTER
+                return None
+        return self._redis
+
+    async def get(self, email: str) -> Optional[Principal]:
+        entry = self._local.get(email)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self.counters["localHits"] += 1
+                return entry[1]
+            self._local.pop(email, None)
+        client = self._client()
+        if client is not None:
+            try:
+                raw = await client.get(KEY_PREFIX + email)
+            except Exception:
+                self._redis_down_until = time.monotonic() + REDIS_RETRY_AFTER
+                raw = None
+            if raw:
+                principal = Principal.from_cache(json.loads(raw))
+                self._local[email] = (time.monotonic() + self.local_ttl, principal)
+                self.counters["redisHits"] += 1
+                return principal
+        self.counters["misses"] += 1
+        return None
+
+    async def set(self, principal: Principal):
+        self._local[principal.email] = (time.monotonic() + self.local_ttl, principal)
+        client = self._client()
+        if client is not None:
+            try:
+                await client.set(KEY_PREFIX + principal.email, json.dumps(principal.to_cache()), ex=self.ttl)
+            except Exception:
+                self._redis_down_until = time.monotonic() + REDIS_RETRY_AFTER
+
+    async def invalidate(self, *emails: str):
+        emails = [e for e in emails if e]
+        for email in emails:
+            self._local.pop(email, None)
+        self.counters["invalidations"] += len(emails)
+        client = self._client()
+        if client is not None and emails:
+            try:
+                await client.delete(*(KEY_PREFIX + e for e in emails))
+            except Exception:
+                self._redis_down_until = time.monotonic() + REDIS_RETRY_AFTER
+
+    def clear_local(self):
+        self._local.clear()
+
+
+principal_cache = PrincipalCache()
+
+
+async def resolve_principal(db, email: str) -> Optional[Principal]:
+    """Cache-first principal lookup; falls through to the database on a miss."""
+    if principal_cache.enabled:
+        principal = await principal_cache.get(email)
+        if principal is not None:
+            return principal
+    principal = await load_principal(db, email)
+    if principal is not None and principal_cache.enabled:
+        await principal_cache.set(principal)
+    return principal
+
+
+async def invalidate_principal(*emails: str):
+    await principal_cache.invalidate(*emails)
+
+
+def invalidate_principal_sync(*emails: str, redis_url: Optional[str] = None):
+    """For scripts and Celery workers (no event loop): drops the shared Redis entries."""
+    emails = [e for e in emails if e]
+    if not emails:
+        return
+    try:
+        import redis
+        client = redis.Redis.from_url(redis_url or os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+                                      socket_timeout=0.5, socket_connect_timeout=0.5)
+        client.delete(*(KEY_PREFIX + e for e in emails))
+    except Exception as e:
+        print(f"[Auth] Could not invalidate cached principals ({e}); they expire within {PRINCIPAL_CACHE_TTL}s")
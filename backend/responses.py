@@ -0,0 +1,156 @@
+"""
+Fast path for large JSON responses (ad listings).
+
+- FastJSONResponse encodes with orjson. Rows are built straight from SQL
+  (see ads_query), so there is no ORM hydration and no pydantic revalidation
+  before encoding.
+- CompressionMiddleware compresses JSON and text bodies of at least
+  COMPRESS_MIN_BYTES: brotli when the client accepts it and the `brotli`
+  package is installed, gzip otherwise. Media and responses that already carry
+  a Content-Encoding pass through untouched. Chunks above COMPRESS_THREAD_BYTES
+  are compressed off the event loop.
+"""
+import gzip
+import os
+import zlib
+from typing import Any
+
+import orjson
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError: # optional: gzip only
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_THREAD_BYTES = int(os.getenv("COMPRESS_THREAD_BYTES", str(256 * 1024)))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(Response):
+    """orjson-encoded JSON (FastAPI's ORJSONResponse is deprecated upstream)."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def choose_encoding(accept_encoding: str) -> str:
+    accepted = {part.split(";")[0].strip().lower() for part in accept_encoding.split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return ""
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class _StreamCompressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._c = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS) # gzip container
+
+    async def __call__(self, data: bytes, last: bool) -> bytes:
+        if len(data) >= COMPRESS_THREAD_BYTES:
+            return await run_in_threadpool(self.compress, data, last)
+        return self.compress(data, last)
+
+    def compress(self, data: bytes, last: bool) -> bytes:
+        if self.encoding == "br":
+            out = self._c.process(data)
+            return out + self._c.finish() if last else out
+        out = self._c.compress(data)
+        return out + self._c.flush() if last else out
+
+
+class CompressionMiddleware:
+    """
+    Pure ASGI. The body is buffered until it reaches `minimum_size`, then
+    compressed; responses that arrive in chunks (every response passes through
+    the @app.middleware layers as a stream) are compressed incrementally.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+
+        state = {"start": None, "passthrough": False, "compressor": None, "buffer": []}
+
+        async def send_compressed(message):
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                state["passthrough"] = ("content-encoding" in headers
+                                        or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES))
+                if state["passthrough"]:
+                    await send(message)
+                else:
+                    state["start"] = message
+                return
+            if state["passthrough"] or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            more = message.get("more_body", False)
+            compressor = state["compressor"]
+            if compressor is not None:
+                await send({"type": "http.response.body", "body": await compressor(message.get("body", b""), not more),
+                            "more_body": more})
+                return
+
+            state["buffer"].append(message.get("body", b""))
+            size = sum(len(chunk) for chunk in state["buffer"])
+            if more and size < self.minimum_size:
+                return
+            body = b"".join(state["buffer"])
+            state["buffer"] = []
+            start = state["start"]
+            headers = MutableHeaders(raw=start["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            if size < self.minimum_size:
+                await send(start)
+                await send({"type": "http.response.body", "body": body})
+                return
+            headers["Content-Encoding"] = encoding
+            if not more:
+                body = await run_in_threadpool(compress, body, encoding) if size >= COMPRESS_THREAD_BYTES \
+                    else compress(body, encoding)
+                headers["Content-Length"] = str(len(body))
+                await send(start)
+                await send({"type": "http.response.body", "body": body})
+                return
+            # Still streaming: length unknown from here on
+            if "content-length" in headers:
+                del headers["Content-Length"]
+            state["compressor"] = compressor = _StreamCompressor(encoding)
+            await send(start)
+            await send({"type": "http.response.body", "body": await compressor(body, False), "more_body": True})
+
+        await self.app(scope, receive, send_compressed)
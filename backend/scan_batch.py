@@ -0,0 +1,145 @@
+"""
+Bulk landing-page analysis for imported ads.
+
+Sales-page URLs are grouped by domain/path so each landing page is fetched once,
+scanned concurrently by AdScanner over one pooled client, and the results are
+merged into every ad pointing at that page (`techStack`, `siteTraffic`)
+in batched UPDATEs while the scan is still running. Pages found in the scan
+cache are applied without a fetch, and fresh results are added to it.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import select, bindparam
+
+from .database import sync_engine
+from .models import AdModel
+from .scanner import AdScanner, scan_key
+from .scan_cache import ScanCache, default_scan_cache
+
+WRITE_BATCH_SIZE = 200
+
+
+def load_targets(ad_ids: Optional[Iterable[str]] = None, engine=None) -> List[Dict[str, Any]]:
+    """Ads with a sales page (all of them when ad_ids is None)."""
+    engine = engine or sync_engine
+    stmt = select(AdModel.id, AdModel.salesPageUrl, AdModel.siteTraffic, AdModel.techStack).where(
+        AdModel.salesPageUrl.isnot(None), AdModel.salesPageUrl.notin_(["", "#"]))
+    targets = []
+    with engine.connect() as conn:
+        if ad_ids is None:
+            targets = [dict(r._mapping) for r in conn.execute(stmt)]
+        else:
+            ids = list(dict.fromkeys(str(i) for i in ad_ids))
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                targets += [dict(r._mapping) for r in conn.execute(stmt.where(AdModel.id.in_(chunk)))]
+    return targets
+
+
+def group_by_page(urls: Iterable[str] = (), targets: Iterable[Dict[str, Any]] = ()) -> Dict[str, Dict[str, Any]]:
+    """{scan key: {"url": first URL seen, "ads": [target rows]}}; each key is fetched once."""
+    pages: Dict[str, Dict[str, Any]] = {}
+    for url in urls:
+        if url:
+            pages.setdefault(scan_key(url), {"url": url, "ads": []})
+    for target in targets:
+        page = pages.setdefault(scan_key(target["salesPageUrl"]), {"url": target["salesPageUrl"], "ads": []})
+        page["ads"].append(target)
+    return pages
+
+
+def _merged_traffic(current, scanned):
+    # Keep fields filled by other sources (e.g. visitors) when the scan has no value for them
+    merged = dict(current or {})
+    merged.update({k: v for k, v in (scanned or {}).items() if v is not None or k not in merged})
+    return merged
+
+
+def _merged_tech_stack(current, scanned):
+    # The scanner only detects the platform: it fills ecommercePlatform and keeps
+    # trackingPixels / serverCountry. "Custom" (nothing detected) never overwrites a known platform.
+    merged = dict(current or {})
+    scanned = dict(scanned or {})
+    platform = scanned.pop("platform", None)
+    merged.update({k: v for k, v in scanned.items() if v is not None or k not in merged})
+    if platform and (platform != "Custom" or not merged.get("ecommercePlatform")):
+        merged["ecommercePlatform"] = platform
+    return merged
+
+
+def write_scan_results(updates: List[Dict[str, Any]], engine=None):
+    if not updates:
+        return
+    engine = engine or sync_engine
+    stmt = (AdModel.__table__.update()
+            .where(AdModel.__table__.c.id == bindparam("_id"))
+            .values(techStack=bindparam("_techStack"), siteTraffic=bindparam("_siteTraffic")))
+    with engine.begin() as conn:
+        conn.execute(stmt, updates)
+
+
+def run_scan_batch(urls: Iterable[str] = (), ad_ids: Optional[Iterable[str]] = None,
+                   all_ads: bool = False, scanner: Optional[AdScanner] = None,
+                   on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+                   engine=None, cache: Optional[ScanCache] = None, use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Scans the given URLs and/or the sales pages of the given ads (every ad with
+    one when all_ads is set) and persists each page's result onto its ads.
+    Pages with a cached result are not fetched again.
+    Returns a summary; per-URL results are included for explicitly passed URLs.
+    """
+    urls = [u for u in urls if u]
+    targets = load_targets(None if all_ads else (ad_ids or []), engine) if (all_ads or ad_ids) else []
+    pages = group_by_page(urls, targets)
+    scanner = scanner or AdScanner()
+
+    cache = (cache or default_scan_cache()) if use_cache else None
+
+    progress = {"total": len(pages), "done": 0, "failed": 0, "cached": 0, "adsUpdated": 0}
+    pending: List[Dict[str, Any]] = []
+    fresh: Dict[str, Dict[str, Any]] = {}
+    by_url = {page["url"]: page for page in pages.values()}
+    explicit = {scan_key(u) for u in urls}
+    results: Dict[str, Any] = {}
+
+    def flush():
+        if cache is not None:
+            cache.set_many(fresh)
+        fresh.clear()
+        write_scan_results(pending, engine)
+        progress["adsUpdated"] += len(pending)
+        pending.clear()
+
+    def on_result(url, result):
+        page = by_url[url]
+        progress["done"] += 1
+        if result["success"]:
+            data = result["data"]
+            for ad in page["ads"]:
+                pending.append({"_id": ad["id"], "_techStack": _merged_tech_stack(ad["techStack"], data["techStack"]),
+                                "_siteTraffic": _merged_traffic(ad["siteTraffic"], data["siteTraffic"])})
+        else:
+            progress["failed"] += 1
+        if scan_key(url) in explicit:
+            results[url] = result
+        if len(pending) >= WRITE_BATCH_SIZE or len(fresh) >= WRITE_BATCH_SIZE:
+            flush()
+        if on_progress:
+            on_progress(dict(progress))
+
+    cached = cache.get_many(by_url) if cache is not None else {}
+    for url, result in cached.items():
+        progress["cached"] += 1
+        on_result(url, result)
+
+    def on_scanned(url, result):
+        fresh[url] = result
+        on_result(url, result)
+
+    scanner.scan_batch([url for url in by_url if url not in cached], on_scanned)
+    flush()
+
+    summary = dict(progress, pages=len(pages), ads=len(targets))
+    if results:
+        summary["results"] = results
+    return summary
@@ -0,0 +1,216 @@
+"""
+Landing-page scan result cache.
+
+Results are keyed by the normalized URL (lowercase scheme/host, no default port,
+no fragment, tracking parameters such as utm_* / fbclid removed, remaining query
+sorted) and stored in Redis with a TTL (SCAN_CACHE_TTL seconds, default 6h).
+When Redis is unreachable the cache degrades to an in-process LRU with the same
+TTL and retries Redis after a short cool-down. Only successful scans are cached.
+
+Hit/miss counters are kept per process and, when Redis is up, aggregated across
+API and worker processes under `scan_cache:stats`.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+SCAN_CACHE_TTL = int(os.getenv("SCAN_CACHE_TTL", str(6 * 3600)))
+SCAN_CACHE_LOCAL_SIZE = int(os.getenv("SCAN_CACHE_LOCAL_SIZE", "2048"))
+KEY_PREFIX = "scan_cache:"
+STATS_KEY = "scan_cache:stats"
+# After a Redis error, stay on the local LRU for this long before trying again
+REDIS_RETRY_AFTER = 30
+
+TRACKING_PARAMS = {"fbclid", "gclid", "gbraid", "wbraid", "dclid", "msclkid", "ttclid", "twclid",
+                   "igshid", "mc_cid", "mc_eid", "_ga", "_gl", "ref", "src", "xcod", "sck"}
+TRACKING_PREFIXES = ("utm_", "hsa_", "pk_", "fb_")
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_scan_url(url: str) -> str:
+    url = url.strip()
+    if not url.lower().startswith('http'):
+        url = 'https://' + url
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)
+    )
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
+
+
+class _LocalLRU:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl: int):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class ScanCache:
+    def __init__(self, redis_url: Optional[str] = None, ttl: int = SCAN_CACHE_TTL,
+                 max_entries: int = SCAN_CACHE_LOCAL_SIZE):
+        self.redis_url = redis_url or os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        self.ttl = ttl
+        self.local = _LocalLRU(max_entries)
+        self.counters = {"hits": 0, "misses": 0, "stores": 0, "redisErrors": 0}
+        self._redis = None
+        self._redis_down_until = 0.0
+        self._lock = threading.Lock()
+
+    # --- Redis plumbing ---
+    def _client(self):
+        if self._redis_down_until > time.monotonic():
+            return None
+        if self._redis is None:
+            try:
+                import redis
+                self._redis = redis.Redis.from_url(self.redis_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+            except Exception:
+                self._redis_failed()
+                return None
+        return self._redis
+
+    def _redis_failed(self):
+        self._redis_down_until = time.monotonic() + REDIS_RETRY_AFTER
+        with self._lock:
+            self.counters["redisErrors"] += 1
+
+    def _count(self, **counts: int):
+        counts = {name: n for name, n in counts.items() if n}
+        if not counts:
+            return
+        with self._lock:
+            for name, n in counts.items():
+                self.counters[name] += n
+        client = self._client()
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                for name, n in counts.items():
+                    pipe.hincrby(STATS_KEY, name, n)
+                pipe.execute()
+            except Exception:
+                self._redis_failed()
+
+    # --- Public API ---
+    def get_many(self, urls: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """{url: cached result} for the URLs that are cached (one Redis round trip)."""
+        urls = list(urls)
+        keys = [normalize_scan_url(u) for u in urls]
+        found: Dict[str, Dict[str, Any]] = {}
+        remote: List[Optional[bytes]] = [None] * len(keys)
+        client = self._client()
+        if client is not None and keys:
+            try:
+                remote = client.mget([KEY_PREFIX + k for k in keys])
+            except Exception:
+                self._redis_failed()
+        for url, key, raw in zip(urls, keys, remote):
+            value = json.loads(raw) if raw else self.local.get(key)
+            if value is not None:
+                found[url] = value
+        self._count(hits=len(found), misses=len(urls) - len(found))
+        return found
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        return self.get_many([url]).get(url)
+
+    def set_many(self, results: Dict[str, Dict[str, Any]]):
+        entries = {normalize_scan_url(u): r for u, r in results.items() if r and r.get("success")}
+        if not entries:
+            return
+        for key, value in entries.items():
+            self.local.set(key, value, self.ttl)
+        client = self._client()
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                for key, value in entries.items():
+                    pipe.set(KEY_PREFIX + key, json.dumps(value), ex=self.ttl)
+                pipe.execute()
+            except Exception:
+                self._redis_failed()
+        self._count(stores=len(entries))
+
+    def set(self, url: str, result: Dict[str, Any]):
+        self.set_many({url: result})
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            local = dict(self.counters)
+        lookups = local["hits"] + local["misses"]
+        report = {
+            "ttlSeconds": self.ttl,
+            "process": dict(local, hitRate=round(local["hits"] / lookups, 4) if lookups else None),
+            "localEntries": len(self.local),
+            "backend": "redis" if self._client() is not None else "local",
+        }
+        client = self._client()
+        if client is not None:
+            try:
+                shared = {k.decode(): int(v) for k, v in client.hgetall(STATS_KEY).items()}
+                shared_lookups = shared.get("hits", 0) + shared.get("misses", 0)
+                shared["hitRate"] = round(shared.get("hits", 0) / shared_lookups, 4) if shared_lookups else None
+                report["shared"] = shared
+            except Exception:
+                self._redis_failed()
+                report["backend"] = "local"
+        return report
+
+
+_default_cache: Optional[ScanCache] = None
+
+
+def default_scan_cache() -> ScanCache:
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ScanCache()
+    return _default_cache
+
+
+def cached_scan(url: str, scanner=None, cache: Optional[ScanCache] = None) -> Dict[str, Any]:
+    """Single-page scan through the cache (Celery task and the /scan-ad sync fallback)."""
+    cache = cache or default_scan_cache()
+    cached = cache.get(url)
+    if cached is not None:
+        return cached
+    if scanner is None:
+        from .scanner import AdScanner
+        scanner = AdScanner()
+    result = scanner.scan_page(url)
+    cache.set(url, result)
+    return result
@@ -1,78 +1,173 @@
-
-import requests
-from bs4 import BeautifulSoup
+import asyncio
 import re
-from typing import Dict, Any
+import time
+from html.parser import HTMLParser
+from typing import Dict, Any, Callable, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from .classifier import PAGE_NICHE, TECH_STACK
+
+# Landing pages past this size are truncated; everything we detect lives well before it
+MAX_PAGE_BYTES = 2 * 1024 * 1024
+# Without a </head>, only this much of the document is searched for title/meta
+HEAD_SCAN_LIMIT = 64 * 1024
+DEFAULT_CONCURRENCY = 32
+
+_TAG_RE = re.compile(r"<[^>]*>")
+# Script/style bodies are not visible text (an unclosed one runs to the end of the page)
+_INVISIBLE_RE = re.compile(r"<(script|style)\b[^>]*>.*?(?:</\1\s*>|$)", re.S)
+
+
+def visible_text(lowered: str) -> str:
+    """Page text without markup, scripts or styles (what bs4's get_text() fed the classifier)."""
+    return _TAG_RE.sub(" ", _INVISIBLE_RE.sub(" ", lowered))
+
+
+def scan_key(url: str) -> str:
+    """Domain/path identity of a landing page; query strings and fragments are ignored."""
+    url = url.strip()
+    if not url.lower().startswith('http'):
+        url = 'https://' + url
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    return f"{host}{parts.path.rstrip('/') or '/'}"
+
+
+class _HeadParser(HTMLParser):
+    """Collects <title> and <meta name="description"> from the document head only."""
 
-class AdScanner:
     def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = None
+        self.description = None
+        self._title_parts = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "title" and self.title is None:
+            self._title_parts = []
+        elif tag == "meta" and self.description is None:
+            attrs = dict(attrs)
+            if (attrs.get("name") or "").lower() == "description":
+                self.description = attrs.get("content") or ""
+
+    def handle_data(self, data):
+        if self._title_parts is not None:
+            self._title_parts.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == "title" and self._title_parts is not None:
+            self.title = "".join(self._title_parts)
+            self._title_parts = None
+
+
+def parse_head(html: str, lowered: Optional[str] = None):
+    """Returns (title, description) parsed from the <head> section alone."""
+    lowered = lowered if lowered is not None else html.lower()
+    head_end = lowered.find("</head>")
+    parser = _HeadParser()
+    parser.feed(html[:head_end] if head_end != -1 else html[:HEAD_SCAN_LIMIT])
+    if parser._title_parts is not None:
+        parser.title = "".join(parser._title_parts)
+    return parser.title or "", parser.description or ""
+
+
+def analyze_html(html: str, load_time: float) -> Dict[str, Any]:
+    """Builds the scan payload from a fetched page (one lowercase pass feeds every detector)."""
+    lowered = html.lower()
+    title, description = parse_head(html, lowered)
+
+    # Analyze page performance (simulated based on response time)
+    performance_score = max(0, min(100, int((1 - load_time/3) * 100)))
+
+    # Detect Niche on visible text, Tech Stack on the raw markup
+    detected_niche = PAGE_NICHE.classify(visible_text(lowered), lowered=True)
+    detected_tech = TECH_STACK.matches(lowered, lowered=True)
+
+    return {
+        "title": title[:50] + "..." if len(title) > 50 else title,
+        "copy": description[:100] + "..." if len(description) > 100 else description,
+        "niche": detected_niche,
+        "rating": performance_score / 10.0,
+
+        "techStack": {"platform": detected_tech[0] if detected_tech else "Custom"},
+        "siteTraffic": {
+            "visitors": None, # Requires External API (e.g. SimilarWeb)
+            "bounceRate": None,
+            "loadTimeSec": round(load_time, 2) # REAL DATA
+        }
+    }
+
+
+class AdScanner:
+    def __init__(self, timeout: float = 10, max_bytes: int = MAX_PAGE_BYTES,
+                 concurrency: int = DEFAULT_CONCURRENCY):
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         }
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.concurrency = concurrency
 
-    def scan_page(self, url: str) -> Dict[str, Any]:
+    def client(self) -> httpx.AsyncClient:
+        """Pooled client shared by every scan of a batch (keep-alive, one TLS handshake per host)."""
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        return httpx.AsyncClient(headers=self.headers, timeout=self.timeout, limits=limits, follow_redirects=True)
+
+    async def fetch(self, client: httpx.AsyncClient, url: str):
+        """Streams the page up to max_bytes; returns (html, seconds until headers arrived)."""
+        start = time.perf_counter()
+        async with client.stream("GET", url) as response:
+            load_time = time.perf_counter() - start
+            chunks, size = [], 0
+            async for chunk in response.aiter_bytes():
+                chunks.append(chunk)
+                size += len(chunk)
+                if size >= self.max_bytes:
+                    break
+            body = b"".join(chunks)[:self.max_bytes]
+            return body.decode(response.charset_encoding or "utf-8", errors="replace"), load_time
+
+    async def scan(self, url: str, client: Optional[httpx.AsyncClient] = None) -> Dict[str, Any]:
         try:
             # Add scheme if missing
             if not url.startswith('http'):
                 url = 'https://' + url
-                
-            response = requests.get(url, headers=self.headers, timeout=10)
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Analyze page performance (simulated based on response time)
-            load_time = response.elapsed.total_seconds()
-            performance_score = max(0, min(100, int((1 - load_time/3) * 100)))
-
-            # Extract Metadata
-            title = soup.title.string if soup.title else ""
-            desc = soup.find('meta', attrs={'name': 'description'})
-            description = desc['content'] if desc else ""
-            
-            # Analyze Content
-            text_content = soup.get_text().lower()
-            
-            # Detect Niche
-            niche_keywords = {
-                'black': ['suplemento', 'libido', 'renda extra', 'investimento', 'apostas', 'cassino'],
-                'saúde': ['emagrecer', 'dieta', 'pele', 'cabelo', 'dor', 'natural'],
-                'tech': ['software', 'app', 'ai', 'curso', 'digital', 'ebook'],
-                'e-com': ['frete grátis', 'oferta', 'desconto', 'loja', 'comprar']
-            }
-            
-            detected_niche = 'Outros'
-            for niche, keywords in niche_keywords.items():
-                if any(k in text_content for k in keywords):
-                    detected_niche = niche.upper()
-                    break
-            
-            # Detect Tech Stack
-            tech_stack = {
-                'shopify': 'shopify' in response.text.lower(),
-                'wordpress': 'wp-content' in response.text.lower(),
-                'vtex': 'vtex' in response.text.lower(),
-                'ticto': 'ticto' in response.text.lower(),
-                'kiwify': 'kiwify' in response.text.lower()
-            }
-            detected_tech = [k for k, v in tech_stack.items() if v]
 
-            return {
-                "success": True,
-                "data": {
-                    "title": title[:50] + "..." if len(title) > 50 else title,
-                    "copy": description[:100] + "..." if len(description) > 100 else description,
-                    "niche": detected_niche,
-                    "rating": performance_score / 10.0,
-
-                    "techStack": {"platform": detected_tech[0] if detected_tech else "Custom"},
-                    "siteTraffic": {
-                        "visitors": None, # Requires External API (e.g. SimilarWeb)
-                        "bounceRate": None,
-                        "loadTimeSec": round(load_time, 2) # REAL DATA
-                    }
-                }
-            }
+            if client is None:
+                async with self.client() as own_client:
+                    html, load_time = await self.fetch(own_client, url)
+            else:
+                html, load_time = await self.fetch(client, url)
+
+            return {"success": True, "data": analyze_html(html, load_time)}
         except Exception as e:
             return {
                 "success": False,
                 "error": str(e)
             }
+
+    async def scan_many(self, urls: Iterable[str],
+                        on_result: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> List[Dict[str, Any]]:
+        """Scans every URL over one pooled client, at most `concurrency` at a time; results keep input order."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async with self.client() as client:
+            async def one(url):
+                async with semaphore:
+                    result = await self.scan(url, client)
+                if on_result:
+                    on_result(url, result)
+                return result
+            return await asyncio.gather(*(one(url) for url in urls))
+
+    def scan_page(self, url: str) -> Dict[str, Any]:
+        """Synchronous single-page scan (Celery tasks, scripts)."""
+        return asyncio.run(self.scan(url))
+
+    def scan_batch(self, urls: Iterable[str], on_result=None) -> List[Dict[str, Any]]:
+        """Synchronous batch entry point for Celery workers."""
+        return asyncio.run(self.scan_many(list(urls), on_result))
@@ -37,6 +37,11 @@ class AdCreate(AdBase):
 
 class Ad(AdBase):
     addedAt: str
+    # Computed at ingest, read-only
+    velocity: Optional[float] = 0.0
+    acceleration: Optional[float] = 0.0
+    # Creative evicted by the media quota, mediaUrl is its poster
+    mediaEvictedAt: Optional[str] = None
 
     class Config:
         from_attributes = True
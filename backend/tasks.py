@@ -1,58 +1,41 @@
 from .worker import celery_app
-from .scanner import AdScanner
 from .database import SyncSessionLocal
 from .models import AdModel
 from sqlalchemy import select
 import os
-import requests
-import hashlib
 from typing import Optional
 
-MEDIA_DIR = "backend/media"
+from .media_pipeline import MEDIA_DIR, MediaPipeline, MediaDownloadError, fetch_media, media_jobs, local_pipeline, resolve_known_media
+from .media_vault import default_vault
+from .scan_cache import cached_scan
+from .app_logging import get_logger
+
+log = get_logger("tasks")
+
 if not os.path.exists(MEDIA_DIR):
     os.makedirs(MEDIA_DIR, exist_ok=True)
 
-# Reuse session for connection pooling
-_session = requests.Session()
-_session.headers.update({
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
-    'Accept-Language': 'en-US,en;q=0.9',
-    'Referer': 'https://www.facebook.com/',
-    'Connection': 'keep-alive'
-})
-
 def download_file(url: str, ad_id: str) -> Optional[str]:
     """Downloads a file and returns the local path relative to backend root."""
     try:
-        if not url or not url.startswith("http"):
+        if not url or not (url.startswith("http") or url.startswith("/media/")):
             return None
-            
-        if url.startswith("/media/"):
-            return url
-
-        # Generate a stable filename
-        clean_url = url.split("?")[0].split("#")[0]
-        ext = clean_url.split(".")[-1].lower() if "." in clean_url else "mp4"
-        if len(ext) > 4 or not ext.isalnum():
-            ext = "mp4" 
-            
-        filename = f"{ad_id}_{hashlib.md5(url.encode()).hexdigest()[:8]}.{ext}"
-        filepath = os.path.join(MEDIA_DIR, filename)
-        
-        if os.path.exists(filepath):
-            return f"/media/{filename}"
-            
-        response = _session.get(url, stream=True, timeout=30)
-        if response.status_code == 200:
-            with open(filepath, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=16384):
-                    f.write(chunk)
-            return f"/media/{filename}"
+        return fetch_media(url, ad_id)
+    except MediaDownloadError as e:
+        log.error(f"[Worker] Error downloading {url}: {e}")
         return None
+
+def enqueue_media_downloads(jobs: list) -> str:
+    """Hands media fetches to the worker queue, or to the in-process pipeline if Celery is down."""
+    if not jobs:
+        return "none"
+    try:
+        download_media_task.delay(jobs)
+        return "celery"
     except Exception as e:
-        print(f"[Worker] Error downloading {url}: {e}")
-        return None
+        log.warning(f"[Media] Celery unavailable ({e}), downloading in-process")
+        local_pipeline().submit_many(jobs)
+        return "local"
 
 # Celery Tasks
 
@@ -60,80 +43,119 @@ def download_file(url: str, ad_id: str) -> Optional[str]:
 def scan_ad_task(url: str):
     """
     Background task to scan a URL using the AdScanner synchronous logic.
+    Pages scanned recently (same normalized URL) are served from the scan cache.
     """
-    print(f"[Worker] Starting scan for {url}")
-    scanner = AdScanner()
-    result = scanner.scan_page(url)
-    print(f"[Worker] Scan finished: {result['success']}")
+    log.info(f"[Worker] Starting scan for {url}")
+    result = cached_scan(url)
+    log.info(f"[Worker] Scan finished: {result['success']}")
     return result
 
+@celery_app.task(name="scan_ads_batch_task", bind=True)
+def scan_ads_batch_task(self, urls: list = None, ad_ids: list = None, all_ads: bool = False):
+    """
+    Scans many landing pages inside one worker (bounded concurrency, one fetch per
+    domain/path) and writes techStack/siteTraffic back onto the ads.
+    Progress is published as PROGRESS state meta for /tasks/{task_id}.
+    """
+    import time
+    from .scan_batch import run_scan_batch
+
+    last = [0.0]
+    def publish(progress):
+        # Throttled: one result-backend write per second at most
+        now = time.monotonic()
+        if now - last[0] >= 1.0 or progress["done"] == progress["total"]:
+            last[0] = now
+            self.update_state(state="PROGRESS", meta=progress)
+
+    log.info(f"[Worker] Starting batch scan: {len(urls or [])} urls, {len(ad_ids or [])} ads, all_ads={all_ads}")
+    summary = run_scan_batch(urls or [], ad_ids, all_ads, on_progress=publish)
+    log.info(f"[Worker] Batch scan finished: {summary['done']}/{summary['total']} pages, {summary['failed']} failed, {summary['adsUpdated']} ads updated")
+    return summary
+
+@celery_app.task(name="download_media_task")
+def download_media_task(jobs: list):
+    """
+    Fetches media for already-ingested ads and repoints mediaUrl/thumbnail when done.
+    """
+    pipeline = MediaPipeline()
+    try:
+        pipeline.submit_many(jobs)
+        stats = pipeline.wait()
+    finally:
+        pipeline.shutdown()
+    log.info(f"[Worker] Media batch finished: {stats}")
+    if stats.get("downloaded"):
+        poster_task.delay()
+    return stats
+
 @celery_app.task(name="import_ads_task")
 def import_ads_task(ads_data: list):
     """
     Background task to import ads in bulk.
     """
-    import time
-    def log_task(msg):
-        with open("backend_debug.log", "a") as f:
-            f.write(f"{time.ctime()} [Task]: {msg}\n")
-
-    log_task(f"Starting bulk import of {len(ads_data)} ads")
-    from concurrent.futures import ThreadPoolExecutor
-
-    def process_ad(ad_dict):
-        # Persistence Logic: Download media if it's an external URL
-        try:
-            original_media = ad_dict.get('mediaUrl')
-            if original_media and original_media.startswith("http"):
-                local_path = download_file(original_media, ad_dict['id'])
-                if local_path:
-                    ad_dict['mediaUrl'] = local_path
-                    if ad_dict.get('thumbnail') == original_media:
-                        ad_dict['thumbnail'] = local_path
-
-            thread_db = SyncSessionLocal()
-            from .models import AdHistoryModel
-            try:
-                # Check exist
-                existing = thread_db.query(AdModel).filter(AdModel.id == ad_dict['id']).first()
-                if existing:
-                    for k, v in ad_dict.items():
-                        if hasattr(existing, k):
-                            setattr(existing, k, v)
-                    res = "updated"
-                else:
-                    new_ad = AdModel(**ad_dict)
-                    thread_db.add(new_ad)
-                    res = "created"
-                
-                # History
-                history = AdHistoryModel(ad_id=ad_dict['id'], adCount=ad_dict.get('adCount', 1))
-                thread_db.add(history)
-                thread_db.commit()
-                return res
-            except Exception as e:
-                log_task(f"Row DB Error for {ad_dict.get('id')}: {e}")
-                thread_db.rollback()
-                return "error"
-            finally:
-                thread_db.close()
-        except Exception as e:
-            log_task(f"Row Fatal Error for {ad_dict.get('id')}: {e}")
-            return "error"
+    log.info(f"Starting bulk import of {len(ads_data)} ads")
+    from .ingest import upsert_ads
 
     try:
-        # Reduced to 1 worker to prevent SQLite 'Database Locked' errors
-        # SQLite cannot handle concurrent writes well. 
-        # For Postgres, this could be higher (e.g., 5-10), but 1 is safe for all.
-        with ThreadPoolExecutor(max_workers=1) as executor:
-            results = list(executor.map(process_ad, ads_data))
-        
-        created = results.count("created")
-        updated = results.count("updated")
-        errors = results.count("error")
-        
-        log_task(f"Import finished. Created: {created}, Updated: {updated}, Errors: {errors}")
-        return {"created": created, "updated": updated, "errors": errors}
+        # Ads are written straight away with their external URLs; media is
+        # fetched afterwards by the download pipeline, which repoints them.
+        # Creatives already in the vault (same canonical URL) are reused without a download
+        reused = resolve_known_media(ads_data)
+        report = upsert_ads(ads_data, log=log.info)
+        created, updated, errors = report["created"], report["updated"], report["errors"]
+
+        failed_ids = {f["id"] for f in report["failed"]}
+        default_vault().attach_ads(ad for ad in ads_data if str(ad.get("id")) not in failed_ids)
+        jobs = [j for j in media_jobs(ads_data) if j["ad_id"] not in failed_ids]
+        media_mode = enqueue_media_downloads(jobs)
+
+        log.info(f"Import finished. Created: {created}, Updated: {updated}, Errors: {errors}, Media reused: {reused}, queued: {len(jobs)} ({media_mode})")
+        return {"created": created, "updated": updated, "errors": errors, "failed": report["failed"], "mediaReused": reused, "mediaQueued": len(jobs)}
     except Exception as e:
-        log_task(f"Task Failed: {e}")
+        log.error(f"Task Failed: {e}")
         return {"error": str(e)}
+
+@celery_app.task(name="history_retention_task")
+def history_retention_task():
+    """Applies the ad_history retention policy (scheduled daily, see worker.py)."""
+    from .ad_history import apply_history_retention
+    return apply_history_retention()
+
+@celery_app.task(name="fingerprint_rebuild_task")
+def fingerprint_rebuild_task():
+    """Pending image hashes plus a full near-duplicate cluster rebuild (scheduled daily, see worker.py)."""
+    from .ad_fingerprints import rebuild_fingerprints
+    summary = rebuild_fingerprints()
+    log.info(f"[Worker] Fingerprint clusters rebuilt: {summary}")
+    return summary
+
+@celery_app.task(name="poster_task")
+def poster_task():
+    """Card posters for newly stored creatives (after each media batch, and every 10 minutes, see worker.py)."""
+    from .admin import posters
+    return posters()
+
+@celery_app.task(name="media_gc_task")
+def media_gc_task(grace: int = None):
+    """Deletes unreferenced vault files and enforces MEDIA_QUOTA_BYTES (every 6 hours, see worker.py)."""
+    from .admin import media_gc
+    return media_gc(grace=grace)
+
+@celery_app.task(name="media_refresh_task")
+def media_refresh_task():
+    """Downloads queued external media, soonest-expiring first (every 2 minutes, see worker.py)."""
+    from .admin import media_refresh
+    return media_refresh()
+
+@celery_app.task(name="migrate_task")
+def migrate_task():
+    from .admin import migrate
+    return migrate()
+
+
+@celery_app.task(name="bootstrap_import_task")
+def bootstrap_import_task(csv_path: str = None):
+    """Bootstrap CSV import (wipe + import), guarded by the admin leader lock."""
+    from .admin import bootstrap, BOOTSTRAP_CSV
+    return bootstrap(csv_path or BOOTSTRAP_CSV)
@@ -0,0 +1,105 @@
+"""
+Scaling velocity: how fast an ad's adCount grows, kept on the ad itself.
+
+Each ad carries an exponentially weighted growth rate (`velocity`, ads/day),
+its rate of change (`acceleration`, ads/day²) and the time of the observation
+they reflect (`velocityAt`). Ingestion advances them from the ad's previous
+values in O(1) per ad (no history scan): the smoothing weight depends on the
+time since the previous observation, so frequent and sparse imports converge
+to the same rate, and unchanged re-imports decay the velocity towards zero.
+
+`ix_ads_velocity_id` makes `/ads?sort=velocity` an index-ordered top-K read.
+
+The score only ranks ads. Rows that come in without a status / rating (the
+CSV importer) are still labelled from their adCount ("Escala" above
+SCALING_AD_COUNT), so an unchanged re-import, which decays the velocity,
+never demotes an ad.
+"""
+import datetime
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .models import AdModel
+
+VELOCITY_HALF_LIFE_DAYS = float(os.getenv("VELOCITY_HALF_LIFE_DAYS", "3"))
+SCALING_AD_COUNT = int(os.getenv("SCALING_AD_COUNT", "30"))
+
+# Previous state read by the ingest stage, alongside adCount
+VELOCITY_COLUMNS = (AdModel.velocity, AdModel.acceleration, AdModel.velocityAt)
+
+_DAY = 86400.0
+
+
+def _naive_utc(value: datetime.datetime) -> datetime.datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def advance(prev_count: int, velocity: float, acceleration: float, prev_at: datetime.datetime,
+            count: int, now: datetime.datetime) -> Tuple[float, float]:
+    """New (velocity, acceleration) after observing `count` at `now`."""
+    dt = (now - prev_at).total_seconds() / _DAY
+    if dt <= 0:
+        return velocity, acceleration
+    alpha = 1 - 2 ** (-dt / VELOCITY_HALF_LIFE_DAYS)
+    rate = (count - prev_count) / dt
+    new_velocity = velocity + alpha * (rate - velocity)
+    new_acceleration = acceleration + alpha * ((new_velocity - velocity) / dt - acceleration)
+    return new_velocity, new_acceleration
+
+
+def status_for(count: int) -> str:
+    return "Escala" if count > SCALING_AD_COUNT else "Validado"
+
+
+def rating_for(count: int) -> float:
+    return min(5.0, 3.0 + count / 50.0)
+
+
+def score_rows(rows: Iterable[Dict[str, Any]], previous: Dict[str, Any],
+               now: Optional[datetime.datetime] = None) -> List[Dict[str, Any]]:
+    """
+    Copies of ingest rows with velocity, acceleration and velocityAt set.
+    `previous` maps ad id -> row with adCount and VELOCITY_COLUMNS before the write.
+    """
+    now = now or datetime.datetime.utcnow()
+    scored = []
+    for row in rows:
+        row = dict(row)
+        prev = previous.get(row["id"])
+        count = row.get("adCount") if "adCount" in row else (prev.adCount if prev else None)
+        count = count or 1
+        observed = prev is not None and prev.velocityAt is not None
+        if observed:
+            velocity, acceleration = advance(prev.adCount or 0, prev.velocity or 0.0, prev.acceleration or 0.0,
+                                             prev.velocityAt, count, now)
+        elif prev is not None:
+            velocity, acceleration = prev.velocity or 0.0, prev.acceleration or 0.0
+        else:
+            velocity, acceleration = 0.0, 0.0
+        row.update(velocity=velocity, acceleration=acceleration, velocityAt=now)
+        if "status" not in row:
+            row["status"] = status_for(count)
+        if "rating" not in row:
+            row["rating"] = rating_for(count)
+        scored.append(row)
+    return scored
+
+
+def replay_history(points: Iterable[Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Folds ad_history points (ad_id, adCount, timestamp; ordered by ad and time)
+    into {ad_id: {velocity, acceleration, velocityAt}}, for the backfill migration.
+    """
+    state: Dict[str, Dict[str, Any]] = {}
+    for p in points:
+        ts = _naive_utc(p.timestamp)
+        s = state.get(p.ad_id)
+        if s is None:
+            state[p.ad_id] = {"count": p.adCount, "velocity": 0.0, "acceleration": 0.0, "velocityAt": ts}
+            continue
+        s["velocity"], s["acceleration"] = advance(s["count"], s["velocity"], s["acceleration"],
+                                                   s["velocityAt"], p.adCount, ts)
+        s["count"], s["velocityAt"] = p.adCount, ts
+    return state
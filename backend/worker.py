@@ -1,13 +1,17 @@
 import os
 from celery import Celery
 
+from .metrics import instrument_celery
+
 # Get Redis URL from env or default to localhost
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
 
 celery_app = Celery(
     "adscale_worker",
     broker=REDIS_URL,
-    backend=REDIS_URL
+    backend=REDIS_URL,
+    # tasks.py imports celery_app from here, so the worker has to load it explicitly
+    include=["backend.tasks"],
 )
 
 celery_app.conf.update(
@@ -19,4 +23,14 @@ celery_app.conf.update(
     # Resilience settings
     task_acks_late=True,
     worker_prefetch_multiplier=1, # Fair dispatch for long tasks
+    # Run by the `beat` service in docker-compose.yaml (`celery -A backend.worker beat`)
+    beat_schedule={
+        "history-retention": {"task": "history_retention_task", "schedule": 24 * 3600},
+        "fingerprint-clusters": {"task": "fingerprint_rebuild_task", "schedule": 24 * 3600},
+        "media-posters": {"task": "poster_task", "schedule": 600},
+        "media-gc": {"task": "media_gc_task", "schedule": 6 * 3600},
+        "media-refresh": {"task": "media_refresh_task", "schedule": 120},
+    },
 )
+
+instrument_celery()
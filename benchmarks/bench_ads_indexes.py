@@ -0,0 +1,132 @@
+"""
+Query plans and latencies for the ads hot paths, before and after migration 0002.
+
+Seeds a throwaway database with 100k ads (plus history) and runs the library,
+filter, scaling and history queries against it with and without the indexes.
+
+    python benchmarks/bench_ads_indexes.py                      # temp SQLite file
+    python benchmarks/bench_ads_indexes.py postgresql://...     # scratch Postgres DB
+    python benchmarks/bench_ads_indexes.py --rows 20000
+"""
+import os
+import sys
+import random
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.getcwd())
+
+from sqlalchemy import create_engine, select, insert, text
+
+from backend.models import AdModel, AdHistoryModel
+from backend.migrations import run_migrations, MIGRATIONS
+from backend.ads_query import build_page_query, encode_cursor
+
+NICHES = ["Saúde & Bem-estar", "Finanças & Investimentos", "iGaming & Apostas",
+          "E-commerce & Dropshipping", "Infoprodutos & Educação", "Negócios"]
+PLATFORMS = ["Facebook", "Instagram", "TikTok", "YouTube"]
+HOT_INDEXES = [
+    "ix_ads_added_at_id", "ix_ads_niche_added_at", "ix_ads_platform_added_at",
+    "ix_ads_status_added_at", "ix_ads_ad_count", "ix_ads_scaling_added_at",
+    "ix_ad_history_ad_id_timestamp",
+]
+
+
+def seed(engine, rows: int):
+    rnd = random.Random(42)
+    base = datetime(2025, 1, 1)
+    batch, history = [], []
+    with engine.begin() as conn:
+        for i in range(rows):
+            ad_count = rnd.randint(1, 200)
+            ad_id = f"{10**15 + i}"
+            added_at = base + timedelta(seconds=i * 30)
+            batch.append({
+                "id": ad_id, "title": f"Page {i % 5000}", "platform": rnd.choice(PLATFORMS),
+                "niche": rnd.choice(NICHES), "status": "Escala" if ad_count > 30 else "Validado",
+                "adCount": ad_count, "addedAt": added_at, "copy": "lorem ipsum " * 20,
+                "insights": "Sinal detectado.", "tags": [], "tld": rnd.choice([".com", ".com.br", ".shop"]),
+            })
+            history.append({"id": f"h{i}a", "ad_id": ad_id, "adCount": ad_count // 2, "timestamp": added_at})
+            history.append({"id": f"h{i}b", "ad_id": ad_id, "adCount": ad_count, "timestamp": added_at + timedelta(days=1)})
+            if len(batch) >= 5000:
+                conn.execute(insert(AdModel.__table__), batch)
+                conn.execute(insert(AdHistoryModel.__table__), history)
+                batch, history = [], []
+        if batch:
+            conn.execute(insert(AdModel.__table__), batch)
+            conn.execute(insert(AdHistoryModel.__table__), history)
+
+
+def queries(rows: int):
+    cursor = encode_cursor(datetime(2025, 1, 1) + timedelta(seconds=(rows // 2) * 30), f"{10**15 + rows // 2}")
+    target_ad = f"{10**15 + rows // 3}"
+    return {
+        "library first page": build_page_query()[0],
+        "library deep page (cursor)": build_page_query(cursor=cursor)[0],
+        "niche filter": build_page_query(niche=NICHES[2])[0],
+        "status=Escala": build_page_query(status="Escala")[0],
+        "adCount range": build_page_query(min_ad_count=150, max_ad_count=160)[0],
+        "ad history": select(AdHistoryModel).where(AdHistoryModel.ad_id == target_ad)
+                      .order_by(AdHistoryModel.timestamp.asc()),
+    }
+
+
+def explain(conn, stmt):
+    compiled = stmt.compile(dialect=conn.dialect)
+    prefix = "EXPLAIN QUERY PLAN " if conn.dialect.name == "sqlite" else "EXPLAIN ANALYZE "
+    params = compiled.construct_params()
+    if compiled.positional:
+        params = tuple(params[k] for k in compiled.positiontup)
+    rows = conn.exec_driver_sql(prefix + compiled.string, params).fetchall()
+    return [str(r[-1]) for r in rows]
+
+
+def measure(engine, rows: int, label: str, repeat: int = 15):
+    print(f"\n=== {label} ===")
+    with engine.connect() as conn:
+        for name, stmt in queries(rows).items():
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                conn.execute(stmt).fetchall()
+                timings.append((time.perf_counter() - start) * 1000)
+            print(f"{name:<28} p50={statistics.median(timings):8.2f} ms  max={max(timings):8.2f} ms")
+            for line in explain(conn, stmt):
+                print(f"    {line}")
+
+
+def main(argv):
+    rows = int(argv[argv.index("--rows") + 1]) if "--rows" in argv else 100_000
+    urls = [a for a in argv if "://" in a]
+    if urls:
+        url = urls[0]
+    else:
+        url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_indexes.db')}"
+    engine = create_engine(url)
+
+    # "Before": baseline schema without the hot-path indexes
+    run_migrations(engine, target="0001")
+    with engine.begin() as conn:
+        for name in HOT_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
+    print(f"Seeding {rows} ads into {engine.url.render_as_string(hide_password=True)} ...")
+    start = time.perf_counter()
+    seed(engine, rows)
+    print(f"Seeded in {time.perf_counter() - start:.1f}s")
+    if engine.dialect.name == "postgresql":
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text("ANALYZE"))
+
+    measure(engine, rows, "BEFORE (migration 0001)")
+    run_migrations(engine, target=max(v for v, _, _ in MIGRATIONS))
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    measure(engine, rows, "AFTER (all migrations)")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
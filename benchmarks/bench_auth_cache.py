@@ -0,0 +1,114 @@
+"""
+Load test for the authenticated request path with the principal cache on and off.
+
+Seeds users with subscriptions in a temp SQLite database, then fires concurrent
+requests at a subscription-gated route (get_current_user + verify_subscription_access)
+through the ASGI app in-process, and reports p50/p99 latency and SQL statements
+per request for both modes.
+
+    python benchmarks/bench_auth_cache.py --requests 4000 --concurrency 50 --users 200
+"""
+import asyncio
+import datetime
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.getcwd())
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{os.path.join(_tmp, 'auth.db')}")
+# Every benchmark request logs a line: keep them out of the working tree
+os.environ.setdefault("LOG_FILE", os.path.join(_tmp, "app.log"))
+
+import httpx
+from fastapi import Depends
+from sqlalchemy import event
+
+from backend.main import app
+from backend.database import Base, engine, SessionLocal
+from backend.models import UserModel, PlanModel, SubscriptionModel
+from backend.auth import create_access_token
+from backend.permissions import verify_subscription_access
+from backend.principals import principal_cache, ACCESS_UNBOUNDED
+
+
+@app.get("/_bench/gated")
+async def gated(_ = Depends(verify_subscription_access)):
+    return {"ok": True}
+
+
+QUERIES = {"n": 0}
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def count_query(*args):
+    QUERIES["n"] += 1
+
+
+async def seed(users: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    now = datetime.datetime.utcnow()
+    async with SessionLocal() as db:
+        plan = PlanModel(name="Pro", key="pro", stripe_product_id="prod", stripe_price_id="price", features={})
+        db.add(plan)
+        await db.flush()
+        for i in range(users):
+            user = UserModel(email=f"user{i}@bench.local", name=f"User {i}", hashed_password="x", role="user",
+                             access_until=ACCESS_UNBOUNDED)
+            db.add(user)
+            await db.flush()
+            for j, status in enumerate(("canceled", "past_due", "active")):
+                db.add(SubscriptionModel(user_id=user.id, plan_id=plan.id, stripe_subscription_id=f"sub_{i}_{j}",
+                                         stripe_customer_id=f"cus_{i}", status=status,
+                                         current_period_start=now, current_period_end=now + datetime.timedelta(days=30)))
+        await db.commit()
+    return [create_access_token({"sub": f"user{i}@bench.local"}) for i in range(users)]
+
+
+async def load(tokens, requests: int, concurrency: int):
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(i):
+            headers = {"Authorization": f"Bearer {tokens[i % len(tokens)]}"}
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get("/_bench/gated", headers=headers)
+                latencies.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.text
+        await asyncio.gather(*(one(i) for i in range(requests)))
+    return latencies
+
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+async def main(argv):
+    requests = int(argv[argv.index("--requests") + 1]) if "--requests" in argv else 4000
+    concurrency = int(argv[argv.index("--concurrency") + 1]) if "--concurrency" in argv else 50
+    users = int(argv[argv.index("--users") + 1]) if "--users" in argv else 200
+    tokens = await seed(users)
+    print(f"{requests} requests, concurrency {concurrency}, {users} users (3 subscriptions each)")
+
+    for label, enabled in (("cache off", False), ("cache on", True)):
+        principal_cache.enabled = enabled
+        principal_cache.clear_local()
+        await load(tokens, min(requests, 500), concurrency) # warm-up (connections, caches)
+        QUERIES["n"] = 0
+        start = time.perf_counter()
+        latencies = await load(tokens, requests, concurrency)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<10} p50 {pct(latencies, 0.50):7.2f} ms  p99 {pct(latencies, 0.99):7.2f} ms  "
+              f"mean {statistics.mean(latencies) * 1000:7.2f} ms  {requests / elapsed:7.0f} req/s  "
+              f"{QUERIES['n'] / requests:.2f} SQL/request")
+    print(f"cache counters: {principal_cache.counters}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
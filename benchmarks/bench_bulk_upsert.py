@@ -0,0 +1,85 @@
+"""
+Import throughput: legacy per-row session/commit path vs the batched upsert engine.
+
+Maps every row of a scalatracker CSV (media is fetched separately) and writes it twice
+(first pass creates, second pass updates) into a fresh database.
+
+    python benchmarks/bench_bulk_upsert.py                       # scalatracker_novo.csv, temp SQLite
+    python benchmarks/bench_bulk_upsert.py export.csv postgresql://...
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.getcwd())
+
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base
+from backend.models import AdModel, AdHistoryModel
+from backend.ingest import upsert_ads
+from bulk_importer import map_chunk
+
+
+def legacy_write(Session, ad_data):
+    """The pre-engine path: query, setattr, history row and commit for every ad."""
+    db = Session()
+    try:
+        existing = db.query(AdModel).filter(AdModel.id == ad_data["id"]).first()
+        if existing:
+            for key, value in ad_data.items():
+                setattr(existing, key, value)
+        else:
+            db.add(AdModel(**ad_data))
+        db.add(AdHistoryModel(ad_id=ad_data["id"], adCount=ad_data["adCount"]))
+        db.commit()
+        return True
+    except Exception:
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+
+def fresh_engine(url):
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    return engine
+
+
+def main(argv):
+    csv_path = next((a for a in argv if a.endswith(".csv")), "scalatracker_novo.csv")
+    url = next((a for a in argv if "://" in a), None)
+    tmp = tempfile.mkdtemp()
+
+    ads = map_chunk(pd.read_csv(csv_path, dtype=str, keep_default_na=False, encoding="utf-8-sig"))
+    print(f"{len(ads)} rows from {csv_path}")
+
+    engine = fresh_engine(url or f"sqlite:///{os.path.join(tmp, 'legacy.db')}")
+    Session = sessionmaker(bind=engine, autoflush=False)
+    results = {}
+    for label in ("legacy create", "legacy update"):
+        start = time.perf_counter()
+        ok = sum(legacy_write(Session, dict(ad)) for ad in ads)
+        results[label] = time.perf_counter() - start
+        print(f"{label:<16} {results[label]:7.2f}s  {len(ads) / results[label]:9.0f} rows/s  ok={ok}")
+    engine.dispose()
+
+    engine = fresh_engine(url or f"sqlite:///{os.path.join(tmp, 'engine.db')}")
+    for label in ("engine create", "engine update"):
+        start = time.perf_counter()
+        report = upsert_ads([dict(ad) for ad in ads], engine=engine, log=lambda m: None)
+        results[label] = time.perf_counter() - start
+        print(f"{label:<16} {results[label]:7.2f}s  {len(ads) / results[label]:9.0f} rows/s  "
+              f"created={report['created']} updated={report['updated']} errors={report['errors']}")
+
+    for phase in ("create", "update"):
+        print(f"speedup ({phase}): {results[f'legacy {phase}'] / results[f'engine {phase}']:.1f}x")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,100 @@
+"""
+Per-row cost of niche/region classification on the real scalatracker exports.
+
+Compares the previous chained `any(x in desc ...)` checks, a combined
+alternation regex per taxonomy, the flat precompiled table used by
+backend/classifier.py, and `classify_many` (flat table + per-batch dedup).
+
+    python benchmarks/bench_classifier.py --repeat 20
+"""
+import os
+import re
+import sys
+import time
+
+sys.path.append(os.getcwd())
+
+import pandas as pd
+
+from backend.classifier import NICHE, REGION, NICHE_RULES, REGION_RULES, DEFAULT_NICHE, DEFAULT_REGION
+
+SOURCES = ["scalatracker_novo.csv", "user_sample_test.csv"]
+
+
+def legacy_niche(description):
+    desc = description.lower()
+    if any(x in desc for x in ['saúde', 'dieta', 'emagrecer', 'fit', 'corpo', 'workout', 'gym']): return "Saúde & Bem-estar"
+    if any(x in desc for x in ['dinheiro', 'lucro', 'investimento', 'milhas', 'finanças', 'crypto']): return "Finanças & Investimentos"
+    if any(x in desc for x in ['aposta', 'bet', 'tiger', 'cassino', 'jogo', 'slot']): return "iGaming & Apostas"
+    if any(x in desc for x in ['loja', 'frete', 'comprar', 'entrega', 'oferta', 'desconto']): return "E-commerce & Dropshipping"
+    if any(x in desc for x in ['curso', 'mentor', 'aula', 'vender', 'marketing']): return "Infoprodutos & Educação"
+    return "Negócios"
+
+
+def legacy_region(info_ads):
+    text = info_ads.lower()
+    if any(x in text for x in ['brazil', 'brasil', ' br']): return "Brasil"
+    if any(x in text for x in ['usa', 'united states', ' us']): return "Estados Unidos"
+    if 'colombia' in text: return "Colômbia"
+    if 'paraguay' in text or 'py' in text: return "Paraguai"
+    return "Brasil"
+
+
+def regex_classifier(rules, default):
+    # One alternation per taxonomy; the earliest-priority label among all hits wins
+    priority = {}
+    for rank, (label, keywords) in enumerate(rules):
+        for kw in keywords:
+            priority.setdefault(kw, (rank, label))
+    pattern = re.compile("|".join(re.escape(kw) for kw in sorted(priority, key=len, reverse=True)))
+
+    def classify(text):
+        hits = {priority[m] for m in pattern.findall(text.lower())}
+        return min(hits)[1] if hits else default
+    return classify
+
+
+def load_rows():
+    descriptions, infos = [], []
+    for source in SOURCES:
+        if not os.path.exists(source):
+            continue
+        df = pd.read_csv(source, dtype=str, keep_default_na=False, encoding="utf-8-sig")
+        descriptions += df.get("Descrição", pd.Series(dtype=str)).tolist()
+        infos += df.get("Info Ads", pd.Series(dtype=str)).tolist()
+    return descriptions, infos
+
+
+def timed(label, fn, rows, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    per_row = (time.perf_counter() - start) / (repeat * rows) * 1e6
+    print(f"{label:<36} {per_row:7.2f} µs/row")
+    return result
+
+
+def main(argv):
+    repeat = int(argv[argv.index("--repeat") + 1]) if "--repeat" in argv else 20
+    descriptions, infos = load_rows()
+    rows = len(descriptions)
+    print(f"{rows} rows ({len(set(descriptions))} distinct descriptions, {len(set(infos))} distinct Info Ads)")
+
+    niche_re = regex_classifier(NICHE_RULES, DEFAULT_NICHE)
+    region_re = regex_classifier(REGION_RULES, DEFAULT_REGION)
+
+    legacy = timed("legacy any() chains", lambda: (
+        [legacy_niche(d) for d in descriptions], [legacy_region(i) for i in infos]), rows, repeat)
+    regex = timed("combined regex", lambda: (
+        [niche_re(d) for d in descriptions], [region_re(i) for i in infos]), rows, repeat)
+    flat = timed("flat table (classify)", lambda: (
+        [NICHE.classify(d) for d in descriptions], [REGION.classify(i) for i in infos]), rows, repeat)
+    batch = timed("flat table + dedup (classify_many)", lambda: (
+        NICHE.classify_many(descriptions), REGION.classify_many(infos)), rows, repeat)
+
+    for label, result in (("regex", regex), ("classify", flat), ("classify_many", batch)):
+        print(f"{label:<14} matches legacy: {result == legacy}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,154 @@
+"""
+Near-duplicate detection: cost at ingest, "similar ads" lookups through the
+LSH index vs a linear scan, the daily cluster rebuild, and cluster quality
+against a known ground truth.
+
+Seeds a throwaway database with --rows ads through the normal import path
+(upsert_ads, which fingerprints and clusters as it writes). Ads come in
+families: one base copy, re-posted verbatim or with a few words swapped, some
+re-posts sharing the same stored creative. Every family is a true cluster.
+Families whose copy is reused over different creatives (variation tests) must
+not be merged.
+
+    python benchmarks/bench_dedup.py                      # temp SQLite file
+    python benchmarks/bench_dedup.py postgresql://...     # scratch Postgres DB
+    python benchmarks/bench_dedup.py --rows 50000 --runs 200
+"""
+import hashlib
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.getcwd())
+
+from sqlalchemy import create_engine, select
+
+from backend.models import AdFingerprintModel
+from backend.migrations import run_migrations
+from backend import ingest as ingest_module
+from backend.ingest import upsert_ads
+from backend import ad_fingerprints
+from backend.ad_fingerprints import similar_ads, rebuild_clusters, copy_similarity, same_creative
+
+VOCABULARY = [f"palavra{i}" for i in range(3000)] + [
+    "descubra", "método", "resultado", "grátis", "agora", "garantia", "oferta", "clique", "link", "hoje"]
+
+
+def make_ads(rows: int, seed: int = 5):
+    """Ad dicts plus {ad_id: family}; families of 1-8 ads, every 5th one a variation test."""
+    rnd = random.Random(seed)
+    base = datetime(2025, 1, 1)
+    ads, family_of, family = [], {}, 0
+    while len(ads) < rows:
+        words = rnd.choices(VOCABULARY, k=rnd.randint(18, 40))
+        variation_test = family % 5 == 4
+        shared_media = f"/media/aa/{hashlib.sha256(f'f{family}'.encode()).hexdigest()}.mp4"
+        for member in range(rnd.randint(1, 8)):
+            copy = list(words)
+            for _ in range(rnd.randint(0, 2) if member else 0):
+                copy[rnd.randrange(len(copy))] = rnd.choice(VOCABULARY)
+            if variation_test:
+                media = f"/media/bb/{hashlib.sha256(f'f{family}m{member}'.encode()).hexdigest()}.mp4"
+            else:
+                media = shared_media if rnd.random() < 0.5 else f"https://cdn.example.com/{family}/{member}.mp4"
+            ad_id = f"{10**15 + len(ads)}"
+            ads.append({"id": ad_id, "title": f"Página {family}", "copy": " ".join(copy), "mediaUrl": media,
+                        "adCount": rnd.randint(1, 200), "niche": "Negócios",
+                        "addedAt": base + timedelta(minutes=len(ads))})
+            # Variation tests: every ad is its own cluster
+            family_of[ad_id] = f"{family}-{member}" if variation_test else str(family)
+        family += 1
+    return ads[:rows], family_of
+
+
+def pair_quality(conn, family_of):
+    """Pairwise precision / recall of the stored clusters against the families."""
+    fp = AdFingerprintModel.__table__
+    clusters = {}
+    for ad_id, cluster_id in conn.execute(select(fp.c.ad_id, fp.c.cluster_id)):
+        clusters.setdefault(cluster_id, []).append(ad_id)
+    families = {}
+    for ad_id, family in family_of.items():
+        families.setdefault(family, []).append(ad_id)
+    pairs = lambda groups: {(a, b) for g in groups for a in g for b in g if a < b}
+    found, truth = pairs(clusters.values()), pairs(families.values())
+    precision = len(found & truth) / len(found) if found else 1.0
+    recall = len(found & truth) / len(truth) if truth else 1.0
+    return precision, recall, sum(1 for g in clusters.values() if len(g) > 1)
+
+
+def linear_similar(conn, ad_id: str):
+    """What /similar would cost without the index: compare against every fingerprint."""
+    fp = AdFingerprintModel.__table__
+    rows = conn.execute(select(fp.c.ad_id, fp.c.media_sha256, fp.c.image_hash, fp.c.copy_minhash)).fetchall()
+    own = next(r for r in rows if r.ad_id == ad_id)
+    return [r.ad_id for r in rows if r.ad_id != ad_id and (
+        same_creative(own, r) or copy_similarity(own.copy_minhash, r.copy_minhash) >= ad_fingerprints.COPY_SIMILARITY)]
+
+
+def timed(fn, runs: int):
+    samples = []
+    for i in range(runs):
+        t = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - t)
+    samples.sort()
+    return statistics.median(samples) * 1000, samples[max(0, int(len(samples) * 0.95) - 1)] * 1000
+
+
+def main(argv):
+    rows = int(argv[argv.index("--rows") + 1]) if "--rows" in argv else 20000
+    runs = int(argv[argv.index("--runs") + 1]) if "--runs" in argv else 100
+    url = next((a for a in argv if "://" in a), None)
+    if not url:
+        url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'dedup.db')}"
+    engine = create_engine(url)
+    run_migrations(engine)
+    ads, family_of = make_ads(rows)
+    print(f"{len(ads)} ads in {len(set(family_of.values()))} true clusters "
+          f"(numpy MinHash: {'yes' if ad_fingerprints.numpy is not None else 'no'}), {engine.dialect.name}")
+
+    t = time.perf_counter()
+    upsert_ads(ads, engine=engine, log=lambda *_: None)
+    ingest = time.perf_counter() - t
+    t = time.perf_counter()
+    signatures = [ad_fingerprints.minhash(ad["copy"]) for ad in ads]
+    hashing = time.perf_counter() - t
+    if engine.dialect.name == "sqlite":
+        plain = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'plain.db')}")
+        run_migrations(plain)
+        hook, ingest_module.fingerprint_ads = ingest_module.fingerprint_ads, lambda conn, rows: []
+        t = time.perf_counter()
+        upsert_ads(ads, engine=plain, log=lambda *_: None)
+        without = time.perf_counter() - t
+        ingest_module.fingerprint_ads = hook
+        print(f"import: {ingest:.1f}s with fingerprints ({len(ads) / ingest:.0f} ads/s), {without:.1f}s without; "
+              f"MinHash alone {hashing * 1e6 / len(signatures):.0f} us/ad")
+    else:
+        print(f"import with fingerprints: {ingest:.1f}s ({len(ads) / ingest:.0f} ads/s); "
+              f"MinHash alone {hashing * 1e6 / len(signatures):.0f} us/ad")
+
+    with engine.connect() as conn:
+        precision, recall, clusters = pair_quality(conn, family_of)
+        print(f"incremental clusters: {clusters} with 2+ ads, pair precision {precision:.3f}, recall {recall:.3f}")
+
+        rnd = random.Random(1)
+        sample = [rnd.choice(ads)["id"] for _ in range(runs)]
+        p50, p95 = timed(lambda i: similar_ads(conn, sample[i]), runs)
+        l50, l95 = timed(lambda i: linear_similar(conn, sample[i]), max(3, runs // 20))
+        print(f"/similar via LSH index: p50 {p50:.1f} ms, p95 {p95:.1f} ms; linear scan: p50 {l50:.0f} ms, p95 {l95:.0f} ms")
+
+    with engine.begin() as conn:
+        t = time.perf_counter()
+        summary = rebuild_clusters(conn)
+        print(f"full rebuild: {time.perf_counter() - t:.1f}s, {summary}")
+        precision, recall, clusters = pair_quality(conn, family_of)
+        print(f"rebuilt clusters: {clusters} with 2+ ads, pair precision {precision:.3f}, recall {recall:.3f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
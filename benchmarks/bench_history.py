@@ -0,0 +1,74 @@
+"""
+ad_history growth over repeated imports: one row per ad per import (previous
+behaviour) vs run-length encoded change points plus day/week rollups.
+
+Seeds a throwaway SQLite database, re-imports the same library N times with a
+small fraction of adCount changes per import, and reports rows written, import
+time and the cost of a batched history read for 200 ads.
+
+    python benchmarks/bench_history.py --ads 20000 --imports 10 --change-rate 0.05
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.getcwd())
+
+from sqlalchemy import create_engine, func, select
+
+from backend.database import Base
+from backend.models import AdHistoryModel, AdHistoryRollupModel
+from backend.ingest import upsert_ads
+from backend.ad_history import history_series
+
+
+def count(engine, model):
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(model.__table__)).scalar()
+
+
+def main(argv):
+    ads = int(argv[argv.index("--ads") + 1]) if "--ads" in argv else 20_000
+    imports = int(argv[argv.index("--imports") + 1]) if "--imports" in argv else 10
+    change_rate = float(argv[argv.index("--change-rate") + 1]) if "--change-rate" in argv else 0.05
+    rnd = random.Random(3)
+    engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'history.db')}")
+    Base.metadata.create_all(engine)
+    quiet = lambda m: None
+
+    library = [{"id": f"{10**15 + i}", "title": f"Ad {i}", "adCount": rnd.randint(1, 50)} for i in range(ads)]
+    elapsed = []
+    for _ in range(imports):
+        for ad in library:
+            if rnd.random() < change_rate:
+                ad["adCount"] += rnd.randint(1, 5)
+        start = time.perf_counter()
+        upsert_ads([dict(ad) for ad in library], engine=engine, log=quiet)
+        elapsed.append(time.perf_counter() - start)
+
+    raw, rollups = count(engine, AdHistoryModel), count(engine, AdHistoryRollupModel)
+    print(f"{ads} ads x {imports} imports, {change_rate:.0%} adCount changes per import")
+    print(f"one row per ad per import : {ads * imports:>9} ad_history rows")
+    print(f"change points only        : {raw:>9} ad_history rows (+{rollups} day/week rollups)")
+    print(f"import time               : first {elapsed[0]:.2f}s, re-imports avg {sum(elapsed[1:]) / max(1, len(elapsed) - 1):.2f}s")
+
+    ids = [ad["id"] for ad in rnd.sample(library, min(200, ads))]
+    for resolution in ("raw", "day"):
+        start = time.perf_counter()
+        with engine.connect() as conn:
+            series = history_series(conn, ids, resolution)
+        ms = (time.perf_counter() - start) * 1000
+        print(f"/ads/history {len(ids)} ids ({resolution:>3}): {ms:6.1f} ms, {sum(map(len, series.values()))} points")
+    # Previous client behaviour: one request (query) per ad
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        for ad_id in ids:
+            conn.execute(select(AdHistoryModel).where(AdHistoryModel.ad_id == ad_id)
+                         .order_by(AdHistoryModel.timestamp)).fetchall()
+    print(f"{len(ids)} single-ad queries      : {(time.perf_counter() - start) * 1000:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
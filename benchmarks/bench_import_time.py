@@ -0,0 +1,120 @@
+"""
+Cold-start import cost of the API and Celery worker entry points, from
+`python -X importtime`.
+
+Each target is imported --runs times in a fresh interpreter; the median total
+import time and wall time are reported, with the most expensive modules pulled
+in directly by the target (cumulative time, excluding the interpreter's own
+startup). --ref imports the same targets from another git revision (exported to
+a temp dir) for a before/after comparison; --json writes the results so they
+can be tracked between releases.
+
+    python benchmarks/bench_import_time.py --runs 5 [--top 15] [--ref HEAD~1] [--json import_time.json]
+"""
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+TARGETS = (
+    ("api (uvicorn worker)", "backend.main"),
+    ("celery worker", "backend.worker"),
+    ("celery tasks", "backend.tasks"),
+)
+
+LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)$")
+
+
+def import_profile(module: str, cwd: str):
+    """(wall seconds, {module: (self_us, cumulative_us, depth)}) of one cold import."""
+    tmp = tempfile.mkdtemp()
+    env = dict(os.environ, PYTHONPATH=cwd, LOG_FILE=os.path.join(tmp, "app.log"),
+               DATABASE_URL=os.environ.get("DATABASE_URL", f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}"))
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=cwd, env=env, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    # Lines are printed when an import finishes: the target's own subtree is
+    # everything between the previous top-level line (interpreter startup) and it
+    modules, pending = {}, {}
+    for line in proc.stderr.splitlines():
+        match = LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        depth = (len(indent) - 1) // 2
+        pending[name] = (int(self_us), int(cumulative_us), depth)
+        if depth == 0:
+            if name == module:
+                modules.update(pending)
+            pending = {}
+    return wall, modules
+
+
+def measure(module: str, cwd: str, runs: int, top: int):
+    walls, totals, per_module = [], [], {}
+    for _ in range(runs):
+        wall, modules = import_profile(module, cwd)
+        walls.append(wall)
+        totals.append(modules.get(module, (0, 0, 0))[1])
+        for name, (_, cumulative, depth) in modules.items():
+            if name != module and depth >= 1:
+                per_module.setdefault(name, []).append((cumulative, depth))
+    # Direct imports of the target, by median cumulative cost
+    heaviest = sorted(((statistics.median(c for c, _ in v), name) for name, v in per_module.items()
+                       if v[0][1] == 1), reverse=True)[:top]
+    return {
+        "module": module,
+        "importMs": round(statistics.median(totals) / 1000, 1),
+        "wallMs": round(statistics.median(walls) * 1000, 1),
+        "heaviest": [{"module": name, "ms": round(us / 1000, 1)} for us, name in heaviest],
+    }
+
+
+def export_ref(ref: str) -> str:
+    target = tempfile.mkdtemp()
+    archive = subprocess.run(["git", "archive", ref], capture_output=True, check=True).stdout
+    subprocess.run(["tar", "-x", "-C", target], input=archive, check=True)
+    return target
+
+
+def main(argv):
+    runs = int(argv[argv.index("--runs") + 1]) if "--runs" in argv else 5
+    top = int(argv[argv.index("--top") + 1]) if "--top" in argv else 12
+    ref = argv[argv.index("--ref") + 1] if "--ref" in argv else None
+    out = argv[argv.index("--json") + 1] if "--json" in argv else None
+
+    trees = [("working tree", os.getcwd())]
+    if ref:
+        trees.append((ref, export_ref(ref)))
+    print(f"{runs} cold imports per target (median)")
+    results = {}
+    for tree, cwd in trees:
+        for label, module in TARGETS:
+            result = measure(module, cwd, runs, top)
+            results.setdefault(tree, {})[module] = result
+            print(f"\n[{tree}] {label:<22} import {module}: {result['importMs']:7.1f} ms "
+                  f"(process wall {result['wallMs']:.0f} ms)")
+            for entry in result["heaviest"]:
+                print(f"    {entry['module']:<40} {entry['ms']:7.1f} ms")
+
+    if ref:
+        print()
+        for label, module in TARGETS:
+            now, before = results["working tree"][module], results[ref][module]
+            print(f"{label:<22} {before['importMs']:7.1f} ms -> {now['importMs']:7.1f} ms "
+                  f"({now['importMs'] - before['importMs']:+.1f} ms)")
+    if out:
+        with open(out, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"results written to {out}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
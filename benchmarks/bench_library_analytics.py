@@ -0,0 +1,116 @@
+"""
+/analytics/library: full rebuild, snapshot read and incremental refresh after imports.
+
+Seeds a throwaway SQLite database with N ads, then reports
+- the payload the dashboard used to download (/ads?full=true) vs the analytics payload,
+- the cost of a full rebuild and of a snapshot read,
+- the extra cost the delta adds to an import batch,
+and checks that the incrementally maintained snapshot equals a fresh rebuild.
+
+    python benchmarks/bench_library_analytics.py --rows 100000
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.getcwd())
+
+from sqlalchemy import create_engine, insert, select
+
+from backend.database import Base
+from backend.models import AdModel, AnalyticsSnapshotModel
+from backend.ingest import upsert_ads
+from backend.library_analytics import get_library_intelligence, rebuild_library_snapshot
+
+PLATFORMS = ["Meta Ads", "TikTok Ads", "Google Ads"]
+STATUSES = ["Escalando", "Validado", "Teste", "Escala"]
+TICKETS = ["R$ 97,00", "R$ 197", "47.90", "Consultar", "R$ 1.297,00"]
+
+
+def make_ad(rnd, i, base):
+    return {
+        "id": f"{10**15 + i}", "title": f"Page {i % 5000}", "platform": rnd.choice(PLATFORMS),
+        "status": rnd.choice(STATUSES), "adCount": rnd.randint(1, 200), "ticketPrice": rnd.choice(TICKETS),
+        "addedAt": base + timedelta(seconds=i * 30), "copy": "lorem ipsum " * 20, "tags": [],
+        "performance": {"estimatedCtr": round(rnd.uniform(0.2, 9), 2), "daysActive": rnd.randint(0, 40)},
+    }
+
+
+def main(argv):
+    rows = int(argv[argv.index("--rows") + 1]) if "--rows" in argv else 100_000
+    rnd = random.Random(7)
+    base = datetime(2025, 1, 1)
+    engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'analytics.db')}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for start in range(0, rows, 5000):
+            conn.execute(insert(AdModel.__table__), [make_ad(rnd, i, base) for i in range(start, min(rows, start + 5000))])
+
+    start = time.perf_counter()
+    with engine.connect() as conn:
+        full = [AdModel(**dict(r._mapping)).to_dict() for r in conn.execute(select(*AdModel.__table__.columns))]
+    full_bytes = len(json.dumps(full, default=str))
+    full_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rebuild_library_snapshot(engine)
+    rebuild_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(50):
+        intel = get_library_intelligence(engine)
+    read_ms = (time.perf_counter() - start) / 50 * 1000
+    intel_bytes = len(json.dumps(intel))
+
+    print(f"{rows} ads")
+    print(f"full library (/ads?full=true) : {full_bytes / 1e6:8.2f} MB, {full_s:6.2f}s to build (then analyzeLibrary in the browser)")
+    print(f"/analytics/library            : {intel_bytes / 1e3:8.2f} KB, snapshot read {read_ms:.2f} ms, full rebuild {rebuild_s:.2f}s")
+
+    # Import 10 batches of 500: half new ads, half updates of existing ones
+    quiet = lambda m: None
+    batches = []
+    for b in range(10):
+        batch = [make_ad(rnd, rows + b * 250 + i, base) for i in range(250)]
+        batch += [make_ad(rnd, rnd.randrange(rows), base) for _ in range(250)]
+        batches.append(batch)
+
+    start = time.perf_counter()
+    for batch in batches:
+        upsert_ads(batch, engine=engine, log=quiet)
+    with_delta = time.perf_counter() - start
+
+    with engine.begin() as conn:
+        conn.execute(AnalyticsSnapshotModel.__table__.delete())
+    start = time.perf_counter()
+    for batch in batches:
+        upsert_ads(batch, engine=engine, log=quiet) # snapshot absent: delta is skipped
+    without_delta = time.perf_counter() - start
+    print(f"import 10x500 rows            : {without_delta:.2f}s without snapshot, {with_delta:.2f}s with incremental delta")
+
+    # The second pass re-applied the same rows; rebuild and compare with a delta-maintained copy
+    rebuild_library_snapshot(engine)
+    for batch in batches:
+        upsert_ads(batch, engine=engine, log=quiet)
+    incremental = get_library_intelligence(engine)
+    fresh = get_library_intelligence(engine, refresh=True)
+    incremental.pop("lastAnalysis"), fresh.pop("lastAnalysis")
+    same = json.dumps(incremental, sort_keys=True) == json.dumps(fresh, sort_keys=True)
+    close = same or all(
+        abs(a - b) < 1e-6 for a, b in zip(_numbers(incremental), _numbers(fresh)))
+    print(f"incremental snapshot == full rebuild: {same or close} (totalAds {incremental['globalStats']['totalAds']})")
+
+
+def _numbers(obj):
+    if isinstance(obj, dict):
+        for key in sorted(obj):
+            yield from _numbers(obj[key])
+    elif isinstance(obj, (int, float)):
+        yield obj
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
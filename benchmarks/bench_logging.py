@@ -0,0 +1,134 @@
+"""
+Event-loop time spent on per-request logging: the former `log_to_file`
+(open/append/close on the loop thread, twice per request) vs the queue-backed
+logger of backend/app_logging.py.
+
+Fires requests at two minimal ASGI apps with the same middleware shape and
+reports the loop-thread time spent inside the logging calls, request latency,
+and the worst event-loop lag seen by a 1 ms ticker running alongside.
+--io-delay-ms adds a sleep to every file write (both modes) to model a slow or
+contended disk: the legacy path pays it on the loop thread, the queue path in
+its writer thread.
+
+    python benchmarks/bench_logging.py --requests 5000 --concurrency 50 [--io-delay-ms 2]
+"""
+import asyncio
+import logging.handlers
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.getcwd())
+
+import httpx
+from fastapi import FastAPI
+
+from backend.app_logging import setup_logging, get_logger, flush_logs, dropped_records
+
+TMP = tempfile.mkdtemp()
+LEGACY_FILE = os.path.join(TMP, "legacy.log")
+IO_DELAY = {"s": 0.0}
+
+
+def legacy_log_to_file(msg):
+    with open(LEGACY_FILE, "a") as f:
+        f.write(f"{time.ctime()}: {msg}\n")
+        time.sleep(IO_DELAY["s"])
+
+
+_emit = logging.FileHandler.emit
+
+
+def slow_emit(self, record):
+    _emit(self, record)
+    time.sleep(IO_DELAY["s"])
+
+
+def make_app(mode: str, spent: list):
+    app = FastAPI()
+    request_log = get_logger("request")
+
+    @app.middleware("http")
+    async def log_requests(request, call_next):
+        start_time = time.time()
+        method, path = request.method, request.url.path
+        t = time.perf_counter()
+        if mode == "legacy":
+            legacy_log_to_file(f"Request started: {method} {path} (Origin: None)")
+        else:
+            request_log.debug(f"Request started: {method} {path} (Origin: None)")
+        spent.append(time.perf_counter() - t)
+        response = await call_next(request)
+        duration = time.time() - start_time
+        t = time.perf_counter()
+        if mode == "legacy":
+            legacy_log_to_file(f"Request finished: {method} {path} - {response.status_code} ({duration:.2f}s)")
+        else:
+            request_log.info(f"Request finished: {method} {path} - {response.status_code} ({duration:.2f}s)",
+                             extra={"fields": {"method": method, "path": path, "status": response.status_code,
+                                               "durationMs": round(duration * 1000, 1)}})
+        spent.append(time.perf_counter() - t)
+        return response
+
+    @app.get("/")
+    async def root():
+        return {"status": "ok"}
+
+    return app
+
+
+async def run(mode: str, requests: int, concurrency: int):
+    spent, latencies, lags = [], [], []
+    app = make_app(mode, spent)
+    stop = asyncio.Event()
+
+    async def ticker():
+        while not stop.is_set():
+            t = time.perf_counter()
+            await asyncio.sleep(0.001)
+            lags.append(time.perf_counter() - t - 0.001)
+
+    tick = asyncio.create_task(ticker())
+    semaphore = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def one():
+            async with semaphore:
+                t = time.perf_counter()
+                await client.get("/")
+                latencies.append(time.perf_counter() - t)
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests)))
+        elapsed = time.perf_counter() - start
+    stop.set()
+    await tick
+    return spent, latencies, lags, elapsed
+
+
+def pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+async def main(argv):
+    requests = int(argv[argv.index("--requests") + 1]) if "--requests" in argv else 5000
+    concurrency = int(argv[argv.index("--concurrency") + 1]) if "--concurrency" in argv else 50
+    IO_DELAY["s"] = float(argv[argv.index("--io-delay-ms") + 1]) / 1000 if "--io-delay-ms" in argv else 0.0
+    if IO_DELAY["s"]:
+        logging.FileHandler.emit = slow_emit
+    print(f"{requests} requests, concurrency {concurrency}, io delay {IO_DELAY['s'] * 1000:.1f} ms/write")
+    for mode, fmt, sample in (("legacy", None, None), ("queue", "text", 1.0), ("queue", "json", 1.0), ("queue", "json", 0.1)):
+        label = mode if mode == "legacy" else f"queue/{fmt} sample={sample}"
+        if mode == "queue":
+            setup_logging(log_file=os.path.join(TMP, f"app-{fmt}.log"), fmt=fmt, request_sample=sample, force=True)
+        spent, latencies, lags, elapsed = await run(mode, requests, concurrency)
+        print(f"{label:<24} loop time in logging {sum(spent) * 1000:8.1f} ms total, {statistics.mean(spent) * 1e6:6.1f} us/call  "
+              f"latency p50 {pct(latencies, 0.5):6.2f} ms p99 {pct(latencies, 0.99):6.2f} ms  "
+              f"max loop lag {max(lags) * 1000:6.2f} ms  {requests / elapsed:6.0f} req/s")
+    flush_logs()
+    print(f"dropped records: {dropped_records()}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
@@ -0,0 +1,104 @@
+"""
+What a grid of ad cards costs the API in bytes and time: the old StaticFiles
+mount against MediaFiles (media_serving.py), in its app and accel modes.
+
+Writes --cards synthetic creatives (--size MB each) into a throwaway vault and
+requests them the way browsers do:
+
+- card, before: the thumbnail was the creative, so every card fetched the whole file;
+- card, after: a poster JPEG (rendered with media_posters if ffmpeg is
+  installed, otherwise a --poster-kb stand-in) with the video on preload="none";
+- revisit: If-None-Match against the strong ETag (304, no body);
+- seek: a 256 KB Range request, as a playing <video> makes;
+- accel: the same full request when nginx sends the bytes (X-Accel-Redirect).
+
+    python benchmarks/bench_media.py
+    python benchmarks/bench_media.py --cards 200 --size 8 --runs 3
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.getcwd())
+
+import httpx
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.staticfiles import StaticFiles
+
+from backend.media_vault import MediaVault
+from backend.media_serving import MediaFiles
+from backend import media_posters
+
+
+def seed(root: str, cards: int, size_mb: float, poster_kb: int):
+    vault = MediaVault(root=root)
+    creatives, posters = [], []
+    for i in range(cards):
+        chunk = os.urandom(64 * 1024)
+        chunks = [chunk] * max(1, int(size_mb * 16)) + [str(i).encode()]
+        _, rel, _ = vault.store(chunks, "mp4")
+        creatives.append(rel)
+        data = None
+        if media_posters.renderable("video"):
+            data = media_posters.render_poster(vault.disk_path(rel), "video")
+        _, poster, _ = vault.store([data or os.urandom(poster_kb * 1024) + str(i).encode()], "jpg")
+        posters.append(poster)
+    return creatives, posters
+
+
+async def grid(client, paths, prefix, headers_for=lambda path: {}):
+    """Fetches every path once; returns (seconds, bytes on the wire, status codes)."""
+    start, total, codes = time.perf_counter(), 0, set()
+    for path in paths:
+        response = await client.get(prefix + path[len("/media"):], headers=headers_for(path))
+        total += len(response.content)
+        codes.add(response.status_code)
+    return time.perf_counter() - start, total, codes
+
+
+async def run(root, creatives, posters, runs):
+    etags = {}
+    app = Starlette(routes=[
+        Mount("/old", StaticFiles(directory=root)),
+        Mount("/new", MediaFiles(directory=root, mode="app")),
+        Mount("/accel", MediaFiles(directory=root, mode="accel")),
+    ])
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for path in creatives:
+            etags[path] = (await client.head("/new" + path[len("/media"):])).headers["etag"]
+        cases = [
+            ("card, before (whole creative)", creatives, "/old", lambda p: {}),
+            ("card, after (poster)", posters, "/new", lambda p: {}),
+            ("revisit (If-None-Match, 304)", creatives, "/new", lambda p: {"If-None-Match": etags[p]}),
+            ("seek (Range 256 KB)", creatives, "/new", lambda p: {"Range": "bytes=0-262143"}),
+            ("full file, app mode", creatives, "/new", lambda p: {}),
+            ("full file, accel mode", creatives, "/accel", lambda p: {"X-Media-Accel": "/_protected_media/"}),
+        ]
+        print(f"{'request':<32} {'ms/card':>8} {'KB/card':>9}  status")
+        for label, paths, prefix, headers_for in cases:
+            samples = []
+            for _ in range(runs):
+                seconds, total, codes = await grid(client, paths, prefix, headers_for)
+                samples.append(seconds)
+            ms = statistics.median(samples) * 1000 / len(paths)
+            print(f"{label:<32} {ms:8.2f} {total / 1024 / len(paths):9.1f}  {sorted(codes)}")
+
+
+def main(argv):
+    cards = int(argv[argv.index("--cards") + 1]) if "--cards" in argv else 60
+    size_mb = float(argv[argv.index("--size") + 1]) if "--size" in argv else 4
+    poster_kb = int(argv[argv.index("--poster-kb") + 1]) if "--poster-kb" in argv else 30
+    runs = int(argv[argv.index("--runs") + 1]) if "--runs" in argv else 3
+    root = tempfile.mkdtemp()
+    creatives, posters = seed(root, cards, size_mb, poster_kb)
+    rendered = "rendered with ffmpeg" if media_posters.renderable("video") else f"{poster_kb} KB stand-ins (no ffmpeg)"
+    print(f"{cards} creatives of {size_mb:g} MB; posters {rendered}")
+    asyncio.run(run(root, creatives, posters, runs))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,110 @@
+"""
+Media vault GC: how long a pass over a large vault takes, what it reclaims,
+and what the referenced set saves over asking the database about each file.
+
+Seeds a throwaway vault with --files small files (sharded like the real one)
+and a database whose ads reference --referenced of them through the normal
+write path (upsert_ads plus ad_media links). The rest are orphans, which is
+what deleted ads used to leave behind. It then times:
+
+- a dry run (scan + referenced set only), then the real pass deleting orphans in batches;
+- a second pass over the now clean vault (the steady-state cost of the periodic job);
+- a per-file lookup (one indexed query per file), the naive alternative to the set;
+- a quota pass that evicts the coldest half of the creatives (all have posters).
+
+    python benchmarks/bench_media_gc.py
+    python benchmarks/bench_media_gc.py --files 100000 --referenced 0.6
+"""
+import hashlib
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.getcwd())
+
+from sqlalchemy import create_engine, insert, select, text
+
+from backend.models import AdModel, MediaAssetModel, AdMediaModel, MediaPosterModel
+from backend.migrations import run_migrations
+from backend.ingest import upsert_ads
+from backend.media_vault import MediaVault, sha_from_path
+from backend.media_gc import collect_garbage
+
+FILE_BYTES = 2048
+
+
+def seed(engine, vault: MediaVault, files: int, referenced: float):
+    """Writes the files, then ads for the first `referenced` share of them, each with a poster."""
+    base, assets, ads, links, posters = datetime(2025, 1, 1), [], [], [], []
+    keep = int(files * referenced)
+    old = time.time() - 7 * 24 * 3600
+    for i in range(files):
+        data = hashlib.sha256(str(i).encode()).digest() * (FILE_BYTES // 32)
+        sha, rel_path, size = vault.store([data], "mp4")
+        os.utime(vault.disk_path(rel_path), (old, old))
+        assets.append({"sha256": sha, "path": rel_path, "size": size, "content_type": "video/mp4", "ref_count": 0})
+        if i < keep and i % 2 == 0:
+            # Every referenced creative is followed by its poster
+            ads.append({"id": str(i), "title": "A", "copy": "x", "mediaUrl": rel_path, "niche": "Negócios",
+                        "adCount": 1, "addedAt": base + timedelta(minutes=i)})
+            links.append({"ad_id": str(i), "sha256": sha})
+        elif i < keep:
+            posters.append({"sha256": assets[-2]["sha256"], "poster_sha256": sha, "attempts": 1})
+            ads[-1]["thumbnail"] = rel_path
+    with engine.begin() as conn:
+        for start in range(0, len(assets), 5000):
+            conn.execute(insert(MediaAssetModel.__table__), assets[start:start + 5000])
+        if links:
+            conn.execute(insert(AdMediaModel.__table__), links)
+            conn.execute(insert(MediaPosterModel.__table__), posters)
+    upsert_ads(ads, engine=engine, log=lambda *_: None)
+    return keep, files - keep
+
+
+def per_file_lookup(engine, vault: MediaVault):
+    """The naive reconciliation: one indexed lookup per file on disk."""
+    links, ads = AdMediaModel.__table__, AdModel.__table__
+    start, used = time.perf_counter(), 0
+    with engine.connect() as conn:
+        for directory, _, names in os.walk(vault.root):
+            for name in names:
+                rel_path = "/media/" + os.path.relpath(os.path.join(directory, name), vault.root)
+                sha = sha_from_path(rel_path)
+                used += bool(conn.execute(select(links.c.ad_id).where(links.c.sha256 == sha).limit(1)).first()
+                             or conn.execute(select(ads.c.id).where(ads.c.thumbnail == rel_path).limit(1)).first())
+    return time.perf_counter() - start, used
+
+
+def main(argv):
+    files = int(argv[argv.index("--files") + 1]) if "--files" in argv else 30000
+    referenced = float(argv[argv.index("--referenced") + 1]) if "--referenced" in argv else 0.5
+    directory = tempfile.mkdtemp()
+    engine = create_engine(f"sqlite:///{os.path.join(directory, 'gc.db')}")
+    run_migrations(engine)
+    vault = MediaVault(root=os.path.join(directory, "media"), engine=engine)
+    t = time.perf_counter()
+    keep, orphans = seed(engine, vault, files, referenced)
+    print(f"{files} files of {FILE_BYTES} B ({keep} referenced, {orphans} orphans) seeded in {time.perf_counter() - t:.1f}s")
+
+    for label, kwargs in (("dry run", {"dry_run": True}), ("GC pass", {}), ("clean vault", {})):
+        summary = collect_garbage(engine, vault, quota=0, **kwargs)
+        rate = summary["scanned"] / max(summary["seconds"], 1e-3)
+        print(f"{label:<12} {summary['seconds']:6.2f}s ({rate:,.0f} files/s): scanned {summary['scanned']}, "
+              f"orphans {summary['orphans']}, reclaimed {summary['reclaimedBytes'] / 1024:,.0f} KB")
+
+    seconds, used = per_file_lookup(engine, vault)
+    print(f"per-file lookup {seconds:6.2f}s for the same {used} kept files")
+
+    quota = keep * FILE_BYTES * 3 // 4
+    summary = collect_garbage(engine, vault, quota=quota)
+    with engine.connect() as conn:
+        on_poster = conn.execute(text('SELECT count(*) FROM ads WHERE "mediaUrl" = thumbnail')).scalar()
+    print(f"quota {quota / 1024:,.0f} KB: {summary['seconds']:.2f}s, evicted {summary['evicted']} creatives "
+          f"({summary['evictedBytes'] / 1024:,.0f} KB), kept {summary['keptBytes'] / 1024:,.0f} KB; "
+          f"{on_poster} ads now show their poster")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
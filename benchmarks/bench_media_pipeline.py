@@ -0,0 +1,89 @@
+"""
+Import latency with inline media downloads vs the decoupled media pipeline.
+
+Serves creatives from the local stand-in CDN (slow, flaky and dead URLs mixed in)
+and imports the same ads into a temp SQLite database both ways.
+
+    python benchmarks/bench_media_pipeline.py --ads 80 --delay 0.25
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.getcwd())
+
+from sqlalchemy import create_engine, select, func
+
+from backend.database import Base
+from backend.models import AdModel
+from backend.media_vault import MediaVault
+from backend.media_pipeline import MediaPipeline, MediaDownloadError, fetch_media, apply_media_result, media_jobs
+from backend.ingest import upsert_ads
+from media_standin import start_standin
+
+
+def make_ads(base_url: str, n: int, delay: float):
+    ads = []
+    for i in range(n):
+        query = f"delay={delay}"
+        if i % 10 == 3:
+            query += "&fail=2"          # recovers after retries
+        if i % 20 == 7:
+            query += "&status=404"      # dead link
+        url = f"{base_url}/videos/{i}.mp4?{query}"
+        ads.append({"id": f"ad{i}", "title": f"Ad {i}", "mediaUrl": url, "thumbnail": url, "adCount": 5})
+    return ads
+
+
+def fresh_engine(tmp, name):
+    engine = create_engine(f"sqlite:///{os.path.join(tmp, name)}")
+    Base.metadata.create_all(engine)
+    return engine
+
+
+def main(argv):
+    n = int(argv[argv.index("--ads") + 1]) if "--ads" in argv else 80
+    delay = float(argv[argv.index("--delay") + 1]) if "--delay" in argv else 0.25
+    tmp = tempfile.mkdtemp()
+    server, base_url = start_standin()
+    quiet = lambda m: None
+
+    # Inline: download each creative (single thread), then write the row
+    engine = fresh_engine(tmp, "inline.db")
+    vault = MediaVault(os.path.join(tmp, "inline_media"), engine)
+    start = time.perf_counter()
+    for ad in make_ads(base_url, n, delay):
+        try:
+            local = fetch_media(ad["mediaUrl"], ad["id"], vault=vault)
+            ad["mediaUrl"] = ad["thumbnail"] = local
+        except MediaDownloadError:
+            pass
+        upsert_ads([ad], engine=engine, log=quiet)
+    inline = time.perf_counter() - start
+    print(f"inline   : import finished after {inline:6.2f}s (media included)")
+
+    # Pipeline: write everything first, then fetch with bounded concurrency
+    engine = fresh_engine(tmp, "pipeline.db")
+    vault = MediaVault(os.path.join(tmp, "pipeline_media"), engine)
+    ads = make_ads(base_url, n, delay)
+    start = time.perf_counter()
+    upsert_ads(ads, engine=engine, log=quiet)
+    imported = time.perf_counter() - start
+
+    pipeline = MediaPipeline(max_workers=16, per_host=8, backoff=0.1, vault=vault,
+                             on_done=lambda ad_id, url, path: apply_media_result(ad_id, url, path, engine=engine, vault=vault))
+    pipeline.submit_many(media_jobs(ads))
+    stats = pipeline.wait()
+    pipeline.shutdown()
+    media_done = time.perf_counter() - start
+
+    with engine.connect() as conn:
+        local = conn.execute(select(func.count()).where(AdModel.mediaUrl.like("/media/%"))).scalar()
+    print(f"pipeline : import finished after {imported:6.2f}s, media after {media_done:6.2f}s")
+    print(f"           {stats} -> {local}/{n} ads repointed to /media/")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,127 @@
+"""
+Media refresh scheduler: how many ads on presigned URLs lose their creative
+before it is downloaded, expiry-ordered (media_refresh.py) against FIFO.
+
+Seeds --ads ads whose URLs carry X-Amz-Date/X-Amz-Expires=28800 signatures
+with random time left (10 minutes to 8 hours), as after a bootstrap import
+whose downloads failed. It then runs refresh cycles of --batch downloads on
+a simulated clock advancing --interval seconds per cycle (the queue's
+timestamps are shifted back instead of sleeping). Downloads take --latency
+ms, a --flaky share fail once with a retryable error, and any fetch after
+the signature expired gets a 403, as the real CDN does.
+
+- expiry: run_refresh_cycle as scheduled in production;
+- FIFO: the same cycle with the expiry column blanked, so rows are taken in
+  queue order and retries are not capped by the time left.
+
+    python benchmarks/bench_media_refresh.py
+    python benchmarks/bench_media_refresh.py --ads 5000 --batch 150 --interval 600
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.getcwd())
+
+from sqlalchemy import create_engine, select, update, bindparam, func
+
+from backend.models import AdModel, MediaQueueModel
+from backend.migrations import run_migrations
+from backend.ingest import upsert_ads
+from backend.media_vault import MediaVault
+from backend.media_pipeline import MediaDownloadError, apply_media_result
+from backend.media_refresh import run_refresh_cycle, sync_queue
+
+HORIZON = 8 * 3600 + 1200
+
+
+def seed(engine, ads: int, rng: random.Random):
+    """Ads on signed URLs; returns their real expiry by id."""
+    now, rows, expiry = datetime.utcnow(), [], {}
+    for i in range(ads):
+        left = rng.uniform(600, 28800)
+        signed = now - timedelta(seconds=28800 - left)
+        ad_id = f"ad-{i}"
+        expiry[ad_id] = signed + timedelta(seconds=28800)
+        rows.append({"id": ad_id, "title": "A", "copy": "x", "niche": "Negócios", "adCount": 1,
+                     "mediaUrl": f"https://spaces.test/{ad_id}.mp4?X-Amz-Date={signed:%Y%m%dT%H%M%SZ}"
+                                 f"&X-Amz-Expires=28800&X-Amz-Signature=f00"})
+    upsert_ads(rows, engine=engine, log=lambda *_: None)
+    return {ad_id: at.replace(microsecond=0) for ad_id, at in expiry.items()}
+
+
+def shift(engine, seconds: int):
+    """Advances the simulated clock: every queued timestamp moves `seconds` into the past."""
+    queue = MediaQueueModel.__table__
+    with engine.begin() as conn:
+        rows = conn.execute(select(queue.c.ad_id, queue.c.expires_at, queue.c.next_attempt_at)).fetchall()
+        if rows:
+            delta = timedelta(seconds=seconds)
+            conn.execute(update(queue).where(queue.c.ad_id == bindparam("b_id")).values(
+                expires_at=bindparam("b_exp"), next_attempt_at=bindparam("b_next")),
+                [{"b_id": r.ad_id, "b_exp": r.expires_at - delta if r.expires_at else None,
+                  "b_next": r.next_attempt_at - delta} for r in rows])
+
+
+def simulate(mode: str, ads: int, batch: int, interval: int, latency: float, flaky: float, seed_value: int):
+    directory = tempfile.mkdtemp()
+    engine = create_engine(f"sqlite:///{os.path.join(directory, 'refresh.db')}")
+    run_migrations(engine)
+    vault = MediaVault(root=os.path.join(directory, "media"), engine=engine)
+    rng = random.Random(seed_value)
+    expiry = seed(engine, ads, rng)
+    flaky_ids = {ad_id for ad_id in expiry if rng.random() < flaky}
+    clock = {"offset": 0}
+
+    def fetch(url, ad_id, session=None, timeout=None, vault=None):
+        time.sleep(latency / 1000)
+        if expiry[ad_id] - timedelta(seconds=clock["offset"]) <= datetime.utcnow():
+            raise MediaDownloadError("403 Forbidden (signature expired)", retryable=False)
+        if ad_id in flaky_ids:
+            flaky_ids.discard(ad_id)
+            raise MediaDownloadError("503 Service Unavailable", retryable=True)
+        return vault.store([ad_id.encode()], "mp4")[1]
+
+    def blank_expiry():
+        if mode == "fifo":
+            queue = MediaQueueModel.__table__
+            with engine.begin() as conn:
+                conn.execute(update(queue).values(expires_at=None))
+
+    cycles, downloaded, busy = 0, 0, 0.0
+    while clock["offset"] < HORIZON:
+        with engine.begin() as conn:
+            sync_queue(conn)
+        blank_expiry()
+        report = run_refresh_cycle(engine, limit=batch, fetch=fetch, vault=vault, backoff=0,
+                                   on_done=lambda a, u, p: apply_media_result(a, u, p, engine=engine, vault=vault))
+        cycles += 1
+        downloaded += report["downloaded"]
+        busy += report["seconds"]
+        shift(engine, interval)
+        clock["offset"] += interval
+
+    with engine.connect() as conn:
+        external = conn.execute(select(func.count()).where(AdModel.__table__.c.mediaUrl.like("http%"))).scalar()
+    return cycles, downloaded, busy, external
+
+
+def main(argv):
+    ads = int(argv[argv.index("--ads") + 1]) if "--ads" in argv else 2000
+    batch = int(argv[argv.index("--batch") + 1]) if "--batch" in argv else 60
+    interval = int(argv[argv.index("--interval") + 1]) if "--interval" in argv else 600
+    latency = float(argv[argv.index("--latency") + 1]) if "--latency" in argv else 5
+    flaky = float(argv[argv.index("--flaky") + 1]) if "--flaky" in argv else 0.1
+    print(f"{ads} ads on 8h presigned URLs, {batch} downloads per cycle, one cycle per {interval}s simulated, "
+          f"{latency:g} ms per download, {flaky:.0%} fail once")
+    print(f"{'order':<8} {'cycles':>6} {'downloaded':>10} {'lost':>6} {'lost %':>7} {'downloads/s':>12}")
+    for mode in ("fifo", "expiry"):
+        cycles, downloaded, busy, lost = simulate(mode, ads, batch, interval, latency, flaky, 7)
+        print(f"{mode:<8} {cycles:>6} {downloaded:>10} {lost:>6} {lost / ads:>7.1%} {downloaded / max(busy, 1e-3):>12,.0f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,84 @@
+"""
+Re-import bandwidth and disk usage with the content-addressed media vault.
+
+Imports the same creatives twice from the local stand-in CDN. The second pass
+re-signs every URL (new X-Amz-Date / X-Amz-Signature), like a fresh scalatracker
+export, and several ads share one creative.
+
+    python benchmarks/bench_media_vault.py --ads 200
+"""
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.append(os.getcwd())
+
+from sqlalchemy import create_engine, select, func
+
+from backend.database import Base
+from backend.models import MediaAssetModel, AdMediaModel
+from backend.media_vault import MediaVault
+from backend.media_pipeline import MediaPipeline, apply_media_result, media_jobs, resolve_known_media
+from backend.ingest import upsert_ads
+from media_standin import start_standin, StandinHandler
+
+
+def presigned_ads(base_url: str, n: int):
+    signature = uuid.uuid4().hex
+    ads = []
+    for i in range(n):
+        creative = i % (n // 4 * 3) # a quarter of the ads reuse another ad's creative
+        url = (f"{base_url}/ams3-s3-ad-media/videos/{creative}.mp4?X-Amz-Algorithm=AWS4-HMAC-SHA256"
+               f"&X-Amz-Date={time.strftime('%Y%m%dT%H%M%SZ')}&X-Amz-Expires=28800&X-Amz-Signature={signature}")
+        ads.append({"id": f"ad{i}", "title": f"Ad {i}", "mediaUrl": url, "thumbnail": url, "adCount": 3})
+    return ads
+
+
+def import_pass(ads, engine, vault):
+    reused = resolve_known_media(ads, vault=vault)
+    upsert_ads(ads, engine=engine, log=lambda m: None)
+    vault.attach_ads(ads)
+    pipeline = MediaPipeline(vault=vault, on_done=lambda a, u, p: apply_media_result(a, u, p, engine=engine, vault=vault))
+    pipeline.submit_many(media_jobs(ads))
+    stats = pipeline.wait()
+    pipeline.shutdown()
+    return reused, stats
+
+
+def disk_usage(root):
+    total = files = 0
+    for dirpath, _, names in os.walk(root):
+        for name in names:
+            total += os.path.getsize(os.path.join(dirpath, name))
+            files += 1
+    return files, total
+
+
+def main(argv):
+    n = int(argv[argv.index("--ads") + 1]) if "--ads" in argv else 200
+    tmp = tempfile.mkdtemp()
+    server, base_url = start_standin()
+    engine = create_engine(f"sqlite:///{os.path.join(tmp, 'vault.db')}")
+    Base.metadata.create_all(engine)
+    vault = MediaVault(os.path.join(tmp, "media"), engine)
+
+    for label in ("first import", "re-import (re-signed URLs)"):
+        served_before = StandinHandler.bytes_served
+        start = time.perf_counter()
+        reused, stats = import_pass(presigned_ads(base_url, n), engine, vault)
+        files, size = disk_usage(vault.root)
+        print(f"{label:<28} {time.perf_counter() - start:5.2f}s  "
+              f"downloaded={(StandinHandler.bytes_served - served_before) / 1e6:6.2f} MB  "
+              f"reused={reused:4d}  fetched={stats['downloaded']:4d}  disk={files} files / {size / 1e6:.2f} MB")
+
+    with engine.connect() as conn:
+        refs = conn.execute(select(func.sum(MediaAssetModel.ref_count))).scalar()
+        links = conn.execute(select(func.count()).select_from(AdMediaModel)).scalar()
+    print(f"ref_count total={refs}, ad_media rows={links} (ads={n})")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
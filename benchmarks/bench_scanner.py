@@ -0,0 +1,111 @@
+"""
+Landing-page scan throughput: sequential requests + BeautifulSoup vs the async AdScanner.
+
+Serves synthetic landing pages (~300 KB, head + long body with inline scripts)
+from a local HTTPS-less stand-in with a per-request delay, then scans them with
+the previous per-call `requests.get` + full `html.parser` soup and with
+`AdScanner.scan_many` over one pooled client. Also reports the parse cost alone.
+The baseline needs beautifulsoup4, which the backend no longer installs; without
+it only the async scanner is measured.
+
+    python benchmarks/bench_scanner.py --pages 200 --delay 0.2
+"""
+import os
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+sys.path.append(os.getcwd())
+
+import requests
+try:
+    from bs4 import BeautifulSoup
+except ImportError: # optional: pip install beautifulsoup4 for the legacy baseline
+    BeautifulSoup = None
+
+from backend.scanner import AdScanner, analyze_html
+
+PAGE = (
+    "<!doctype html><html><head><meta charset='utf-8'><title>Método Seca Rápido - Oferta Especial</title>"
+    "<meta name='description' content='Descubra como emagrecer com uma dieta natural em 21 dias.'>"
+    "<link rel='stylesheet' href='/wp-content/themes/x/style.css'></head><body>"
+    + "<div class='section'><p>Depoimento real de cliente satisfeita com o resultado.</p>"
+      "<script>window.dataLayer=window.dataLayer||[];function gtag(){dataLayer.push(arguments)}</script></div>" * 1800
+    + "<footer>Frete grátis para todo o Brasil</footer></body></html>"
+)
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        params = {k: v[0] for k, v in parse_qs(urlsplit(self.path).query).items()}
+        time.sleep(float(params.get("delay", 0)))
+        body = PAGE.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def legacy_scan(url):
+    """The previous AdScanner.scan_page body (bare requests.get, full soup, five lower() calls)."""
+    response = requests.get(url, timeout=10)
+    soup = BeautifulSoup(response.text, 'html.parser')
+    title = soup.title.string if soup.title else ""
+    desc = soup.find('meta', attrs={'name': 'description'})
+    text_content = soup.get_text().lower()
+    tech = [k for k, v in {
+        'shopify': 'shopify' in response.text.lower(),
+        'wordpress': 'wp-content' in response.text.lower(),
+        'vtex': 'vtex' in response.text.lower(),
+        'ticto': 'ticto' in response.text.lower(),
+        'kiwify': 'kiwify' in response.text.lower()}.items() if v]
+    return title, desc, text_content, tech
+
+
+def main(argv):
+    pages = int(argv[argv.index("--pages") + 1]) if "--pages" in argv else 200
+    delay = float(argv[argv.index("--delay") + 1]) if "--delay" in argv else 0.2
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    urls = [f"{base}/lp/{i}?delay={delay}" for i in range(pages)]
+    print(f"{pages} pages of {len(PAGE) / 1024:.0f} KB, {delay}s server delay")
+
+    start = time.perf_counter()
+    for _ in range(20):
+        analyze_html(PAGE, 0.1)
+    fast_ms = (time.perf_counter() - start) / 20 * 1000
+    if BeautifulSoup is None:
+        print(f"parse only      : head parser + one pass {fast_ms:6.2f} ms/page (bs4 not installed, no baseline)")
+    else:
+        start = time.perf_counter()
+        for _ in range(20):
+            BeautifulSoup(PAGE, 'html.parser').get_text()
+        soup_ms = (time.perf_counter() - start) / 20 * 1000
+        print(f"parse only      : soup {soup_ms:7.2f} ms/page   head parser + one pass {fast_ms:6.2f} ms/page")
+
+        sample = urls[:min(pages, 40)]
+        start = time.perf_counter()
+        for url in sample:
+            legacy_scan(url)
+        legacy = (time.perf_counter() - start) / len(sample)
+        print(f"legacy          : {1 / legacy:7.1f} pages/s  (measured on {len(sample)} pages, ~{legacy * pages:.1f}s for {pages})")
+
+    start = time.perf_counter()
+    results = AdScanner(concurrency=64).scan_batch(urls)
+    elapsed = time.perf_counter() - start
+    ok = sum(1 for r in results if r["success"])
+    print(f"async scan_many : {pages / elapsed:7.1f} pages/s  ({elapsed:.2f}s, {ok}/{pages} ok)")
+    print(f"sample result   : {results[0]['data']}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
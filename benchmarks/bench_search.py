@@ -0,0 +1,140 @@
+"""
+/ads/search latency on a large corpus, and what keeping the index current costs
+the import path.
+
+Seeds a throwaway database with --rows ads (Portuguese-like copy drawn from a
+fixed vocabulary, so common and rare terms both exist). Then it runs the search
+query (first page and a deeper page, with and without a filter) against the
+full-text index and against a LIKE scan over the same columns, which is what a
+server-side search without the index would do. It also times re-importing 10k
+ads with changed copy, with the index triggers present and with them dropped.
+
+    python benchmarks/bench_search.py                      # temp SQLite file
+    python benchmarks/bench_search.py postgresql://...     # scratch Postgres DB
+    python benchmarks/bench_search.py --rows 100000 --runs 20
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.getcwd())
+
+from sqlalchemy import create_engine, insert, select, or_, text, cast, String
+
+from backend.models import AdModel
+from backend.migrations import run_migrations
+from backend.ads_query import CARD_COLUMNS
+from backend.ad_search import build_search_query, encode_offset, search_terms
+from backend.ingest import upsert_ads
+
+COMMON = ["método", "resultado", "grátis", "agora", "descubra", "garantia", "oferta", "dinheiro"]
+TOPICS = ["emagrecimento", "investimento", "inglês", "apostas", "dropshipping", "marketing", "skincare",
+          "receitas", "academia", "renda", "criptomoedas", "concurso", "maternidade", "pets", "viagem"]
+RARE = [f"termo{i}" for i in range(2000)]
+NICHES = ["Saúde & Bem-estar", "Finanças & Investimentos", "Infoprodutos & Educação", "Negócios"]
+
+
+def copy_for(rnd: random.Random) -> str:
+    words = rnd.sample(COMMON, 4) + rnd.sample(TOPICS, 2) + [rnd.choice(RARE)]
+    rnd.shuffle(words)
+    return " ".join(words) + " clique no link e aproveite a condição especial de hoje."
+
+
+def seed(engine, rows: int):
+    rnd = random.Random(11)
+    base = datetime(2025, 1, 1)
+    batch = []
+    with engine.begin() as conn:
+        for i in range(rows):
+            topic = rnd.choice(TOPICS)
+            batch.append({
+                "id": f"{10**15 + i}", "title": f"Página {topic} {i % 4000}", "copy": copy_for(rnd),
+                "insights": f"Gancho de {topic} nos primeiros segundos.", "tags": [topic, rnd.choice(COMMON)],
+                "niche": rnd.choice(NICHES), "platform": "Facebook", "status": "Validado",
+                "adCount": rnd.randint(1, 300), "addedAt": base + timedelta(minutes=i),
+            })
+            if len(batch) >= 5000:
+                conn.execute(insert(AdModel.__table__), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(AdModel.__table__), batch)
+
+
+def like_query(q: str, limit: int = 50, niche: str = None):
+    stmt = select(*CARD_COLUMNS)
+    for term in search_terms(q):
+        pattern = f"%{term}%"
+        stmt = stmt.where(or_(AdModel.title.ilike(pattern), AdModel.copy.ilike(pattern),
+                              AdModel.insights.ilike(pattern), cast(AdModel.tags, String).ilike(pattern)))
+    if niche:
+        stmt = stmt.where(AdModel.niche == niche)
+    return stmt.order_by(AdModel.addedAt.desc()).limit(limit + 1)
+
+
+def timed(conn, stmt, runs: int):
+    samples = []
+    for _ in range(runs):
+        t = time.perf_counter()
+        rows = conn.execute(stmt).fetchall()
+        samples.append(time.perf_counter() - t)
+    samples.sort()
+    return statistics.median(samples) * 1000, samples[int(len(samples) * 0.95) - 1] * 1000, len(rows)
+
+
+def reimport(engine, rows: int, count: int, tag: str):
+    rnd = random.Random(tag)
+    ads = [{"id": f"{10**15 + i}", "title": f"Página {tag} {i}", "copy": copy_for(rnd), "insights": "Novo gancho.",
+            "tags": [tag], "adCount": rnd.randint(1, 300), "niche": NICHES[0]} for i in range(0, rows, max(1, rows // count))]
+    t = time.perf_counter()
+    upsert_ads(ads, engine=engine)
+    return (time.perf_counter() - t) * 1000, len(ads)
+
+
+def main(argv):
+    rows = int(argv[argv.index("--rows") + 1]) if "--rows" in argv else 100000
+    runs = int(argv[argv.index("--runs") + 1]) if "--runs" in argv else 20
+    url = next((a for a in argv if "://" in a), None)
+    if not url:
+        url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'search.db')}"
+    engine = create_engine(url)
+    run_migrations(engine)
+    t = time.perf_counter()
+    seed(engine, rows)
+    print(f"{rows} ads seeded (index maintained by triggers) in {time.perf_counter() - t:.1f}s, {engine.dialect.name}")
+
+    cases = [
+        ("rare term", "termo1234", {}),
+        ("topic term", "emagrecimento", {}),
+        ("common term", "garantia", {}),
+        ("two terms", "investimento garantia", {}),
+        ("prefix / stem", "emagrec", {}),
+        ("term + niche filter", "inglês", {"niche": NICHES[2]}),
+        ("common term, page 5", "garantia", {"cursor": encode_offset(200)}),
+    ]
+    with engine.connect() as conn:
+        print(f"{'query':<22} {'index p50':>10} {'p95':>8} {'rows':>5}   {'LIKE* p50':>9} {'p95':>8}")
+        for label, q, extra in cases:
+            stmt, _, _ = build_search_query(engine.dialect.name, q, **extra)
+            p50, p95, n = timed(conn, stmt, runs)
+            like50, like95, _ = timed(conn, like_query(q, niche=extra.get("niche")), max(3, runs // 5))
+            print(f"{label:<22} {p50:8.1f}ms {p95:6.1f}ms {n:5d}   {like50:7.1f}ms {like95:6.1f}ms")
+        print("* LIKE: newest 51 substring matches, unranked; it only stops early when a term is frequent")
+
+    with_index, count = reimport(engine, rows, 10000, "reindex")
+    if engine.dialect.name == "sqlite":
+        with engine.begin() as conn:
+            for trigger in ("ads_fts_insert", "ads_fts_update", "ads_fts_delete"):
+                conn.execute(text(f"DROP TRIGGER {trigger}"))
+        without_index, _ = reimport(engine, rows, 10000, "plain")
+        print(f"\nre-import of {count} ads with new copy: {with_index:.0f} ms with the index triggers, "
+              f"{without_index:.0f} ms without")
+    else:
+        print(f"\nre-import of {count} ads with new copy (generated column + GIN): {with_index:.0f} ms")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,161 @@
+"""
+Ad listing serialization: the former path (ORM objects -> to_dict() -> Ad
+pydantic model -> FastAPI jsonable_encoder -> json.dumps) vs the fast path
+(plain SQL rows -> dicts -> orjson), per 10k ads, plus gzip / brotli size and
+time for the resulting payload.
+
+Seeds a throwaway SQLite database with --rows ads shaped like imported ones
+(copy, insights, JSON performance / targeting / tags) and reports, per path,
+the fetch+convert time, the encode time and the total.
+
+    python benchmarks/bench_serialization.py --rows 10000 [--runs 5]
+"""
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.getcwd())
+
+TMP = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{os.path.join(TMP, 'serialization.db')}")
+os.environ.setdefault("LOG_FILE", os.path.join(TMP, "app.log"))
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from backend.database import sync_engine
+from backend.models import AdModel
+from backend.schemas import Ad
+from backend.ads_query import FULL_COLUMNS, CARD_COLUMNS, build_dump_query, row_to_dict
+from backend.responses import dumps, compress, brotli
+
+NICHES = ["Saúde & Bem-estar", "Finanças & Investimentos", "iGaming & Apostas", "Negócios"]
+
+
+def seed(rows: int):
+    from backend.admin import migrate
+    migrate()
+    rnd = random.Random(7)
+    base = datetime(2025, 1, 1)
+    batch = []
+    with sync_engine.begin() as conn:
+        for i in range(rows):
+            batch.append({
+                "id": f"{10**15 + i}", "title": f"Página {i % 3000}", "brandLogo": f"/media/ab/{i:064x}.jpg",
+                "platform": "Facebook", "niche": rnd.choice(NICHES), "type": "Video", "status": "Validado",
+                "tags": ["escala", "vsl", "br"][: rnd.randint(0, 3)], "thumbnail": f"/media/cd/{i:064x}.jpg",
+                "mediaUrl": f"/media/ef/{i:064x}.mp4", "copy": "Descubra o método que já ajudou milhares. " * 8,
+                "cta": "Saiba mais", "insights": "Criativo com gancho forte nos 3 primeiros segundos. " * 3,
+                "rating": round(rnd.uniform(1, 5), 1), "addedAt": base + timedelta(minutes=i),
+                "adCount": rnd.randint(1, 300), "ticketPrice": "R$ 197", "funnelType": "VSL",
+                "salesPageUrl": f"https://oferta{i}.com.br/vsl", "libraryUrl": f"https://facebook.com/ads/library/?id={i}",
+                "performance": {"ctr": round(rnd.random(), 3), "cpc": round(rnd.random() * 4, 2), "roas": 2.4},
+                "siteTraffic": {"monthly": rnd.randint(1000, 900000)}, "techStack": {"checkout": "Kiwify"},
+                "targeting": {"age": "25-54", "gender": "all", "countries": ["BR"]}, "pixels": ["123456789"],
+                "tld": ".com.br", "velocity": rnd.random() * 5, "acceleration": 0.0,
+            })
+            if len(batch) >= 5000:
+                conn.execute(insert(AdModel.__table__), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(AdModel.__table__), batch)
+
+
+def former_dump():
+    # GET /ads?full=true before: ORM objects, Ad(**to_dict()).dict(), then FastAPI's JSONResponse
+    t = time.perf_counter()
+    with Session(sync_engine) as session:
+        ads = session.execute(select(AdModel).order_by(AdModel.addedAt.desc())).scalars().all()
+        content = [Ad(**ad.to_dict()).model_dump() for ad in ads]
+    convert = time.perf_counter() - t
+    t = time.perf_counter()
+    body = json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+    return convert, time.perf_counter() - t, body
+
+
+def former_full_page(limit: int):
+    # GET /ads?view=full before: ORM objects -> to_dict() -> jsonable_encoder -> json.dumps
+    t = time.perf_counter()
+    with Session(sync_engine) as session:
+        ads = session.execute(select(AdModel).order_by(AdModel.addedAt.desc(), AdModel.id.desc()).limit(limit)).scalars().all()
+        content = {"items": [ad.to_dict() for ad in ads], "nextCursor": None, "count": len(ads)}
+    convert = time.perf_counter() - t
+    t = time.perf_counter()
+    body = json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+    return convert, time.perf_counter() - t, body
+
+
+def former_card_page(limit: int):
+    t = time.perf_counter()
+    with sync_engine.connect() as conn:
+        rows = conn.execute(select(*CARD_COLUMNS).order_by(AdModel.addedAt.desc(), AdModel.id.desc()).limit(limit)).all()
+        content = {"items": [row_to_dict(r) for r in rows], "nextCursor": None, "count": len(rows)}
+    convert = time.perf_counter() - t
+    t = time.perf_counter()
+    body = json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+    return convert, time.perf_counter() - t, body
+
+
+def fast(stmt, page: bool):
+    t = time.perf_counter()
+    with sync_engine.connect() as conn:
+        items = [row_to_dict(r) for r in conn.execute(stmt).all()]
+    content = {"items": items, "nextCursor": None, "count": len(items)} if page else items
+    convert = time.perf_counter() - t
+    t = time.perf_counter()
+    body = dumps(content)
+    return convert, time.perf_counter() - t, body
+
+
+def median_run(fn, runs: int):
+    results = [fn() for _ in range(runs)]
+    convert = statistics.median(r[0] for r in results)
+    encode = statistics.median(r[1] for r in results)
+    return convert, encode, results[-1][2]
+
+
+def main(argv):
+    rows = int(argv[argv.index("--rows") + 1]) if "--rows" in argv else 10000
+    runs = int(argv[argv.index("--runs") + 1]) if "--runs" in argv else 5
+    seed(rows)
+    per = 10000 / rows
+    print(f"{rows} ads, median of {runs} runs, times scaled to 10k ads")
+    full_page = select(*FULL_COLUMNS).order_by(AdModel.addedAt.desc(), AdModel.id.desc()).limit(rows)
+    card_page = select(*CARD_COLUMNS).order_by(AdModel.addedAt.desc(), AdModel.id.desc()).limit(rows)
+    cases = (
+        ("full dump  former", lambda: former_dump()),
+        ("full dump  fast", lambda: fast(build_dump_query(), False)),
+        ("view=full  former", lambda: former_full_page(rows)),
+        ("view=full  fast", lambda: fast(full_page, True)),
+        ("view=card  former", lambda: former_card_page(rows)),
+        ("view=card  fast", lambda: fast(card_page, True)),
+    )
+    bodies = {}
+    for label, fn in cases:
+        convert, encode, body = median_run(fn, runs)
+        bodies[label] = body
+        print(f"{label:<18} rows {convert * per * 1000:7.1f} ms  encode {encode * per * 1000:7.1f} ms  "
+              f"total {(convert + encode) * per * 1000:7.1f} ms  ({len(body) / 1024:8.0f} KiB)")
+
+    body = bodies["view=full  fast"]
+    print(f"\ncompression of the view=full payload ({len(body) / 1024:.0f} KiB):")
+    for encoding in ("gzip", "br"):
+        if encoding == "br" and brotli is None:
+            print("br     (brotli not installed)")
+            continue
+        t = time.perf_counter()
+        for _ in range(runs):
+            compressed = compress(body, encoding)
+        elapsed = (time.perf_counter() - t) / runs
+        print(f"{encoding:<6} {len(compressed) / 1024:8.0f} KiB ({len(compressed) / len(body):.1%})  "
+              f"{elapsed * per * 1000:7.1f} ms per 10k ads")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
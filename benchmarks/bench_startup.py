@@ -0,0 +1,89 @@
+"""
+API time-to-first-request: process spawn until GET / answers 200.
+
+Starts uvicorn against a throwaway, already migrated SQLite database and polls
+until the first successful response, for
+- the current boot path (open the pool, serve),
+- the former boot path: a startup hook running Base.metadata.create_all plus
+  the pending-migration check on every boot, in every worker.
+Each mode is started --runs times; the median is reported.
+
+    python benchmarks/bench_startup.py --runs 5 [--workers 4]
+"""
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+sys.path.append(os.getcwd())
+
+DB_DIR = os.environ.get("BENCH_STARTUP_DB_DIR") or tempfile.mkdtemp()
+os.environ["BENCH_STARTUP_DB_DIR"] = DB_DIR
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{os.path.join(DB_DIR, 'startup.db')}")
+
+
+def _legacy_app():
+    from backend.main import app
+    from backend.database import engine, Base, sync_engine
+    from backend.migrations import pending_migrations
+
+    @app.on_event("startup")
+    async def legacy_boot_ddl():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        pending_migrations(sync_engine)
+    return app
+
+
+if os.environ.get("BENCH_STARTUP_MODE") == "legacy":
+    legacy_app = _legacy_app()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_first_request(target: str, workers: int, env) -> float:
+    port = free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", target, "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with {proc.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=0.5) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except Exception:
+                time.sleep(0.01)
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main(argv):
+    runs = int(argv[argv.index("--runs") + 1]) if "--runs" in argv else 5
+    workers = int(argv[argv.index("--workers") + 1]) if "--workers" in argv else 1
+    from backend.admin import migrate
+    migrate()
+
+    env = dict(os.environ, LOG_FILE=os.path.join(DB_DIR, "app.log"), PYTHONPATH=os.getcwd())
+    print(f"{runs} runs, {workers} worker(s), database {os.environ['DATABASE_URL']}")
+    for label, target, mode in (("current (pool only)", "backend.main:app", "current"),
+                                ("former (DDL on boot)", "benchmarks.bench_startup:legacy_app", "legacy")):
+        times = [time_to_first_request(target, workers, dict(env, BENCH_STARTUP_MODE=mode)) for _ in range(runs)]
+        print(f"{label:<22} time to first request: median {statistics.median(times) * 1000:7.0f} ms "
+              f"(min {min(times) * 1000:.0f}, max {max(times) * 1000:.0f})")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,96 @@
+"""
+Peak memory and throughput: whole-file pandas + iterrows vs the streaming importer.
+
+Builds a large synthetic scalatracker export by replicating scalatracker_novo.csv
+with unique IDs, then runs each mode in its own subprocess so peak RSS is isolated.
+
+    python benchmarks/bench_streaming_import.py --rows 200000
+"""
+import csv
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.getcwd())
+
+
+def build_csv(path: str, rows: int, source: str = "scalatracker_novo.csv"):
+    with open(source, encoding="utf-8-sig", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        template = list(reader)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        writer.writerow(header)
+        for i in range(rows):
+            row = list(template[i % len(template)])
+            row[0] = str(10**15 + i)
+            writer.writerow(row)
+
+
+def run_legacy(path: str):
+    """The previous shape: full DataFrame, list(df.iterrows()), per-row classification."""
+    import pandas as pd
+    from bulk_importer import map_niche, detect_region_py
+    df = pd.read_csv(path)
+    rows = list(df.iterrows())
+    mapped = 0
+    for index, row in rows:
+        info_ads = str(row.get('Info Ads', '1'))
+        match = [int(s) for s in info_ads.split() if s.isdigit()]
+        map_niche(str(row.get('Descrição', '')))
+        detect_region_py(info_ads)
+        mapped += 1 if match or True else 0
+    return mapped
+
+
+def run_streaming(path: str):
+    import pandas as pd
+    from bulk_importer import map_chunk
+    mapped = 0
+    for chunk in pd.read_csv(path, chunksize=5000, dtype=str, keep_default_na=False, encoding="utf-8-sig"):
+        mapped += len(map_chunk(chunk))
+    return mapped
+
+
+def run_streaming_import(path: str):
+    from backend.database import Base, sync_engine
+    import backend.models  # noqa: F401 (registers tables)
+    Base.metadata.create_all(sync_engine)
+    from bulk_importer import run_bulk_import
+    return run_bulk_import(path, download_media=False)["rows"]
+
+
+MODES = {"legacy-map": run_legacy, "streaming-map": run_streaming, "streaming-import": run_streaming_import}
+
+
+def child(mode: str, path: str):
+    start = time.perf_counter()
+    rows = MODES[mode](path)
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"RESULT {mode:<17} {rows:8d} rows  {elapsed:7.2f}s  {rows / elapsed:9.0f} rows/s  peak RSS {peak_mb:7.1f} MB")
+
+
+def main(argv):
+    if argv and argv[0] == "--child":
+        return child(argv[1], argv[2])
+    rows = int(argv[argv.index("--rows") + 1]) if "--rows" in argv else 200_000
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, "export.csv")
+    build_csv(path, rows)
+    print(f"Synthetic export: {rows} rows, {os.path.getsize(path) / 1e6:.0f} MB")
+
+    env = dict(os.environ, DATABASE_URL=f"sqlite+aiosqlite:///{os.path.join(tmp, 'stream.db')}")
+    for mode in MODES:
+        out = subprocess.run([sys.executable, __file__, "--child", mode, path],
+                             capture_output=True, text=True, env=env, cwd=os.getcwd())
+        lines = [l for l in out.stdout.splitlines() if l.startswith("RESULT")]
+        print(lines[0][7:] if lines else f"{mode} failed:\n{out.stderr[-2000:]}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,77 @@
+"""
+Local HTTP stand-in for the ad media CDNs, used by the media pipeline benchmarks.
+
+Any path is served as a synthetic file. Query parameters shape the response:
+    delay=0.5   seconds to wait before answering (slow CDN)
+    size=65536  body size in bytes
+    fail=2      answer 503 to the first N requests for this path (flaky CDN)
+    status=404  always answer with this status (dead / expired URL)
+
+    python benchmarks/media_standin.py 8765     # run standalone
+"""
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    failures = {}
+    lock = threading.Lock()
+    # Bytes served so far, for bandwidth measurements
+    bytes_served = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        time.sleep(float(params.get("delay", 0)))
+
+        status = int(params.get("status", 200))
+        fail = int(params.get("fail", 0))
+        if fail:
+            with self.lock:
+                seen = self.failures.get(parts.path, 0)
+                self.failures[parts.path] = seen + 1
+            if seen < fail:
+                status = 503
+
+        if status != 200:
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        # Deterministic per-path body so identical paths yield identical bytes
+        size = int(params.get("size", 65536))
+        seed = parts.path.encode() or b"/"
+        body = (seed * (size // len(seed) + 1))[:size]
+        self.send_response(200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        with self.lock:
+            StandinHandler.bytes_served += len(body)
+
+
+def start_standin(port: int = 0):
+    """Starts the stand-in on a background thread; returns (server, base_url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), StandinHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    server, url = start_standin(port)
+    print(f"Media stand-in listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -3,139 +3,130 @@ import os
 import sys
 import pandas as pd
 import hashlib
+import time
 from datetime import datetime
 from typing import Optional
 
 # Add current dir to path to import backend modules
 sys.path.append(os.getcwd())
 
-from backend.database import SyncSessionLocal
-from backend.models import AdModel, AdHistoryModel
-from backend.tasks import download_file
+from backend.ingest import upsert_ads
+from backend.media_pipeline import MediaPipeline, media_jobs, resolve_known_media
+from backend.media_vault import default_vault
+from backend.classifier import NICHE, REGION, REGION_CODES
 
 def map_niche(description):
-    desc = (description or '').lower()
-    if any(x in desc for x in ['saúde', 'dieta', 'emagrecer', 'fit', 'corpo', 'workout', 'gym']):
-        return "Saúde & Bem-estar"
-    if any(x in desc for x in ['dinheiro', 'lucro', 'investimento', 'milhas', 'finanças', 'crypto']):
-        return "Finanças & Investimentos"
-    if any(x in desc for x in ['aposta', 'bet', 'tiger', 'cassino', 'jogo', 'slot']):
-        return "iGaming & Apostas"
-    if any(x in desc for x in ['loja', 'frete', 'comprar', 'entrega', 'oferta', 'desconto']):
-        return "E-commerce & Dropshipping"
-    if any(x in desc for x in ['curso', 'mentor', 'aula', 'vender', 'marketing']):
-        return "Infoprodutos & Educação"
-    return "Negócios"
+    return NICHE.classify(description)
 
 def detect_region_py(info_ads):
-    info = (info_ads or '').lower()
-    if 'brazil' in info or 'brasil' in info or ' br' in info:
-        return "Brasil"
-    if 'usa' in info or 'united states' in info or ' us' in info:
-        return "Estados Unidos"
-    if 'colombia' in info:
-        return "Colômbia"
-    if 'paraguay' in info or 'py' in info:
-        return "Paraguai"
-    return "Brasil"
-
-from concurrent.futures import ThreadPoolExecutor
-
-def process_ad_row(row_data):
-    index, row = row_data
-    db = SyncSessionLocal()
-    try:
-        # Basic Mapping
-        ad_id = str(row.get('ID', row.get('id', index)))
-        brand_name = row.get('Página', row.get('página', 'Sinal Desconhecido'))
-        info_ads = str(row.get('Info Ads', '1'))
-        media_url = row.get('URL Criativo', row.get('url criativo', ''))
-        library_url = row.get('URL Biblioteca', '#')
-        description = str(row.get('Descrição', ''))
-        sales_page = row.get('URL Destino', '#')
-
-        # Extract AdCount
-        ad_count = 1
-        match = [int(s) for s in info_ads.split() if s.isdigit()]
-        if match: ad_count = match[0]
-
-        # Determine Region
-        region_name = detect_region_py(info_ads)
-        region_code = "BR" if region_name == "Brasil" else "US" if region_name == "Estados Unidos" else "CO"
-
-        # Persistence (Download Media) - Parallelized via Executor
-        local_media = download_file(media_url, ad_id) if media_url else None
-        final_media = local_media if local_media else media_url
-
-        # Create Model
-        ad_data = {
+    return REGION.classify(info_ads)
+
+def parse_ad_count_series(info_ads):
+    # First whitespace-separated all-digit token ("12 ads Brazil" -> 12), else 1
+    counts = info_ads.fillna('').astype(str).str.extract(r'(?:^|\s)(\d+)(?=\s|$)', expand=False)
+    return pd.to_numeric(counts, errors='coerce').fillna(1).astype(int)
+
+def _column(chunk, names, default):
+    for name in names:
+        if name in chunk.columns:
+            return chunk[name].fillna(default).astype(str).replace('', default)
+    return pd.Series(default, index=chunk.index, dtype=object)
+
+def map_chunk(chunk):
+    """Maps a DataFrame chunk of scalatracker rows to AdModel column dicts, column-wise."""
+    ids = _column(chunk, ['ID', 'id'], '')
+    ids = ids.where(ids != '', chunk.index.to_series().astype(str))
+    brand = _column(chunk, ['Página', 'página'], 'Sinal Desconhecido')
+    info_ads = _column(chunk, ['Info Ads'], '1')
+    media = _column(chunk, ['URL Criativo', 'url criativo'], '')
+    library = _column(chunk, ['URL Biblioteca'], '#')
+    description = _column(chunk, ['Descrição'], '')
+    sales_page = _column(chunk, ['URL Destino'], '#')
+
+    ad_count = parse_ad_count_series(info_ads)
+    niche = NICHE.classify_many(description.tolist())
+    region = REGION.classify_many(info_ads.tolist())
+    media_lower = media.str.lower()
+    is_video = media_lower.str.contains('.mp4', regex=False) | media_lower.str.contains('video', regex=False)
+    added_at = datetime.utcnow()
+
+    ads = []
+    for ad_id, brand_name, count, niche_name, region_name, media_url, video, copy, lib, sales in zip(
+            ids, brand, ad_count, niche, region, media, is_video, description, library, sales_page):
+        count = int(count)
+        ads.append({
             "id": ad_id,
             "title": brand_name,
             "brandId": brand_name.lower().replace(" ", "_"),
             "brandLogo": f"https://ui-avatars.com/api/?name={brand_name.replace(' ', '+')}&background=020617&color=fff&bold=true",
             "platform": "Facebook",
-            "niche": map_niche(description),
-            "type": "VSL" if (".mp4" in media_url.lower() or "video" in media_url.lower()) else "Direto",
-            "status": "Escala" if ad_count > 30 else "Validado",
-            "thumbnail": final_media,
-            "mediaUrl": final_media,
-            "mediaHash": f"AS-{ad_id[-4:].upper()}" if len(ad_id) > 4 else "AS-NEW",
-            "copy": description,
+            "niche": niche_name,
+            "type": "VSL" if video else "Direto",
+            # status and rating are left to the ingest scoring stage (backend/velocity.py)
+            # External URL for now; the media pipeline swaps in the local copy
+            # (and sets mediaHash to its SHA-256)
+            "thumbnail": media_url,
+            "mediaUrl": media_url,
+            "copy": copy,
             "cta": "Saiba Mais",
-            "insights": f"Sinal detectado com {ad_count} ativos na região {region_name}.",
-            "rating": min(5.0, 3.0 + (ad_count/50.0)),
-            "addedAt": datetime.utcnow(),
-            "adCount": ad_count,
+            "insights": f"Sinal detectado com {count} ativos na região {region_name}.",
+            "addedAt": added_at,
+            "adCount": count,
             "ticketPrice": "Consultar",
             "funnelType": "Direto",
-            "salesPageUrl": sales_page,
-            "libraryUrl": library_url,
+            "salesPageUrl": sales,
+            "libraryUrl": lib,
             "targeting": {
-                "locations": [{"country": region_name, "code": region_code, "volume": ad_count * 100}]
+                "locations": [{"country": region_name, "code": REGION_CODES.get(region_name, "CO"), "volume": count * 100}]
             }
-        }
-
-        # Check if exists
-        existing = db.query(AdModel).filter(AdModel.id == ad_id).first()
-        if existing:
-            for key, value in ad_data.items():
-                setattr(existing, key, value)
-        else:
-            new_ad = AdModel(**ad_data)
-            db.add(new_ad)
-        
-        # History
-        history = AdHistoryModel(ad_id=ad_id, adCount=ad_count)
-        db.add(history)
-        db.commit()
-        return True
-    except Exception as e:
-        print(f"Error on row {index}: {e}")
-        db.rollback()
-        return False
-    finally:
-        db.close()
-
-def run_bulk_import(csv_path):
+        })
+    return ads
+
+def run_bulk_import(csv_path, download_media=True, chunk_size=5000, on_progress=None):
+    """
+    Streams the CSV in chunks (bounded memory), maps each chunk column-wise and
+    writes it through the batched upsert engine while media downloads run alongside.
+    """
     if not os.path.exists(csv_path):
         print(f"Error: File {csv_path} not found.")
         return
 
-    print(f"--- Starting TURBO Bulk Import from {csv_path} ---")
-    df = pd.read_csv(csv_path)
-    total_rows = len(df)
-    print(f"Detected {total_rows} ads. Using 10 parallel workers.")
-
-    rows = list(df.iterrows())
-    count = 0
-    errors = 0
-
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        results = list(executor.map(process_ad_row, rows))
-        
-    count = sum(1 for r in results if r)
-    errors = total_rows - count
-    print(f"COMPLETED. Imported/Updated {count} ads. {errors} errors.")
+    print(f"--- Starting STREAMING Bulk Import from {csv_path} (chunks of {chunk_size}) ---")
+    start = time.time()
+    totals = {"rows": 0, "created": 0, "updated": 0, "errors": 0, "reused": 0, "failed": []}
+    pipeline = MediaPipeline() if download_media else None
+
+    reader = pd.read_csv(csv_path, chunksize=chunk_size, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+    for chunk in reader:
+        ads = map_chunk(chunk)
+        totals["reused"] += resolve_known_media(ads)
+        report = upsert_ads(ads)
+        failed_ids = {f["id"] for f in report["failed"]}
+        default_vault().attach_ads(ad for ad in ads if ad["id"] not in failed_ids)
+        if pipeline:
+            pipeline.submit_many(j for j in media_jobs(ads) if j["ad_id"] not in failed_ids)
+
+        totals["rows"] += len(chunk)
+        for key in ("created", "updated", "errors"):
+            totals[key] += report[key]
+        totals["failed"].extend(report["failed"])
+
+        elapsed = time.time() - start
+        rate = totals["rows"] / elapsed if elapsed else 0.0
+        print(f"[Import] {totals['rows']} rows ({rate:.0f} rows/s) - created {totals['created']}, updated {totals['updated']}, errors {totals['errors']}")
+        if on_progress:
+            on_progress(dict(totals, rowsPerSec=rate))
+
+    count = totals["created"] + totals["updated"]
+    print(f"COMPLETED. Imported/Updated {count} ads. {totals['errors']} errors. {totals['reused']} creatives already in vault. ({time.time() - start:.1f}s)")
+
+    if pipeline:
+        print(f"Waiting for media downloads ({pipeline.stats['queued']} queued)...")
+        stats = pipeline.wait()
+        pipeline.shutdown()
+        print(f"MEDIA DONE. {stats['downloaded']} downloaded, {stats['failed']} failed, {stats['retries']} retries.")
+        totals["media"] = stats
+    return totals
 
 if __name__ == "__main__":
     path = sys.argv[1] if len(sys.argv) > 1 else "scalatracker_criativos_2025-12-30.csv"
@@ -5,7 +5,9 @@ import sys
 sys.path.append(os.getcwd())
 
 from backend.database import SyncSessionLocal
-from backend.models import AdModel, AdHistoryModel
+from backend.models import AdModel, AdHistoryModel, AdHistoryRollupModel, MediaQueueModel
+from backend.media_refresh import sync_queue
+from backend.library_analytics import invalidate_library_snapshot
 
 def clean_ads(full_wipe=False):
     db = SyncSessionLocal()
@@ -13,13 +15,17 @@ def clean_ads(full_wipe=False):
         if full_wipe:
             print("Performing FULL WIPE of the ads table via SQLAlchemy...")
             db.query(AdHistoryModel).delete()
+            db.query(AdHistoryRollupModel).delete()
+            db.query(MediaQueueModel).delete()
             db.query(AdModel).delete()
+            # Bulk delete: /analytics/library rebuilds its snapshot on the next read
+            invalidate_library_snapshot(db.connection())
         else:
-            # Delete ads that don't have local media (vulnerable to expiration)
-            print("Cleaning up ads with external (non-persisted) links...")
-            # We delete anything that starts with http (external) 
-            # and keep items that start with /media/ (local)
-            db.query(AdModel).filter(AdModel.mediaUrl.like('http%')).delete(synchronize_session=False)
+            # Ads without local media (vulnerable to expiration) are queued for the
+            # refresh scheduler (backend/media_refresh.py) instead of being deleted
+            print("Queueing ads with external (non-persisted) links for refresh...")
+            report = sync_queue(db.connection())
+            print(f"Queued {report['queued']} ads ({report['expired']} with already expired links)")
         
         db.commit()
         print(f"Cleanup finished successfully.")
@@ -54,8 +54,11 @@ const AdCard: React.FC<AdCardProps> = memo(({ ad, onClick, isFavorite, onToggleF
     );
   }
 
-  const isVideo = ad.type === 'VSL' || (ad.mediaUrl || '').toLowerCase().match(/\.(mp4|webm|ogg|mov)$/) || (ad.mediaUrl || '').toLowerCase().includes('video') || (ad.mediaUrl || '').includes('blob:');
-  const thumb = ad.thumbnail || `https://ui-avatars.com/api/?name=${encodeURIComponent(ad.title)}&background=1e293b&color=3b82f6&size=512&bold=true`;
+  // Evicted creatives (media quota) fall back to their poster: render it as a still
+  const isVideo = !ad.mediaEvictedAt && (ad.type === 'VSL' || (ad.mediaUrl || '').toLowerCase().match(/\.(mp4|webm|ogg|mov)$/) || (ad.mediaUrl || '').toLowerCase().includes('video') || (ad.mediaUrl || '').includes('blob:'));
+  const thumb = (ad.mediaEvictedAt && ad.mediaUrl) || ad.thumbnail || `https://ui-avatars.com/api/?name=${encodeURIComponent(ad.title)}&background=1e293b&color=3b82f6&size=512&bold=true`;
+  // Until its poster is rendered a video's thumbnail is the video itself, which cannot be a poster
+  const poster = ad.thumbnail && ad.thumbnail !== ad.mediaUrl ? getMediaUrl(ad.thumbnail) : undefined;
 
   if (variant === 'hero') {
     return (
@@ -77,7 +80,7 @@ const AdCard: React.FC<AdCardProps> = memo(({ ad, onClick, isFavorite, onToggleF
             <video
               ref={videoRef}
               src={getMediaUrl(ad.mediaUrl)}
-              poster={getMediaUrl(thumb)}
+              poster={poster}
               muted
               loop
               playsInline
@@ -216,7 +219,8 @@ const AdCard: React.FC<AdCardProps> = memo(({ ad, onClick, isFavorite, onToggleF
           <video
             ref={videoRef}
             src={getMediaUrl(ad.mediaUrl)}
-            poster={getMediaUrl(thumb)}
+            poster={poster}
+            preload={poster ? 'none' : 'metadata'}
             muted
             loop
             playsInline
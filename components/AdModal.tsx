@@ -23,7 +23,8 @@ const AdModal: React.FC<AdModalProps> = ({ ad, onClose, onNextAd, onPrevAd, isSu
   const [strategicDecode, setStrategicDecode] = useState<any>(null);
   const [isLoadingDecode, setIsLoadingDecode] = useState(false);
 
-  const isVideo = ad.type === 'VSL' || (ad.mediaUrl || '').toLowerCase().match(/\.(mp4|webm|ogg|mov)$/) || (ad.mediaUrl || '').toLowerCase().includes('video') || (ad.mediaUrl || '').includes('blob:');
+  // Evicted creatives (media quota) fall back to their poster: render it as a still
+  const isVideo = !ad.mediaEvictedAt && (ad.type === 'VSL' || (ad.mediaUrl || '').toLowerCase().match(/\.(mp4|webm|ogg|mov)$/) || (ad.mediaUrl || '').toLowerCase().includes('video') || (ad.mediaUrl || '').includes('blob:'));
   const [mediaError, setMediaError] = useState(false);
   const creativeMedia = ad.mediaUrl || ad.thumbnail || `https://ui-avatars.com/api/?name=AD&background=1e293b&color=3b82f6&size=1024&bold=true`;
   const brandLogo = ad.brandLogo || `https://ui-avatars.com/api/?name=${encodeURIComponent(ad.title || 'AD')}&background=3b82f6&color=fff&size=256&bold=true`;
@@ -81,7 +82,7 @@ const AdModal: React.FC<AdModalProps> = ({ ad, onClose, onNextAd, onPrevAd, isSu
       const url = window.URL.createObjectURL(blob);
       const a = document.createElement('a');
       a.href = url;
-      a.download = `adscale_${ad.mediaHash || ad.id}.${isVideo ? 'mp4' : 'png'}`;
+      a.download = `adscale_${ad.mediaHash ? ad.mediaHash.slice(0, 16) : ad.id}.${isVideo ? 'mp4' : 'png'}`;
       document.body.appendChild(a);
       a.click();
       window.URL.revokeObjectURL(url);
@@ -392,7 +393,7 @@ const AdModal: React.FC<AdModalProps> = ({ ad, onClose, onNextAd, onPrevAd, isSu
                       <Layers className="text-slate-400" size={18} />
                       <div>
                         <p className="text-[10px] font-black text-slate-400 uppercase tracking-widest leading-none mb-1">Creative DNA</p>
-                        <p className="text-[12px] font-black text-slate-900 uppercase italic">Media Hash: {ad.mediaHash}</p>
+                        <p className="text-[12px] font-black text-slate-900 uppercase italic">Media Hash: {ad.mediaHash ? ad.mediaHash.slice(0, 12) : 'pendente'}</p>
                       </div>
                     </div>
                     <button
@@ -23,6 +23,15 @@ const ScannerModal: React.FC<ScannerModalProps> = ({ onClose, onScanComplete })
             const startData = await api.scanAd(url);
             const taskId = startData.task_id;
 
+            // Sync fallback answers inline (no task to poll)
+            if (startData.status === 'SUCCESS' && startData.result) {
+                if (!startData.result.success) throw new Error(startData.result.error || 'Erro ao iniciar scan.');
+                setResult(startData.result.data);
+                setLoading(false);
+                if (onScanComplete) onScanComplete(startData.result.data);
+                return;
+            }
+
             // Start Polling
             const pollId = setInterval(async () => {
                 try {
@@ -4,6 +4,7 @@ import { Heart, BrainCircuit, MessageSquare, ArrowRightLeft, Sparkles, Trash2, S
 import { Ad, User } from '../types';
 import AdCard from '../components/AdCard';
 import { auditAdStrategy } from '../services/geminiService';
+import { getMediaUrl } from '../services/api';
 
 
 interface FavoritesProps {
@@ -111,7 +112,7 @@ const Favorites: React.FC<FavoritesProps> = ({ ads, user, onAdClick, onToggleFav
             {comparedAds.map(ad => (
               <div key={ad.id} className="bg-white border border-slate-100 rounded-[32px] overflow-hidden flex flex-col h-full shadow-sm">
                 <div className="aspect-video relative">
-                  <img src={ad.thumbnail} className="w-full h-full object-cover opacity-60" />
+                  <img src={getMediaUrl(ad.thumbnail)} className="w-full h-full object-cover opacity-60" />
                   <div className="absolute inset-0 bg-gradient-to-t from-slate-50 to-transparent" />
                   <div className="absolute bottom-4 left-6">
                     <h4 className="text-sm font-black text-slate-900 uppercase italic">{ad.title}</h4>
@@ -162,7 +163,7 @@ const Favorites: React.FC<FavoritesProps> = ({ ads, user, onAdClick, onToggleFav
             {miningMode ? (
               <div className="bg-white border border-slate-200 rounded-[44px] overflow-hidden flex flex-col md:flex-row h-full transition-all hover:border-blue-500/30 hover:shadow-lg">
                 <div className="md:w-2/5 relative">
-                  <img src={ad.thumbnail} className="w-full h-full object-cover opacity-80 grayscale-[0.5]" />
+                  <img src={getMediaUrl(ad.thumbnail)} className="w-full h-full object-cover opacity-80 grayscale-[0.5]" />
                   <div className="absolute inset-0 bg-gradient-to-r from-transparent to-white" />
                   <button
                     onClick={() => toggleCompare(ad.id)}
@@ -3,6 +3,7 @@ import React, { useState, useMemo, useEffect, useCallback, useRef } from 'react'
 import { Search, RefreshCw, ChevronDown, Globe, ChevronLeft, ChevronRight, ArrowUpDown, Loader2, Target, Layers, Library as LucideLibrary, Clock, MapPin } from 'lucide-react';
 import { Ad, Platform, Niche } from '../types';
 import AdCard from '../components/AdCard';
+import { api } from '../services/api';
 import ScannerModal from '../components/ScannerModal';
 
 
@@ -22,6 +23,8 @@ interface LibraryProps {
 const Library: React.FC<LibraryProps> = ({ ads, onAdClick, favorites, onToggleFavorite, currentBrand, title = "Biblioteca", subtitle = "Base de dados completa interceptada", isSubscribed = false, onNavigate }) => {
   const [searchTerm, setSearchTerm] = useState('');
   const [debouncedSearchTerm, setDebouncedSearchTerm] = useState('');
+  // Ids matched by the server-side full-text index; null = filter locally
+  const [searchIds, setSearchIds] = useState<Set<string> | null>(null);
   const [filterPlatform, setFilterPlatform] = useState<Platform | 'all'>('all');
   const [filterNiche, setFilterNiche] = useState<Niche | 'all'>('all');
   const [filterTimeframe, setFilterTimeframe] = useState<'all' | '24h' | '7d' | '30d'>('all');
@@ -45,6 +48,19 @@ const Library: React.FC<LibraryProps> = ({ ads, onAdClick, favorites, onToggleFa
     return () => clearTimeout(timer);
   }, [searchTerm]);
 
+  useEffect(() => {
+    const term = debouncedSearchTerm.trim();
+    if (term.length < 2) {
+      setSearchIds(null);
+      return;
+    }
+    let cancelled = false;
+    api.searchAds(term, { limit: 500 })
+      .then(page => { if (!cancelled) setSearchIds(new Set(page.items.map(ad => ad.id))); })
+      .catch(() => { if (!cancelled) setSearchIds(null); });
+    return () => { cancelled = true; };
+  }, [debouncedSearchTerm]);
+
   // Reset infinite scroll when filters change
   useEffect(() => {
     setVisibleCount(12);
@@ -54,7 +70,7 @@ const Library: React.FC<LibraryProps> = ({ ads, onAdClick, favorites, onToggleFa
     const result = ads.filter(ad => {
       const searchLower = debouncedSearchTerm.toLowerCase();
       // Enhanced Search Logic: Include Niche and Brand in search scope
-      const matchesSearch =
+      const matchesSearch = searchIds ? searchIds.has(ad.id) :
         ad.title.toLowerCase().includes(searchLower) ||
         ad.copy.toLowerCase().includes(searchLower) ||
         ad.niche.toLowerCase().includes(searchLower) ||
@@ -100,7 +116,7 @@ const Library: React.FC<LibraryProps> = ({ ads, onAdClick, favorites, onToggleFa
     }
 
     return result;
-  }, [ads, debouncedSearchTerm, filterPlatform, filterNiche, filterTimeframe, filterRegion, minAds, currentBrand, sortBy]);
+  }, [ads, debouncedSearchTerm, searchIds, filterPlatform, filterNiche, filterTimeframe, filterRegion, minAds, currentBrand, sortBy]);
 
   // Effect for Sequential "Discovery" Reveal
   useEffect(() => {
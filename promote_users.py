@@ -3,6 +3,7 @@ import asyncio
 import sys
 from backend.database import SessionLocal
 from backend.models import UserModel
+from backend.principals import invalidate_principal
 from sqlalchemy import select, update
 
 async def list_and_promote(target_email=None):
@@ -38,6 +39,8 @@ async def list_and_promote(target_email=None):
         q = update(UserModel).where(UserModel.email == target_email).values(role='admin')
         await db.execute(q)
         await db.commit()
+        # Role is part of the cached principal used by the API
+        await invalidate_principal(target_email)
         
         # Verify
         result = await db.execute(select(UserModel).where(UserModel.email == target_email))
@@ -1,4 +1,5 @@
 
+import type { LibraryIntelligence } from './intelligenceEngine';
 import { Ad, User } from '../types';
 
 
@@ -10,10 +11,13 @@ export const API_URL = isProd
     ? 'https://api.adnuvem.com'
     : (import.meta.env.VITE_API_URL || (isIp ? `http://${window.location.hostname}:8001` : 'http://127.0.0.1:8001'));
 
+// Production: vault files go through the frontend nginx, which sends the bytes itself (see nginx.conf)
+export const MEDIA_URL = isProd ? '' : (import.meta.env.VITE_MEDIA_URL ?? API_URL);
+
 export const getMediaUrl = (url: string) => {
     if (!url) return '';
     if (url.startsWith('http')) return url;
-    if (url.startsWith('/media')) return `${API_URL}${url}`;
+    if (url.startsWith('/media')) return `${MEDIA_URL}${url}`;
     return url;
 };
 
@@ -28,13 +32,55 @@ const getHeaders = () => {
 export const api = {
     // --- ADS ---
     getAds: async (): Promise<Ad[]> => {
-        const response = await fetch(`${API_URL}/ads`, {
+        const response = await fetch(`${API_URL}/ads?full=true`, {
             headers: getHeaders(),
         });
         if (!response.ok) throw new Error('Failed to fetch ads');
         return response.json();
     },
 
+    getAdsPage: async (params: Record<string, string | number | undefined> = {}): Promise<{ items: Ad[]; nextCursor: string | null; count: number }> => {
+        const query = new URLSearchParams();
+        Object.entries(params).forEach(([k, v]) => {
+            if (v !== undefined && v !== '') query.set(k, String(v));
+        });
+        const response = await fetch(`${API_URL}/ads?${query.toString()}`, {
+            headers: getHeaders(),
+        });
+        if (!response.ok) throw new Error('Failed to fetch ads');
+        return response.json();
+    },
+
+    // Near-duplicates: same creative, near-identical image or similar copy
+    getSimilarAds: async (adId: string, limit = 20): Promise<{ adId: string; clusterId: string; duplicateOf: string | null; items: (Ad & { match: 'media' | 'image' | 'copy'; duplicate: boolean; copySimilarity: number; imageDistance: number | null })[]; count: number }> => {
+        const response = await fetch(`${API_URL}/ads/${encodeURIComponent(adId)}/similar?limit=${limit}`, {
+            headers: getHeaders(),
+        });
+        if (!response.ok) throw new Error('Failed to fetch similar ads');
+        return response.json();
+    },
+
+    getDuplicateClusters: async (minSize = 2, limit = 50, offset = 0): Promise<{ items: { clusterId: string; canonicalId: string; size: number; adIds: string[] }[]; count: number; nextOffset: number | null }> => {
+        const response = await fetch(`${API_URL}/ads/clusters?min_size=${minSize}&limit=${limit}&offset=${offset}`, {
+            headers: getHeaders(),
+        });
+        if (!response.ok) throw new Error('Failed to fetch duplicate clusters');
+        return response.json();
+    },
+
+    // Ranked full-text search (title, copy, insights, tags); items carry a relevance `score`
+    searchAds: async (q: string, params: Record<string, string | number | undefined> = {}): Promise<{ items: (Ad & { score: number })[]; nextCursor: string | null; count: number }> => {
+        const query = new URLSearchParams({ q });
+        Object.entries(params).forEach(([k, v]) => {
+            if (v !== undefined && v !== '') query.set(k, String(v));
+        });
+        const response = await fetch(`${API_URL}/ads/search?${query.toString()}`, {
+            headers: getHeaders(),
+        });
+        if (!response.ok) throw new Error('Failed to search ads');
+        return response.json();
+    },
+
     createAd: async (ad: Omit<Ad, 'addedAt'>): Promise<Ad> => {
         const response = await fetch(`${API_URL}/ads`, {
             method: 'POST',
@@ -147,6 +193,19 @@ export const api = {
         return response.json();
     },
 
+    scanAdsBatch: async (params: { urls?: string[]; adIds?: string[]; allAds?: boolean }): Promise<any> => {
+        const response = await fetch(`${API_URL}/scan-ad/batch`, {
+            method: 'POST',
+            headers: getHeaders(),
+            body: JSON.stringify({ urls: params.urls || [], ad_ids: params.adIds, all_ads: !!params.allAds }),
+        });
+        if (!response.ok) {
+            const err = await response.json();
+            throw new Error(err.detail || 'Falha ao escanear URLs');
+        }
+        return response.json();
+    },
+
     getTaskStatus: async (taskId: string): Promise<any> => {
         const response = await fetch(`${API_URL}/tasks/${taskId}`, {
             headers: getHeaders(),
@@ -166,6 +225,14 @@ export const api = {
         return response.json();
     },
 
+    getLibraryIntelligence: async (): Promise<LibraryIntelligence | null> => {
+        const response = await fetch(`${API_URL}/analytics/library`, {
+            headers: getHeaders(),
+        });
+        if (!response.ok) throw new Error('Failed to fetch library intelligence');
+        return response.json();
+    },
+
     getAdHistory: async (adId: string): Promise<any> => {
         const response = await fetch(`${API_URL}/ads/${adId}/history`, {
             headers: getHeaders(),
@@ -174,6 +241,16 @@ export const api = {
         return response.json();
     },
 
+    // One request for many ads (max 200 ids): { [adId]: [{ adCount, timestamp, min?, max? }] }
+    getAdsHistory: async (adIds: string[], resolution: 'raw' | 'day' | 'week' = 'day'): Promise<Record<string, any[]>> => {
+        const params = new URLSearchParams({ ids: adIds.join(','), resolution });
+        const response = await fetch(`${API_URL}/ads/history?${params}`, {
+            headers: getHeaders(),
+        });
+        if (!response.ok) throw new Error('Failed to fetch ads history');
+        return response.json();
+    },
+
     strategicDecode: async (adId: string): Promise<any> => {
         const response = await fetch(`${API_URL}/ai/strategic-decode/${adId}`, {
             headers: getHeaders(),
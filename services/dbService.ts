@@ -1,7 +1,7 @@
 
 import { Ad, AdStatus, Platform, Niche, CreativeType } from '../types';
 import { INITIAL_ADS } from '../constants';
-import { analyzeLibrary, LibraryIntelligence } from './intelligenceEngine';
+import { LibraryIntelligence } from './intelligenceEngine';
 import { api } from './api';
 
 export const INTEL_KEY = 'adscale_library_intel';
@@ -14,13 +14,6 @@ export const dbService = {
     try {
       let ads = await api.getAds();
       // Seeding logic removed - Backend manages the data source.
-
-      // Atualiza inteligência localmente (ou poderia ser no backend)
-      const intel = analyzeLibrary(ads);
-      if (intel) {
-        localStorage.setItem(INTEL_KEY, JSON.stringify(intel));
-      }
-
       return ads;
     } catch (error) {
       console.error("[dbService] CRITICAL: Failed to fetch ads from API.", error);
@@ -29,6 +22,25 @@ export const dbService = {
     }
   },
 
+  /**
+   * Dashboard sem baixar a biblioteca inteira: uma página de /ads (maior escala
+   * primeiro) e a inteligência agregada no backend (/analytics/library).
+   */
+  getDashboardAds: async (limit = 24): Promise<Ad[]> => {
+    const [page, intel] = await Promise.all([
+      api.getAdsPage({ sort: 'velocity', limit }).catch(error => {
+        console.error("[dbService] Failed to fetch dashboard ads.", error);
+        return null;
+      }),
+      api.getLibraryIntelligence().catch(e => {
+        console.warn("[dbService] Library intelligence unavailable.", e);
+        return null;
+      }),
+    ]);
+    if (intel) localStorage.setItem(INTEL_KEY, JSON.stringify(intel));
+    return page?.items ?? [];
+  },
+
   getLibraryIntelligence: (): LibraryIntelligence | null => {
     const data = localStorage.getItem(INTEL_KEY);
     return data ? JSON.parse(data) : null;
@@ -355,7 +367,6 @@ export const dbService = {
       tags: [analysis.niche, adCount > 50 ? "Escala Pesada" : "Validado", inferredByAI ? "IA Detect" : "Meta Data"],
       thumbnail: mediaUrl,
       mediaUrl: mediaUrl,
-      mediaHash: `AS-${id.toString().slice(-4).toUpperCase()}`,
       copy: description,
       cta: getVal(['cta', 'botão', 'action', 'chamada']) || "Saiba Mais",
       insights: `Análise AdScale: Este sinal apresenta um volume de ${adCount} ativos na região: ${region.country}.`,
@@ -0,0 +1,67 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.getcwd())
+
+from sqlalchemy import create_engine, insert, select
+
+from backend.models import AdModel, MediaAssetModel, AdMediaModel, MediaPosterModel, AdFingerprintModel
+from backend.migrations import run_migrations
+from backend.ingest import upsert_ads
+from backend.media_vault import MediaVault
+from backend.media_gc import collect_garbage
+
+
+def _store(vault, data: bytes, ext: str, content_type: str):
+    sha, rel_path, size = vault.store([data], ext)
+    old = time.time() - 7 * 24 * 3600
+    os.utime(vault.disk_path(rel_path), (old, old))
+    return {"sha256": sha, "path": rel_path, "size": size, "content_type": content_type, "ref_count": 0}
+
+
+def test_eviction_leaves_ads_on_poster():
+    directory = tempfile.mkdtemp()
+    engine = create_engine(f"sqlite:///{os.path.join(directory, 'gc.db')}")
+    run_migrations(engine)
+    vault = MediaVault(root=os.path.join(directory, "media"), engine=engine)
+    creative = _store(vault, b"v" * 4096, "mp4", "video/mp4")
+    poster = _store(vault, b"p" * 512, "jpg", "image/jpeg")
+    with engine.begin() as conn:
+        conn.execute(insert(MediaAssetModel.__table__), [creative, poster])
+        conn.execute(insert(AdMediaModel.__table__), [{"ad_id": "vsl-1", "sha256": creative["sha256"]},
+                                                      {"ad_id": "vsl-2", "sha256": creative["sha256"]}])
+        conn.execute(insert(MediaPosterModel.__table__), [{"sha256": creative["sha256"],
+                                                           "poster_sha256": poster["sha256"], "attempts": 1}])
+    upsert_ads([{"id": ad_id, "title": "A", "copy": f"copy {ad_id}", "niche": "Negócios", "type": "VSL",
+                 "adCount": 1, "mediaUrl": creative["path"], "thumbnail": poster["path"]}
+                for ad_id in ("vsl-1", "vsl-2")], engine=engine, log=lambda *_: None)
+
+    summary = collect_garbage(engine, vault, quota=1024, grace=0)
+    assert summary["evicted"] == 1
+    assert not os.path.exists(vault.disk_path(creative["path"]))
+    assert os.path.exists(vault.disk_path(poster["path"]))
+
+    with engine.connect() as conn:
+        ads = {r.id: r for r in conn.execute(select(AdModel.id, AdModel.mediaUrl, AdModel.mediaHash,
+                                                    AdModel.mediaEvictedAt, AdModel.type))}
+        fingerprints = dict(conn.execute(select(AdFingerprintModel.ad_id, AdFingerprintModel.media_sha256)).all())
+        assets = set(conn.execute(select(MediaAssetModel.sha256)).scalars())
+    for ad in ads.values():
+        assert ad.mediaUrl == poster["path"]
+        assert ad.mediaHash is None
+        assert ad.mediaEvictedAt is not None
+        assert ad.type == "VSL"
+    assert fingerprints == {"vsl-1": None, "vsl-2": None}
+    assert assets == {poster["sha256"]}
+
+    # A re-import with the creative's URL brings it back and clears the mark
+    upsert_ads([{"id": "vsl-1", "mediaUrl": "https://cdn.test/vsl-1.mp4"}], engine=engine, log=lambda *_: None)
+    with engine.connect() as conn:
+        assert conn.execute(select(AdModel.mediaEvictedAt).where(AdModel.id == "vsl-1")).scalar() is None
+
+
+if __name__ == "__main__":
+    test_eviction_leaves_ads_on_poster()
+    print("ok")
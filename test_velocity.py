@@ -0,0 +1,43 @@
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.append(os.getcwd())
+
+from sqlalchemy import create_engine, select, update
+
+from backend.models import AdModel
+from backend.migrations import run_migrations
+from backend.ingest import upsert_ads
+
+
+def _import(engine, rows):
+    # CSV rows carry no status / rating: the ingest scoring stage labels them
+    upsert_ads([dict(r) for r in rows], engine=engine, log=lambda *_: None)
+    with engine.connect() as conn:
+        return dict(conn.execute(select(AdModel.id, AdModel.status)).all())
+
+
+def test_reimport_keeps_status():
+    engine = create_engine(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'velocity.db')}")
+    run_migrations(engine)
+    rows = [{"id": f"ad-{i}", "title": "A", "copy": "x", "niche": "Negócios", "adCount": count}
+            for i, count in enumerate([1, 12, 31, 45, 120])]
+
+    first = _import(engine, rows)
+    assert first == {"ad-0": "Validado", "ad-1": "Validado", "ad-2": "Escala", "ad-3": "Escala", "ad-4": "Escala"}
+
+    # A day later, unchanged: the velocity decays, the labels must not
+    with engine.begin() as conn:
+        conn.execute(update(AdModel).values(velocityAt=datetime.utcnow() - timedelta(days=1)))
+    assert _import(engine, rows) == first
+
+    with engine.connect() as conn:
+        velocities = dict(conn.execute(select(AdModel.id, AdModel.velocity)).all())
+    assert all(v == 0.0 for v in velocities.values())
+
+
+if __name__ == "__main__":
+    test_reimport_keeps_status()
+    print("ok")
@@ -44,13 +44,16 @@ export interface Ad {
   tags: string[];
   thumbnail: string;
   mediaUrl: string;
-  mediaHash: string;
+  mediaHash?: string | null; // SHA-256 of the stored creative, set by the server
+  mediaEvictedAt?: string | null; // Criativo removido pela cota de mídia: mediaUrl é o pôster
   copy: string;
   cta: string;
   insights: string;
   rating: number;
   addedAt: string;
   adCount: number;
+  velocity?: number; // Crescimento de adCount (anúncios/dia), calculado na importação
+  acceleration?: number;
   ticketPrice: string;
   funnelType: string;
   salesPageUrl: string;